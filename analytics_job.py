@@ -0,0 +1,228 @@
+"""
+Job phân tích offline trên toàn bộ file user trong USER_FOLDER.
+
+Quét song song bằng process pool (mỗi task là 1 lô file user), mỗi lô trả về
+1 bản tổng hợp kích thước cố định rồi được gộp dần ở process chính, nên bộ nhớ
+không phụ thuộc số user. Số lô đang chạy được giới hạn ~2 lô / worker.
+
+Kết quả ghi vào Analytics/summary.json (dashboard đọc file này):
+    - retention theo bucket khoảng ôn (dựa trên lần ôn gần nhất của từng thẻ)
+    - mức độ hoàn thành theo topic
+    - phân bố ease_factor / interval_hours
+    - số thẻ đến hạn ngay bây giờ / trong 24h tới
+
+Cách dùng:
+    python analytics_job.py
+    python analytics_job.py --workers 16 --batch 512
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, timedelta
+from itertools import islice
+
+from storage import iter_user_files, read_json, save_json
+
+USER_FOLDER = "Users"
+TOPIC_FOLDER = "Topics"
+SUMMARY_FILE = os.path.join("Analytics", "summary.json")
+
+# Biên trên (giờ) của các bucket khoảng ôn
+INTERVAL_BUCKETS = (4, 12, 24, 72, 168, 336, 720, 2160)
+INTERVAL_LABELS = ("≤4h", "≤12h", "≤1d", "≤3d", "≤1w", "≤2w", "≤1m", "≤3m", ">3m")
+# Histogram ease_factor: bin 0.1 từ 1.3 đến 3.5 (giá trị ngoài khoảng dồn về 2 đầu)
+EASE_MIN, EASE_STEP, EASE_BINS = 1.3, 0.1, 23
+
+# =====================
+# WORKER
+# =====================
+_topics_of_word = {}   # word_id → [topic, ...] (id có thể trùng giữa các topic)
+_now = None
+
+def load_topics(topic_folder):
+    """Trả về (số từ mỗi topic, word_id → danh sách topic chứa nó)."""
+    sizes, topics_of_word = {}, {}
+    if not os.path.isdir(topic_folder):
+        return sizes, topics_of_word
+    for name in sorted(os.listdir(topic_folder)):
+        if not name.endswith(".json"):
+            continue
+        topic = name[:-5]
+        vocab = read_json(os.path.join(topic_folder, name))
+        sizes[topic] = len(vocab)
+        for word_id in vocab:
+            topics_of_word.setdefault(word_id, []).append(topic)
+    return sizes, topics_of_word
+
+def _init_worker(topic_folder, now_iso):
+    global _now, _topics_of_word
+    _now = datetime.fromisoformat(now_iso)
+    _topics_of_word = load_topics(topic_folder)[1]
+
+def _interval_bucket(hours):
+    for i, bound in enumerate(INTERVAL_BUCKETS):
+        if hours <= bound:
+            return i
+    return len(INTERVAL_BUCKETS)
+
+def empty_partial():
+    return {
+        "users": 0,
+        "cards": 0,
+        "pending": 0,
+        "knew": 0,
+        "reviews": 0,
+        "due_now": 0,
+        "due_24h": 0,
+        "unreadable": 0,
+        "retention": [[0, 0] for _ in INTERVAL_LABELS],   # [nhớ, tổng] theo bucket
+        "interval_hist": [0] * len(INTERVAL_LABELS),
+        "ease_hist": [0] * EASE_BINS,
+        "topic_learned": {},
+    }
+
+def merge(total, part):
+    for key in ("users", "cards", "pending", "knew", "reviews", "due_now", "due_24h", "unreadable"):
+        total[key] += part[key]
+    for i, (ok, n) in enumerate(part["retention"]):
+        total["retention"][i][0] += ok
+        total["retention"][i][1] += n
+    for key in ("interval_hist", "ease_hist"):
+        for i, n in enumerate(part[key]):
+            total[key][i] += n
+    for topic, n in part["topic_learned"].items():
+        total["topic_learned"][topic] = total["topic_learned"].get(topic, 0) + n
+    return total
+
+def scan_user(user_data, part):
+    due_now = _now.isoformat()
+    due_24h = (_now + timedelta(hours=24)).isoformat()
+    words = user_data.get("words", {})
+
+    part["users"] += 1
+    part["cards"] += len(words)
+    part["pending"] += len(user_data.get("pending_words", {}))
+    part["knew"] += len(user_data.get("knew_words", {}))
+    part["reviews"] += user_data.get("stats", {}).get("total_reviews", 0)
+
+    for word_id, state in words.items():
+        # next_review là ISO cùng định dạng nên so sánh chuỗi được, khỏi parse
+        next_review = state.get("next_review", "")
+        if next_review <= due_now:
+            part["due_now"] += 1
+        elif next_review <= due_24h:
+            part["due_24h"] += 1
+
+        part["interval_hist"][_interval_bucket(state.get("interval_hours", 0))] += 1
+        ease_bin = int(round((state.get("ease_factor", EASE_MIN) - EASE_MIN) / EASE_STEP))
+        part["ease_hist"][min(max(ease_bin, 0), EASE_BINS - 1)] += 1
+
+        if "last_remembered" in state:
+            bucket = part["retention"][_interval_bucket(state["last_interval_hours"])]
+            bucket[0] += int(state["last_remembered"])
+            bucket[1] += 1
+
+    # aliases: id ở topic khác dùng chung thẻ đã học (xem word_index.py)
+    learned_ids = list(words) + list(user_data.get("knew_words", {})) + list(user_data.get("aliases", {}))
+    for word_id in learned_ids:
+        for topic in _topics_of_word.get(word_id, ()):
+            part["topic_learned"][topic] = part["topic_learned"].get(topic, 0) + 1
+
+def scan_batch(paths):
+    part = empty_partial()
+    for path in paths:
+        try:
+            scan_user(read_json(path), part)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            part["unreadable"] += 1
+    return part
+
+# =====================
+# DRIVER
+# =====================
+def _batched(iterable, size):
+    it = iter(iterable)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+def run(user_folder=USER_FOLDER, topic_folder=TOPIC_FOLDER, workers=None, batch_size=256):
+    workers = workers or os.cpu_count() or 1
+    now = datetime.now()
+    total = empty_partial()
+    in_flight = set()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(topic_folder, now.isoformat())) as pool:
+        for batch in _batched(iter_user_files(user_folder), batch_size):
+            in_flight.add(pool.submit(scan_batch, batch))
+            if len(in_flight) >= workers * 2:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    merge(total, fut.result())
+        for fut in in_flight:
+            merge(total, fut.result())
+
+    return finalize(total, load_topics(topic_folder)[0], now)
+
+def finalize(total, topic_sizes, now):
+    users = total["users"]
+    return {
+        "generated_at": now.isoformat(),
+        "users": users,
+        "cards": total["cards"],
+        "pending": total["pending"],
+        "knew": total["knew"],
+        "reviews": total["reviews"],
+        "unreadable": total["unreadable"],
+        "due": {"now": total["due_now"], "next_24h": total["due_24h"]},
+        "retention_by_interval": [
+            {"bucket": label, "reviews": n, "retention": ok / n if n else None}
+            for label, (ok, n) in zip(INTERVAL_LABELS, total["retention"])
+        ],
+        "interval_hours_hist": dict(zip(INTERVAL_LABELS, total["interval_hist"])),
+        "ease_factor_hist": {
+            f"{EASE_MIN + i * EASE_STEP:.1f}": n for i, n in enumerate(total["ease_hist"])
+        },
+        "topic_completion": {
+            topic: {
+                "words": size,
+                "learned": total["topic_learned"].get(topic, 0),
+                "avg_completion": total["topic_learned"].get(topic, 0) / (size * users) if size and users else 0.0,
+            }
+            for topic, size in sorted(topic_sizes.items())
+        },
+    }
+
+def write_summary(summary, path=SUMMARY_FILE):
+    # Ghi file tạm rồi đổi tên để dashboard không đọc phải file ghi dở
+    tmp_path = path + ".tmp"
+    save_json(tmp_path, summary)
+    os.replace(tmp_path, path)
+
+# =====================
+# MAIN
+# =====================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Thống kê offline trên toàn bộ user")
+    parser.add_argument("--users", default=USER_FOLDER)
+    parser.add_argument("--topics", default=TOPIC_FOLDER)
+    parser.add_argument("--output", default=SUMMARY_FILE)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--batch", type=int, default=256, help="số file user mỗi task")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.users):
+        print(f"⚠️ Không tìm thấy thư mục: {args.users}")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    summary = run(args.users, args.topics, args.workers, args.batch)
+    write_summary(summary, args.output)
+    print(f"✅ Đã quét {summary['users']} user, {summary['cards']} thẻ trong {time.perf_counter() - start:.1f}s")
+    print(f"📁 File output: {args.output}")
@@ -2,9 +2,6 @@ import streamlit as st
 import json
 import os
 from datetime import datetime, timedelta
-import pandas as pd
-import plotly.express as px
-import pyttsx3
 
 # =====================
 # CONFIG
@@ -208,6 +205,7 @@ def add_knew_word_to_user(word_id, vocab, user_data, username):
         save_json(user_file, user_data)
 
 def play_sound(text):
+    import pyttsx3
     engine = pyttsx3.init()
     engine.setProperty('rate', 120)  # Tốc độ nói
     engine.say(text)
@@ -301,6 +299,10 @@ def dashboard_page():
     
     # Progress Chart
     if user_data.get("words"):
+        # pandas/plotly chỉ cần cho biểu đồ → import khi dùng để trang login mở nhanh
+        import pandas as pd
+        import plotly.express as px
+
         st.subheader("📊 Tiến Độ Học Tập")
         
         review_counts = [w["review_count"] for w in user_data["words"].values()]
@@ -1,19 +1,57 @@
 import streamlit as st
-import json
 import os
 from datetime import datetime, timedelta
-import pandas as pd
-import plotly.express as px
 #import pyttsx3
 import base64
+import due_scheduler
+import flashcards
+import io
+import leaderboard
+import load_balance
+import metrics
+import prefetch
+import progress_io
+import review_log
+import shared_state
+import srs_fit
+import topic_cache
+import user_sync
+import vocab_store
+import word_index
+from storage import read_json, save_snapshot
 
 # =====================
 # CONFIG
 # =====================
 TOPIC_FOLDER = "Topics"
 USER_FOLDER = "Users"
+ANALYTICS_SUMMARY = os.path.join("Analytics", "summary.json")   # do analytics_job.py tạo
 INIT_INTERVAL_HOURS = 4
 INIT_EASE = 2.5
+# Tham số lịch ôn mặc định; srs_fit.py có thể fit lại theo user/cohort (SRS/params.json)
+LAPSE_FACTOR = 0.5
+EASE_BONUS = 0.1
+EASE_PENALTY = 0.2
+MIN_EASE = 1.3
+MIN_INTERVAL_HOURS = 2
+# Số giây giữa 2 lần tự động tải lại dữ liệu (<= 0 để tắt vòng lặp tự cập nhật,
+# ví dụ khi chạy load test bằng AppTest)
+REFRESH_INTERVAL = int(os.environ.get("VOCAB_REFRESH_INTERVAL", "3"))
+# Số dòng mỗi trang của bảng từ đã học
+WORD_TABLE_PAGE_SIZES = [25, 50, 100]
+# Khoảng nghỉ quá số giây này giữa 2 câu trả lời thì không tính vào thời gian học
+ACTIVITY_IDLE_SECONDS = 120
+# Số tuần hiển thị trên heatmap hoạt động ở trang chủ
+HEATMAP_WEEKS = 12
+# Trong 1 phiên ôn tập, bao lâu (giây) thì quét lại để nối thêm từ mới đến hạn
+REVIEW_RESCAN_SECONDS = 60
+# Số từ đến hạn muộn tối đa được nối thêm vào 1 phiên ôn tập (phần còn lại để phiên sau)
+REVIEW_LATE_WORDS = 50
+# Quét lại thư mục Topics/ ít nhất mỗi ngần này giây dù không có process nào báo đổi
+TOPIC_RESCAN_SECONDS = 30
+
+# Đo đạc hot path, bật bằng VOCAB_METRICS=prometheus|jsonl (xem metrics.py)
+metrics.start()
 
 # =====================
 # PAGE CONFIG
@@ -75,10 +113,13 @@ def get_base64_image(image_path):
         data = base64.b64encode(f.read()).decode()
     return data
 
-img_main = get_base64_image("static/background.jpg")      # ảnh nền chính
-img_side = get_base64_image("static/sidebar.jpg")         # ảnh nền sidebar
+@st.cache_resource(show_spinner=False)
+def get_background_css():
+    """Đọc + encode ảnh nền 1 lần mỗi process thay vì ở mỗi lần chạy lại script."""
+    img_main = get_base64_image("static/background.jpg")      # ảnh nền chính
+    img_side = get_base64_image("static/sidebar.jpg")         # ảnh nền sidebar
 
-st.markdown(f"""
+    return f"""
 <style>
 /* Nền chính + overlay mờ */
 .stApp {{
@@ -118,7 +159,9 @@ html, body, [class*="css"], p, h1, h2, h3, label, span {{
 
 
 </style>
-""", unsafe_allow_html=True)
+"""
+
+st.markdown(get_background_css(), unsafe_allow_html=True)
 
 
 
@@ -128,16 +171,15 @@ html, body, [class*="css"], p, h1, h2, h3, label, span {{
 def hours(h):
     return timedelta(hours=h)
 
-def read_json(path):
-    if not os.path.exists(path):
-        return {}
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-def save_json(path, data):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+def rerun_card():
+    """
+    Chạy lại riêng fragment của thẻ khi đang ở lượt chạy fragment (bấm nút trong
+    thẻ); lượt chạy cả trang (AppTest, click bị gộp với lần chạy toàn trang) thì
+    chạy lại cả trang như trước.
+    """
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    ctx = get_script_run_ctx()
+    st.rerun(scope="fragment" if ctx is not None and ctx.fragment_ids_this_run else "app")
 
 # =====================
 # USER FUNCTIONS
@@ -165,7 +207,8 @@ def login_user(username, password):
         # Đảm bảo field pending_words tồn tại cho user cũ
         if "pending_words" not in user_data:
             user_data["pending_words"] = {}
-            save_json(user_file, user_data)
+            with user_sync.locked(user_file):
+                user_sync.write(user_file, user_data)
         return True, user_data
     return False, None
 
@@ -175,20 +218,149 @@ def register_user(username, password):
         return False, "Tài khoản đã tồn tại"
     
     users[username] = password
-    save_json("Users/total_users.json", users)
+    save_snapshot("Users/total_users.json", users)
     
     user_data = create_user(username)
-    user_file = os.path.join(USER_FOLDER, f"{username}.json")
-    save_json(user_file, user_data)
+    save_user_data(username, user_data)
     
     return True, "Đăng ký thành công!"
 
+def record_activity(user_data, reviews=0, correct=0, new_words=0):
+    """
+    Cộng dồn hoạt động vào tổng hợp theo ngày user_data["daily"]["YYYY-MM-DD"]
+    và cập nhật streak_days / last_study. Mỗi lần gọi là O(1), không quét lịch sử.
+    """
+    now = datetime.now()
+    today = now.date().isoformat()
+    stats = user_data.setdefault("stats", {})
+
+    day = user_data.setdefault("daily", {}).get(today)
+    if day is None:
+        day = user_data["daily"][today] = {"reviews": 0, "correct": 0, "new_words": 0, "seconds": 0}
+    day["reviews"] += reviews
+    day["correct"] += correct
+    day["new_words"] += new_words
+
+    # Thời gian học = khoảng cách tới lần trả lời trước (bỏ qua nếu nghỉ quá lâu)
+    last_activity = stats.get("last_activity")
+    if last_activity:
+        gap = (now - datetime.fromisoformat(last_activity)).total_seconds()
+        if 0 < gap <= ACTIVITY_IDLE_SECONDS:
+            day["seconds"] += round(gap)
+    stats["last_activity"] = now.isoformat()
+
+    # Streak: học liên tiếp từ hôm qua → +1, bị ngắt quãng → bắt đầu lại từ 1
+    last_study = stats.get("last_study")
+    if last_study != today:
+        yesterday = (now.date() - timedelta(days=1)).isoformat()
+        stats["streak_days"] = stats.get("streak_days", 0) + 1 if last_study == yesterday else 1
+        stats["last_study"] = today
+
+def current_streak(stats):
+    """Streak còn hiệu lực nếu lần học cuối là hôm nay hoặc hôm qua."""
+    last_study = stats.get("last_study")
+    today = datetime.now().date()
+    if last_study in (today.isoformat(), (today - timedelta(days=1)).isoformat()):
+        return stats.get("streak_days", 0)
+    return 0
+
 def reload_user_data(username):
     """Load data từ file json"""
     user_file = os.path.join(USER_FOLDER, f"{username}.json")
-    user_data = read_json(user_file)
-    st.session_state.user_data = user_data
-    return user_data
+    # Lấy version trước khi đọc: file đổi sau đó thì lần kiểm tra sau vẫn thấy
+    version = user_file_version(username)
+    return set_session_user(read_json(user_file), version)
+
+def set_session_user(user_data, version=None):
+    """
+    Đưa user_data vào session ở dạng gọn: text từ vựng bỏ đi, khi cần thì lấy
+    từ kho dùng chung (xem vocab_store.py). Session giữ tham chiếu tới đúng kho
+    đã dùng để bỏ text, nên topic có đổi giữa chừng thì ghi file vẫn đủ text.
+    """
+    store = get_vocab_store()
+    st.session_state.vocab_store = store
+    st.session_state.user_data = vocab_store.slim_user(user_data, store)
+    load_balance.refresh(st.session_state.user_data)
+    st.session_state.user_base = user_sync.sync_base(user_data)
+    mark_user_data_changed(st.session_state.username, version)
+    return st.session_state.user_data
+
+def session_store():
+    return st.session_state.get("vocab_store", vocab_store.EMPTY_STORE)
+
+def word_view(word_id, entry):
+    """Entry của user kèm đủ text (word, meaning, ...) để hiển thị."""
+    return vocab_store.word_view(word_id, entry, session_store())
+
+def save_user_data(username, user_data):
+    """
+    Ghi file user (ghép lại text từ kho nên định dạng file không đổi).
+    Session khác của cùng user (tab / process khác) đã ghi file từ lần đồng bộ
+    trước → gộp 2 bản (user_sync.merge) thay vì ghi đè, rồi nạp bản đã gộp.
+    """
+    user_file = os.path.join(USER_FOLDER, f"{username}.json")
+    full = load_balance.strip(vocab_store.full_user(user_data, session_store()))
+    own = username == st.session_state.get("username")
+    merged = False
+    with user_sync.locked(user_file):
+        if own and user_sync.revision(user_file) != st.session_state.get("user_file_version"):
+            full = user_sync.merge(full, read_json(user_file), st.session_state.get("user_base"))
+            merged = True
+        version = user_sync.write(user_file, full)
+    if not own:
+        return
+    if merged:
+        # Cập nhật tại chỗ: code đang giữ user_data vẫn thấy bản đã gộp
+        user_data.clear()
+        user_data.update(vocab_store.slim_user(full, session_store()))
+        load_balance.refresh(user_data)
+    else:
+        # Lịch nhắc đang theo dõi đúng dữ liệu vừa ghi → không phải sắp lại khi nạp lại
+        due_scheduler.saved(username, st.session_state.get("user_file_version"), version)
+    st.session_state.user_base = user_sync.sync_base(full)
+    mark_user_data_changed(username, version)
+
+def user_file_version(username):
+    """Revision của file user (user_sync.py) — tăng mỗi khi bất kỳ process / thiết bị nào ghi file."""
+    return user_sync.revision(os.path.join(USER_FOLDER, f"{username}.json"))
+
+def mark_user_data_changed(username, version=None):
+    """
+    Dữ liệu trong session vừa đổi: tăng data version (làm mất hiệu lực render cache).
+    version: version file ứng với dữ liệu session (lấy lúc đọc / ghi), None → đọc lại.
+    """
+    st.session_state.user_version = st.session_state.get("user_version", 0) + 1
+    st.session_state.user_file_version = version if version is not None else user_file_version(username)
+
+# =====================
+# RENDER CACHE
+# =====================
+def cached_render(page, name, build):
+    """
+    Kết quả render (HTML, figure...) của phần `name` trên trang `page`, cache theo
+    (user, data version). build() trả về (giá trị, hết hạn lúc | None) và chỉ chạy
+    lại khi dữ liệu user đổi hoặc đã quá thời điểm hết hạn (vd có từ mới đến hạn).
+    """
+    key = (st.session_state.username, st.session_state.get("user_version", 0))
+    entries = st.session_state.setdefault("render_cache", {}).setdefault(page, {})
+    hit = entries.get(name)
+    if hit is not None and hit[0] == key and (hit[2] is None or datetime.now() < hit[2]):
+        metrics.inc("render_cache", "hit")
+        return hit[1]
+    metrics.inc("render_cache", "miss")
+    value, expires_at = build()
+    entries[name] = (key, value, expires_at)
+    return value
+
+def render_cache_expired(page):
+    now = datetime.now()
+    return any(
+        expires_at is not None and now >= expires_at
+        for _, _, expires_at in st.session_state.get("render_cache", {}).get(page, {}).values()
+    )
+
+def next_midnight(now):
+    return datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
 
 # =====================
 # WORD FUNCTIONS
@@ -200,53 +372,67 @@ def add_word_to_pending(word_id, vocab, user_data, username):
     Chỉ khi học xong mới chuyển sang words chính thức.
     """
     if word_id not in user_data["words"] and word_id not in user_data["pending_words"]:
-        user_data["pending_words"][word_id] = {
-            "word": vocab[word_id]["word"],
-            "pos": vocab[word_id].get("pos", ""),
-            "meaning": vocab[word_id].get("meaning", ""),
-            "example": vocab[word_id].get("example", ""),
-            "example_meaning": vocab[word_id].get("example_meaning", ""),
-        }
-        user_file = os.path.join(USER_FOLDER, f"{username}.json")
-        save_json(user_file, user_data)
+        user_data["pending_words"][word_id] = vocab_store.topic_entry(word_id, vocab[word_id], session_store())
+        save_user_data(username, user_data)
 
 def promote_pending_to_words(word_id, user_data, username):
     """
     Sau khi học xong 1 từ pending → chuyển sang words (SRS) và tính stats.
     """
-    if word_id not in user_data["pending_words"]:
-        return
-    if word_id in user_data["words"]:
-        # Đã tồn tại rồi, chỉ xoá pending
-        del user_data["pending_words"][word_id]
-        user_file = os.path.join(USER_FOLDER, f"{username}.json")
-        save_json(user_file, user_data)
-        return
-
+    promote_pending_batch([word_id], user_data, username)
+
+def promote_pending_batch(word_ids, user_data, username):
+    """Promote nhiều từ (lô từ component thẻ) rồi ghi file user 1 lần."""
+    params = get_srs_params(username)
+    added = 0
+    changed = False
+    for word_id in word_ids:
+        if word_id not in user_data["pending_words"]:
+            continue
+        changed = True
+        if word_id in user_data["words"]:
+            # Đã tồn tại rồi, chỉ xoá pending
+            del user_data["pending_words"][word_id]
+            continue
+        _promote_pending(word_id, user_data, params)
+        added += 1
+    if added:
+        leaderboard.update_user(username, user_data)
+        due_scheduler.update_user(username, user_data, word_ids, st.session_state.get("user_file_version"))
+    if changed:
+        save_user_data(username, user_data)
+
+def _promote_pending(word_id, user_data, params):
     pending = user_data["pending_words"][word_id]
-    current_time = datetime.now()
-    next_time = current_time + hours(INIT_INTERVAL_HOURS)
-
-    user_data["words"][word_id] = {
-        "word": pending["word"],
-        "pos": pending.get("pos", ""),
-        "meaning": pending.get("meaning", ""),
-        "example": pending.get("example", ""),
-        "example_meaning": pending.get("example_meaning", ""),
-        "interval_hours": INIT_INTERVAL_HOURS,
-        "ease_factor": INIT_EASE,
-        "next_review": next_time.isoformat(),
-        "review_count": 0
-    }
+
+    # pending chỉ còn text khác kho dùng chung (nếu có), giữ nguyên sang words
+    user_data["words"][word_id] = dict(
+        pending,
+        interval_hours=params["init_interval_hours"],
+        ease_factor=params["init_ease"],
+        review_count=0,
+    )
+    load_balance.schedule(user_data, word_id, params["init_interval_hours"])
 
     # Xoá khỏi pending
     del user_data["pending_words"][word_id]
 
     # Cập nhật stats
     user_data["stats"]["total_words"] += 1
-
-    user_file = os.path.join(USER_FOLDER, f"{username}.json")
-    save_json(user_file, user_data)
+    record_activity(user_data, new_words=1)
+
+def due_summary(user_data, now):
+    """(số từ đến hạn, thời điểm từ kế tiếp đến hạn | None) trong 1 lượt quét words."""
+    # next_review là ISO cùng định dạng nên so sánh chuỗi được
+    now_iso = now.isoformat()
+    due, upcoming = 0, None
+    for state in user_data.get("words", {}).values():
+        next_review = state["next_review"]
+        if next_review <= now_iso:
+            due += 1
+        elif upcoming is None or next_review < upcoming:
+            upcoming = next_review
+    return due, datetime.fromisoformat(upcoming) if upcoming else None
 
 def get_due_words(user_data):
     due = []
@@ -260,7 +446,224 @@ def get_due_words(user_data):
     due.sort(key=lambda x: x[1])
     return [w[0] for w in due]
 
+# =====================
+# LEARN SESSION
+# =====================
+def mask_word(w):
+    if len(w) <= 2:
+        return w[0] + "_" * (len(w) - 1)
+    masked = list("_" * len(w))
+    masked[0] = w[0]
+    masked[-1] = w[-1]
+    for i in range(2, len(w) - 1, 3):
+        masked[i] = w[i]
+    return "".join(masked)
+
+def build_learn_session(pending_words):
+    """
+    Tạo phiên học 1 lần từ pending_words: chụp danh sách từ và tính sẵn
+    chế độ (mc/fill), gợi ý và các lựa chọn trắc nghiệm cho từng từ.
+    Phiên nằm trong st.session_state nên các lần chạy lại không phải tính lại.
+    """
+    import random
+
+    items = list(pending_words.items())  # [(word_id, word_data), ...]
+    cards = []
+    for idx, (word_id, word_data) in enumerate(items):
+        # Nếu chưa có đủ từ khác để làm trắc nghiệm thì dùng fill
+        mode = random.choice(["mc", "fill"]) if len(items) >= 4 else "fill"
+        card = {
+            "word_id": word_id,
+            "data": dict(word_data),
+            "mode": mode,
+            "hint": mask_word(word_data["word"]),
+            "choices": [],
+        }
+        if mode == "mc":
+            # Lấy 3 vị trí khác idx mà không cần dựng list các từ còn lại
+            others = [j if j < idx else j + 1 for j in random.sample(range(len(items) - 1), 3)]
+            choices = [(word_data["meaning"], True)] + [(items[j][1]["meaning"], False) for j in others]
+            random.shuffle(choices)
+            card["choices"] = choices
+        cards.append(card)
+
+    return {"cards": cards, "pos": 0, "started_at": datetime.now().isoformat()}
+
+# =====================
+# REVIEW SESSION
+# =====================
+def start_review_session(due_words, user_data, username):
+    """
+    Chụp hàng đợi ôn tập 1 lần khi bắt đầu phiên.
+    Phiên được lưu trong user_data["review_session"] (và file user) nên
+    tải lại trang vẫn tiếp tục được từ chỗ đang ôn.
+    """
+    session = {
+        "queue": list(due_words),
+        "pos": 0,
+        "started_at": datetime.now().isoformat(),
+    }
+    user_data["review_session"] = session
+    save_user_data(username, user_data)
+    return session
+
+def append_late_due_words(session, user_data):
+    """
+    Nối thêm các từ vừa đến hạn trong lúc đang ôn vào cuối hàng đợi (tối đa
+    REVIEW_LATE_WORDS từ / phiên). Hàng đợi đã ôn hết thì bỏ phần đã ôn trước
+    khi nối (session["done"] giữ số từ đã bỏ để đếm tiến độ).
+    """
+    allowance = REVIEW_LATE_WORDS - session.get("late", 0)
+    if allowance <= 0:
+        return 0
+    remaining = set(session["queue"][session["pos"]:])
+    late = [wid for wid in get_due_words(user_data) if wid not in remaining]
+    late = load_balance.apply_cap(late, user_data, "reviews", taken=len(remaining))[:allowance]
+    if not late:
+        return 0
+    if session["pos"] >= len(session["queue"]):
+        session["done"] = session.get("done", 0) + session["pos"]
+        session["queue"], session["pos"] = [], 0
+    session["queue"].extend(late)
+    session["late"] = session.get("late", 0) + len(late)
+    return len(late)
+
+def current_review_word(session, user_data):
+    """Trả về word_id đang ôn (bỏ qua từ đã bị xoá khỏi words), None nếu hết."""
+    words = user_data.get("words", {})
+    queue = session["queue"]
+    while session["pos"] < len(queue) and queue[session["pos"]] not in words:
+        session["pos"] += 1
+    if session["pos"] >= len(queue):
+        return None
+    return queue[session["pos"]]
+
+def advance_review_session(session):
+    session["pos"] += 1
+
+def get_srs_params(username):
+    """Tham số lịch ôn của user: mặc định, ghi đè bởi tham số đã fit (nếu có)."""
+    params = {
+        "init_interval_hours": INIT_INTERVAL_HOURS,
+        "init_ease": INIT_EASE,
+        "lapse_factor": LAPSE_FACTOR,
+        "ease_bonus": EASE_BONUS,
+        "ease_penalty": EASE_PENALTY,
+        "min_ease": MIN_EASE,
+        "min_interval_hours": MIN_INTERVAL_HOURS,
+    }
+    params.update(srs_fit.load_fitted_params(username))
+    return params
+
+# =====================
+# LEARNED WORDS TABLE
+# =====================
+# Cột sắp xếp: nhãn hiển thị → vị trí trong tuple khoá của build_word_table_index
+WORD_TABLE_SORTS = {"Ôn tiếp theo": 0, "Số lần ôn": 1, "Từ": 2, "Topic": 3}
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _load_topic_map(signature):
+    topic_of = {}
+    for name, _ in signature:
+        for word_id in read_json(os.path.join(TOPIC_FOLDER, name)):
+            topic_of.setdefault(word_id, name[:-5])
+    return topic_of
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _load_vocab_store(signature):
+    if topic_cache.ENABLED:
+        # Cluster: mọi process mmap chung 1 file đã biên dịch thay vì giữ bản dict riêng
+        return topic_cache.attach_store(TOPIC_FOLDER, signature)
+    return vocab_store.build_store(TOPIC_FOLDER, [name for name, _ in signature])
+
+def get_vocab_store():
+    """Kho từ vựng read-only dùng chung cho mọi session của process (cache theo mtime)."""
+    return _load_vocab_store(topic_signature())
+
+def topic_signature():
+    """
+    (tên file, mtime) của các topic — khoá cache, đổi khi topic được sửa.
+    Chỉ quét lại thư mục khi có process báo topic đổi (shared_state "topics")
+    hoặc sau TOPIC_RESCAN_SECONDS (topic sửa tay không qua script).
+    """
+    return shared_state.cached("topics", scan_topic_signature, TOPIC_RESCAN_SECONDS)
+
+def scan_topic_signature():
+    files = sorted(f for f in os.listdir(TOPIC_FOLDER) if f.endswith(".json"))
+    return tuple((f, os.path.getmtime(os.path.join(TOPIC_FOLDER, f))) for f in files)
+
+def get_topic_map():
+    """word_id → tên topic (cache theo mtime của các file topic)."""
+    return _load_topic_map(topic_signature())
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _load_word_index(signature):
+    return word_index.build_index(TOPIC_FOLDER, [name for name, _ in signature])
+
+def get_word_index():
+    """Index từ chuẩn trên mọi topic (xem word_index.py), cache theo mtime."""
+    return _load_word_index(topic_signature())
+
+def words_fingerprint(user_data):
+    """Dấu vết rẻ của user_data["words"]: đổi mỗi khi thêm từ hoặc ôn tập."""
+    stats = user_data.get("stats", {})
+    return (len(user_data.get("words", {})), stats.get("total_words", 0), stats.get("total_reviews", 0))
+
+def build_word_table_index(words, topic_of):
+    """
+    Dựng chỉ mục cho bảng từ đã học: khoá của từng dòng + thứ tự đã sắp
+    sẵn theo từng cột, để đổi cách sắp xếp / lọc không phải sort lại.
+    """
+    ids = list(words)
+    keys = [
+        (w["next_review"], w["review_count"], word_view(word_id, w)["word"].lower(), topic_of.get(word_id, ""))
+        for word_id, w in ((word_id, words[word_id]) for word_id in ids)
+    ]
+    orders = {
+        col: sorted(range(len(ids)), key=lambda i, col=col: keys[i][col])
+        for col in WORD_TABLE_SORTS.values()
+    }
+    return {"ids": ids, "keys": keys, "orders": orders, "views": {}}
+
+def word_table_view(index, sort_col, topic=None, min_reviews=0):
+    """Danh sách vị trí dòng đã lọc, theo thứ tự của sort_col (cache theo bộ lọc)."""
+    view_key = (sort_col, topic, min_reviews)
+    view = index["views"].get(view_key)
+    if view is None:
+        keys = index["keys"]
+        view = [
+            i for i in index["orders"][sort_col]
+            if (topic is None or keys[i][3] == topic) and keys[i][1] >= min_reviews
+        ]
+        if len(index["views"]) >= 16:
+            index["views"].clear()
+        index["views"][view_key] = view
+    return view
+
 def update_srs(word_id, remembered, user_data, username):
+    update_srs_batch([(word_id, remembered)], user_data, username)
+
+def update_srs_batch(answers, user_data, username):
+    """
+    Áp dụng nhiều câu trả lời [(word_id, remembered)] (lô từ component thẻ):
+    tính SRS từng từ, cập nhật leaderboard / lịch nhắc và ghi file user 1 lần.
+    """
+    params = get_srs_params(username)
+    applied = 0
+    for word_id, remembered in answers:
+        # Từ có thể đã bị xoá khỏi words trong lúc đang làm lô
+        if word_id in user_data["words"]:
+            _apply_srs(word_id, remembered, user_data, username, params)
+            applied += 1
+    if not applied:
+        return 0
+    leaderboard.update_user(username, user_data)
+    due_scheduler.update_user(username, user_data, [word_id for word_id, _ in answers],
+                              st.session_state.get("user_file_version"))
+    save_user_data(username, user_data)
+    return applied
+
+def _apply_srs(word_id, remembered, user_data, username, params):
     state = user_data["words"][word_id]
     
     interval = state["interval_hours"]
@@ -268,40 +671,39 @@ def update_srs(word_id, remembered, user_data, username):
     
     if remembered:
         interval *= ease
-        ease += 0.1
+        ease += params["ease_bonus"]
     else:
-        interval = max(2, interval / 2)
-        ease = max(1.3, ease - 0.2)
+        interval = max(params["min_interval_hours"], interval * params["lapse_factor"])
+        ease = max(params["min_ease"], ease - params["ease_penalty"])
     
-    state["interval_hours"] = interval
+    review_log.log_review(
+        username, word_id, remembered,
+        state["interval_hours"], interval, state["ease_factor"], ease
+    )
+
+    # Kết quả lần ôn gần nhất (dùng cho thống kê retention theo khoảng ôn)
+    state["last_interval_hours"] = state["interval_hours"]
+    state["last_remembered"] = bool(remembered)
+    # Chế độ dàn đều có thể dời ngày đến hạn → lưu khoảng ôn thực tế
+    state["interval_hours"] = load_balance.schedule(user_data, word_id, interval)
     state["ease_factor"] = ease
-    state["next_review"] = (datetime.now() + hours(interval)).isoformat()
     state["review_count"] += 1
     
     user_data["stats"]["total_reviews"] += 1
+    record_activity(user_data, reviews=1, correct=int(remembered))
     if remembered and state["review_count"] >= 5:
         user_data["stats"]["words_mastered"] = sum(
             1 for w in user_data["words"].values() if w["review_count"] >= 5
         )
-    
-    user_file = os.path.join(USER_FOLDER, f"{username}.json")
-    save_json(user_file, user_data)
 
 def add_knew_word_to_user(word_id, vocab, user_data, username):
     if word_id not in user_data["knew_words"]:
-        user_data["knew_words"][word_id] = {
-            "word": vocab[word_id]["word"],
-            "pos": vocab[word_id].get("pos", ""),
-            "meaning": vocab[word_id].get("meaning", ""),
-            "example": vocab[word_id].get("example", ""),
-            "example_meaning": vocab[word_id].get("example_meaning", "")
-        }
+        user_data["knew_words"][word_id] = vocab_store.topic_entry(word_id, vocab[word_id], session_store())
         # Nếu từ này đang trong pending thì xoá luôn
         if word_id in user_data.get("pending_words", {}):
             del user_data["pending_words"][word_id]
 
-        user_file = os.path.join(USER_FOLDER, f"{username}.json")
-        save_json(user_file, user_data)
+        save_user_data(username, user_data)
 
 #def play_sound(text):
 #    engine = pyttsx3.init()
@@ -309,15 +711,10 @@ def add_knew_word_to_user(word_id, vocab, user_data, username):
 #    engine.say(text)
 #    engine.runAndWait()
 
-from gtts import gTTS
-import io
-
+@metrics.instrument("play_sound")
 def play_sound(text):
-    tts = gTTS(text=text, lang='en')
-    audio_bytes = io.BytesIO()
-    tts.write_to_fp(audio_bytes)
-    audio_bytes.seek(0)
-    st.audio(audio_bytes, format="audio/mp3")
+    # Audio của thẻ đang học / ôn thường đã được prefetch sinh sẵn ở nền
+    st.audio(io.BytesIO(prefetch.get_audio(text)), format="audio/mp3")
 
 # =====================
 # PAGES
@@ -342,7 +739,7 @@ def login_page():
                     if success:
                         st.session_state.logged_in = True
                         st.session_state.username = username
-                        st.session_state.user_data = user_data
+                        set_session_user(user_data)
                         st.success("Đăng nhập thành công!")
                         st.rerun()
                     else:
@@ -370,6 +767,7 @@ def login_page():
                 else:
                     st.warning("Vui lòng nhập đầy đủ thông tin!")
 
+@metrics.instrument("dashboard_page")
 def dashboard_page():
     st.markdown(f'<p class="main-header">👋 Xin chào, {st.session_state.username}!</p>', unsafe_allow_html=True)
     
@@ -377,66 +775,194 @@ def dashboard_page():
     stats = user_data.get("stats", {})
     pending_count = len(user_data.get("pending_words", {}))
     
-    # Statistics
-    col1, col2, col3, col4 = st.columns(4)
-    
-    with col1:
-        st.markdown(f"""
-        <div class="stat-box">
-            <h2>{stats.get('total_words', 0)}</h2>
-            <p>Từ đã học</p>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col2:
-        st.markdown(f"""
-        <div class="stat-box">
-            <h2>{pending_count}</h2>
-            <p>Từ chờ học</p>
-        </div>
-        """, unsafe_allow_html=True)
-
-    with col3:
-        due_count = len(get_due_words(user_data))
-        st.markdown(f"""
-        <div class="stat-box">
-            <h2>{due_count}</h2>
-            <p>Từ cần ôn</p>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col4:
-        st.markdown(f"""
-        <div class="stat-box">
-            <h2>{stats.get('total_reviews', 0)}</h2>
-            <p>Lượt ôn tập</p>
-        </div>
-        """, unsafe_allow_html=True)
+    # Statistics (HTML dựng lại chỉ khi dữ liệu đổi hoặc có từ mới đến hạn)
+    for col, html in zip(st.columns(4), cached_render("dashboard", "stat_boxes", lambda: build_stat_boxes(user_data))):
+        with col:
+            st.markdown(html, unsafe_allow_html=True)
 
     if pending_count > 0:
         st.warning(f"📌 Bạn còn **{pending_count}** từ chưa học. Vào **🎓 Học từ vựng** để học nhé!")
+
+    daily = user_data.get("daily", {})
+    today = daily.get(datetime.now().date().isoformat(), {})
+    st.markdown(
+        f"🔥 Chuỗi ngày học: **{current_streak(stats)}** ngày · "
+        f"Hôm nay: **{today.get('reviews', 0)}** lượt ôn, "
+        f"**{today.get('new_words', 0)}** từ mới, "
+        f"**{today.get('seconds', 0) // 60}** phút"
+    )
     
     st.markdown("---")
     
     # Progress Chart
     if user_data.get("words"):
         st.subheader("📊 Tiến Độ Học Tập")
-        
-        review_counts = [w["review_count"] for w in user_data["words"].values()]
-        df = pd.DataFrame({
-            'Số lần ôn': review_counts
-        })
-        
-        fig = px.histogram(df, x='Số lần ôn', nbins=10,
-                          title='Phân bố số lần ôn tập',
-                          labels={'Số lần ôn': 'Số lần ôn tập ', 'count': 'Số từ'})
-        fig.update_layout(
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            font_color='white'
-        )
+        fig = cached_render("dashboard", "progress_chart", lambda: (build_progress_chart(user_data), None))
         st.plotly_chart(fig, use_container_width=True)
 
+    # Heatmap hoạt động: chỉ tra HEATMAP_WEEKS * 7 ngày trong daily, không quét lịch sử
+    if daily:
+        st.subheader("📅 Hoạt Động Gần Đây")
+        fig = cached_render("dashboard", "heatmap", lambda: build_heatmap(daily))
+        st.plotly_chart(fig, use_container_width=True)
+
+    # Thống kê toàn hệ thống (file do job offline analytics_job.py sinh ra)
+    summary = load_analytics_summary()
+    if summary:
+        with st.expander("🌍 Thống kê toàn hệ thống"):
+            st.caption(f"Cập nhật lúc {datetime.fromisoformat(summary['generated_at']).strftime('%d/%m/%Y %H:%M')}")
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Người học", summary["users"])
+            col2.metric("Thẻ đang học", summary["cards"])
+            col3.metric("Thẻ đến hạn", summary["due"]["now"])
+            retention = {
+                row["bucket"]: round(row["retention"] * 100, 1)
+                for row in summary["retention_by_interval"] if row["retention"] is not None
+            }
+            if retention:
+                import pandas as pd
+                st.markdown("**Tỉ lệ nhớ (%) theo khoảng ôn**")
+                st.bar_chart(pd.Series(retention))
+
+    leaderboard_section(st.session_state.username)
+    progress_io_section(st.session_state.username)
+
+STAT_BOX_HTML = """
+        <div class="stat-box">
+            <h2>{value}</h2>
+            <p>{label}</p>
+        </div>
+        """
+
+def build_stat_boxes(user_data):
+    """HTML 4 ô thống kê + thời điểm hết hạn (từ kế tiếp đến hạn hoặc nửa đêm)."""
+    now = datetime.now()
+    stats = user_data.get("stats", {})
+    due_count, next_due = due_summary(user_data, now)
+    boxes = [
+        (stats.get("total_words", 0), "Từ đã học"),
+        (len(user_data.get("pending_words", {})), "Từ chờ học"),
+        (due_count, "Từ cần ôn"),
+        (stats.get("total_reviews", 0), "Lượt ôn tập"),
+    ]
+    html = [STAT_BOX_HTML.format(value=value, label=label) for value, label in boxes]
+    return html, min(filter(None, (next_due, next_midnight(now))))
+
+def build_progress_chart(user_data):
+    # pandas/plotly chỉ cần cho biểu đồ → import khi dùng để trang login mở nhanh
+    import pandas as pd
+    import plotly.express as px
+
+    review_counts = [w["review_count"] for w in user_data["words"].values()]
+    df = pd.DataFrame({
+        'Số lần ôn': review_counts
+    })
+
+    fig = px.histogram(df, x='Số lần ôn', nbins=10,
+                      title='Phân bố số lần ôn tập',
+                      labels={'Số lần ôn': 'Số lần ôn tập ', 'count': 'Số từ'})
+    fig.update_layout(
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font_color='white'
+    )
+    return fig
+
+def build_heatmap(daily):
+    """Heatmap HEATMAP_WEEKS tuần gần nhất, hết hạn lúc nửa đêm (sang ngày mới)."""
+    import plotly.graph_objects as go
+
+    now = datetime.now()
+    today_date = now.date()
+    first_day = today_date - timedelta(days=today_date.weekday() + 7 * (HEATMAP_WEEKS - 1))
+    z = [[None] * HEATMAP_WEEKS for _ in range(7)]
+    text = [[""] * HEATMAP_WEEKS for _ in range(7)]
+    for offset in range((today_date - first_day).days + 1):
+        day = first_day + timedelta(days=offset)
+        entry = daily.get(day.isoformat(), {})
+        z[day.weekday()][offset // 7] = entry.get("reviews", 0) + entry.get("new_words", 0)
+        text[day.weekday()][offset // 7] = day.strftime("%d/%m/%Y")
+
+    fig = go.Figure(go.Heatmap(
+        z=z, text=text, colorscale="Greens", xgap=3, ygap=3,
+        y=["T2", "T3", "T4", "T5", "T6", "T7", "CN"],
+        hovertemplate="%{text}: %{z} lượt<extra></extra>"
+    ))
+    fig.update_layout(
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font_color='white',
+        height=260,
+        xaxis=dict(showticklabels=False),
+        yaxis=dict(autorange="reversed")
+    )
+    return fig, next_midnight(now)
+
+def leaderboard_section(username):
+    """Top 10 mỗi bảng xếp hạng (đọc từ bảng materialized, không quét file user)."""
+    boards = [("reviews_week", "🔥 Lượt ôn tuần này"), ("streak", "📅 Chuỗi ngày học"),
+              ("words_mastered", "🏅 Từ đã thuộc")]
+    with st.expander("🏆 Bảng xếp hạng"):
+        for tab, (metric, label) in zip(st.tabs([label for _, label in boards]), boards):
+            with tab:
+                rows = leaderboard.top(metric, 10)
+                if not rows:
+                    st.caption("Chưa có dữ liệu")
+                    continue
+                for i, (name, value) in enumerate(rows, 1):
+                    mark = " ⬅️" if name == username else ""
+                    st.markdown(f"{i}. **{name}** — {value}{mark}")
+
+def progress_io_section(username):
+    """Xuất / nhập tiến độ (CSV, Anki .apkg) — ghi file user 1 lần khi nhập."""
+    import tempfile
+
+    with st.expander("🔄 Xuất / nhập tiến độ (CSV, Anki)"):
+        fmt = st.radio("Định dạng", ["csv", "apkg"], horizontal=True, key="progress_export_fmt")
+        if st.button("📤 Tạo file xuất", key="progress_export"):
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, f"{username}.{fmt}")
+                full_data = vocab_store.full_user(st.session_state.user_data, session_store())
+                if fmt == "csv":
+                    progress_io.export_csv(full_data, path)
+                else:
+                    progress_io.export_apkg(full_data, path)
+                with open(path, "rb") as f:
+                    st.session_state.progress_export_file = (os.path.basename(path), f.read())
+        if st.session_state.get("progress_export_file"):
+            name, data = st.session_state.progress_export_file
+            st.download_button(f"⬇️ Tải {name}", data, file_name=name, key="progress_download")
+
+        uploaded = st.file_uploader("Nhập từ CSV / .apkg", type=["csv", "apkg"], key="progress_upload")
+        overwrite = st.checkbox("Ghi đè từ đã có", key="progress_overwrite")
+        if uploaded is not None and st.button("📥 Nhập", key="progress_import"):
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, os.path.basename(uploaded.name))
+                with open(path, "wb") as f:
+                    f.write(uploaded.getbuffer())
+                try:
+                    user_data, counts = progress_io.import_file(path, username, overwrite, USER_FOLDER)
+                except progress_io.IMPORT_ERRORS as e:
+                    st.error(f"❌ Không nhập được: {e}")
+                    return
+            set_session_user(user_data, user_data.get("revision"))
+            st.session_state.pop("word_table_index", None)
+            st.success(
+                f"✅ Đã nhập {counts['words']} thẻ ôn tập, {counts['pending_words']} từ chờ học, "
+                f"{counts['knew_words']} từ đã biết"
+            )
+
+@st.cache_data(show_spinner=False)
+def _read_analytics_summary(path, mtime):
+    return read_json(path)
+
+def load_analytics_summary():
+    """Đọc summary của analytics_job (cache theo mtime, job chạy lại thì tự đọc lại)."""
+    if not os.path.exists(ANALYTICS_SUMMARY):
+        return None
+    return _read_analytics_summary(ANALYTICS_SUMMARY, os.path.getmtime(ANALYTICS_SUMMARY))
+
+@metrics.instrument("add_words_page")
 def add_words_page():
     st.title("➕ Thêm Từ Mới")
     
@@ -463,17 +989,15 @@ def add_words_page():
         st.session_state.show_words = True
 
     if st.session_state.show_words:
-        topic_path = os.path.join(TOPIC_FOLDER, selected_topic)
-        topic_data = read_json(topic_path)
+        # Topic lấy từ kho dùng chung, không đọc lại file cho mỗi session
+        topic_data = get_vocab_store()["topics"].get(selected_topic[:-5], {})
         
         user_data = st.session_state.user_data
         
-        new_words = {}
-        for word_id, info in topic_data.items():
-            if (word_id not in user_data["words"]
-                    and word_id not in user_data.get("knew_words", {})
-                    and word_id not in user_data.get("pending_words", {})):
-                new_words[word_id] = info
+        # Từ chưa thêm + từ đã học dưới id khác ở topic khác
+        new_words, dup_words = word_index.split_topic_words(
+            selected_topic[:-5], topic_data, get_word_index(), user_data
+        )
 
         # Từ đang chờ học (đã thêm nhưng chưa học)
         pending_in_topic = {
@@ -484,6 +1008,23 @@ def add_words_page():
         if pending_in_topic:
             st.info(f"⏳ Có **{len(pending_in_topic)}** từ bạn đã thêm nhưng chưa học xong. Vào **🎓 Học từ vựng** để hoàn thành!")
 
+        if dup_words:
+            section_label = {"words": "đang ôn", "knew_words": "đã biết", "pending_words": "chờ học"}
+            with st.expander(f"🔗 {len(dup_words)} từ bạn đã có ở topic khác"):
+                for word_id, (section, learned_id) in dup_words.items():
+                    info = topic_data[word_id]
+                    col1, col2 = st.columns([4, 1])
+                    col1.write(f"**{info['word']}** {info['pos']} — {section_label[section]} ({learned_id})")
+                    if col2.button("🔗 Dùng chung", key=f"alias_{word_id}"):
+                        word_index.link_alias(user_data, word_id, learned_id)
+                        save_user_data(st.session_state.username, user_data)
+                        st.rerun()
+                if st.button("🔗 Dùng chung tất cả", key="alias_all"):
+                    for word_id, (_, learned_id) in dup_words.items():
+                        word_index.link_alias(user_data, word_id, learned_id)
+                    save_user_data(st.session_state.username, user_data)
+                    st.rerun()
+
         if not new_words:
             st.success("🎉 Bạn đã thêm hết từ vựng trong topic này!")
         else:
@@ -517,81 +1058,101 @@ def add_words_page():
                     with col1:
                         if st.button("✅ Đã biết", key=f"know_{i}"):
                             add_knew_word_to_user(word_id, topic_data, user_data, st.session_state.username)
-                            st.session_state.user_data = read_json(
-                                os.path.join(USER_FOLDER, f"{st.session_state.username}.json")
-                            )
+                            reload_user_data(st.session_state.username)
                             st.success(f"Đã thêm '{info['word']}' vào danh sách từ đã biết!")
                             st.rerun()
                     with col2:
                         if st.button("➕ Thêm vào học", key=f"add_{i}"):
                             add_word_to_pending(word_id, topic_data, user_data, st.session_state.username)
-                            st.session_state.user_data = read_json(
-                                os.path.join(USER_FOLDER, f"{st.session_state.username}.json")
-                            )
+                            reload_user_data(st.session_state.username)
                             st.success(f"Đã thêm '{info['word']}' vào hàng chờ! Vào 🎓 Học từ vựng để học.")
                             st.rerun()
 
+@metrics.instrument("learn_words_page")
 def learn_words_page():
-    import random
     st.title("🎓 Học từ vựng mới")
 
     user_data = st.session_state.user_data
     pending_words = user_data.get("pending_words", {})
+    session = st.session_state.get("learn_session")
+
+    if session is None:
+        if not pending_words:
+            learned_count = len(user_data.get("words", {}))
+            if learned_count > 0:
+                st.success("🎉 Không có từ mới nào chờ học! Bạn đã học hết rồi.")
+                st.info("💡 Hãy thêm từ mới ở mục **➕ Thêm từ mới**.")
+            else:
+                st.warning("Bạn chưa thêm từ nào vào danh sách học. Hãy vào '➕ Thêm từ mới' trước!")
+            return
 
-    if not pending_words:
-        learned_count = len(user_data.get("words", {}))
-        if learned_count > 0:
-            st.success("🎉 Không có từ mới nào chờ học! Bạn đã học hết rồi.")
-            st.info("💡 Hãy thêm từ mới ở mục **➕ Thêm từ mới**.")
-        else:
-            st.warning("Bạn chưa thêm từ nào vào danh sách học. Hãy vào '➕ Thêm từ mới' trước!")
-        return
-
-    word_list = list(pending_words.items())  # [(word_id, word_data), ...]
-    st.info(f"📚 Bạn có **{len(word_list)}** từ mới cần học")
+        new_ids = load_balance.apply_cap(list(pending_words), user_data, "new_words")
+        if not new_ids:
+            st.success(f"🎯 Bạn đã học đủ {load_balance.MAX_NEW_PER_DAY} từ mới hôm nay. Quay lại vào ngày mai nhé!")
+            return
 
-    # --- Khởi tạo session state ---
-    if "learn_index" not in st.session_state:
-        st.session_state.learn_index = 0
-        st.session_state.learn_mode = None
+        # --- Khởi tạo phiên học (1 lần) ---
+        session = build_learn_session({
+            word_id: word_view(word_id, pending_words[word_id]) for word_id in new_ids
+        })
+        st.session_state.learn_session = session
         st.session_state.learn_answered = False
         st.session_state.learn_correct = None
-        st.session_state.learn_choices = []
         st.session_state.learn_fill_input = ""
 
+    cards = session["cards"]
+    st.info(f"📚 Bạn có **{len(cards)}** từ mới cần học")
+
     # Nếu học xong tất cả
-    if st.session_state.learn_index >= len(word_list):
+    if session["pos"] >= len(cards):
         st.success("🎊 Bạn đã hoàn thành toàn bộ từ mới trong phiên này!")
         st.balloons()
         if st.button("🔄 Học lại từ đầu"):
-            for k in ["learn_index", "learn_mode", "learn_answered", "learn_correct", "learn_choices", "learn_fill_input"]:
+            for k in ["learn_session", "learn_answered", "learn_correct", "learn_fill_input"]:
                 st.session_state.pop(k, None)
             st.rerun()
         return
 
-    word_id, word_data = word_list[st.session_state.learn_index]
-
-    # --- Progress ---
-    progress = (st.session_state.learn_index + 1) / len(word_list)
-    st.progress(progress)
-    st.write(f"Từ {st.session_state.learn_index + 1}/{len(word_list)}")
+    if st.session_state.get("fast_cards"):
+        learn_batch(session)
+        return
+    learn_card()
 
-    # --- Chọn chế độ ngẫu nhiên nếu chưa có ---
-    if st.session_state.learn_mode is None:
-        # Nếu chưa có đủ từ khác để làm trắc nghiệm thì dùng fill
-        if len(word_list) >= 4:
-            st.session_state.learn_mode = random.choice(["mc", "fill"])
-        else:
-            st.session_state.learn_mode = "fill"
+def learn_batch(session):
+    """Chế độ thẻ trên trình duyệt: 1 lô thẻ, 1 lượt gọi server khi gửi cả lô."""
+    batch_id = f"learn:{session['started_at']}:{session['pos']}"
+    result = flashcards.flashcard_batch(
+        flashcards.learn_payload(session["cards"], session["pos"]), "learn", batch_id
+    )
+    if result:
+        username = st.session_state.username
+        promote_pending_batch([a["id"] for a in result["answers"]], st.session_state.user_data, username)
+        reload_user_data(username)
+        session["pos"] = flashcards.answered_until(result["answers"])
+        st.session_state.learn_answered = False
+        st.session_state.learn_correct = None
+        st.rerun()
 
-        if st.session_state.learn_mode == "mc":
-            other_words = [w for wid, w in word_list if wid != word_id]
-            wrong_choices = random.sample(other_words, min(3, len(other_words)))
-            choices = [(word_data["meaning"], True)] + [(w["meaning"], False) for w in wrong_choices]
-            random.shuffle(choices)
-            st.session_state.learn_choices = choices
+@st.fragment
+@metrics.instrument("learn_card")
+def learn_card():
+    """
+    Thẻ đang học. Các nút trong thẻ chỉ chạy lại fragment này (không chạy lại
+    CSS, sidebar, phần đầu trang); hết phiên mới chạy lại cả trang.
+    """
+    session = st.session_state.learn_session
+    cards = session["cards"]
+    card = cards[session["pos"]]
+    word_id = card["word_id"]
+    word_data = card["data"]
+    mode = card["mode"]
+    # Sinh trước audio của thẻ này và vài thẻ kế tiếp trong lúc user đang trả lời
+    prefetch.schedule_cards([c["data"] for c in cards[session["pos"]:session["pos"] + prefetch.AHEAD + 1]])
 
-    mode = st.session_state.learn_mode
+    # --- Progress ---
+    progress = (session["pos"] + 1) / len(cards)
+    st.progress(progress)
+    st.write(f"Từ {session['pos'] + 1}/{len(cards)}")
 
     # ==================
     # DẠNG 1: Trắc nghiệm (MC)
@@ -604,12 +1165,12 @@ def learn_words_page():
         </div>
         """, unsafe_allow_html=True)
 
-        for i, (choice_text, is_correct) in enumerate(st.session_state.learn_choices):
+        for i, (choice_text, is_correct) in enumerate(card["choices"]):
             if not st.session_state.learn_answered:
                 if st.button(choice_text, key=f"mc_{i}"):
                     st.session_state.learn_answered = True
                     st.session_state.learn_correct = is_correct
-                    st.rerun()
+                    rerun_card()
             else:
                 if is_correct:
                     st.success(f"✅ {choice_text}")
@@ -622,34 +1183,22 @@ def learn_words_page():
     elif mode == "fill":
         word = word_data["word"]
 
-        def mask_word(w):
-            if len(w) <= 2:
-                return w[0] + "_" * (len(w) - 1)
-            masked = list("_" * len(w))
-            masked[0] = w[0]
-            masked[-1] = w[-1]
-            for i in range(2, len(w) - 1, 3):
-                masked[i] = w[i]
-            return "".join(masked)
-
-        hint = mask_word(word)
-
         st.markdown(f"""
         <div class="word-card">
             <p style="text-align:center; color:#555; font-size:1.1rem;">Nghĩa: <b>{word_data['meaning']}</b></p>
             <p style="text-align:center; color:#555;">Ví dụ: <i>{word_data.get('example','')}</i></p>
-            <h2 style="text-align:center; letter-spacing:6px; color:#1f77b4;">{hint}</h2>
+            <h2 style="text-align:center; letter-spacing:6px; color:#1f77b4;">{card['hint']}</h2>
             <p style="text-align:center; color:#aaa;">({len(word)} chữ cái)</p>
         </div>
         """, unsafe_allow_html=True)
 
         if not st.session_state.learn_answered:
-            user_input = st.text_input("Nhập từ tiếng Anh:", key=f"fill_{st.session_state.learn_index}")
+            user_input = st.text_input("Nhập từ tiếng Anh:", key=f"fill_{session['pos']}")
             if st.button("✔️ Kiểm tra"):
                 st.session_state.learn_answered = True
                 st.session_state.learn_correct = user_input.strip().lower() == word.lower()
                 st.session_state.learn_fill_input = user_input.strip()
-                st.rerun()
+                rerun_card()
 
     # ==================
     # Hiện kết quả & nút tiếp
@@ -665,91 +1214,193 @@ def learn_words_page():
 
         st.markdown(f"**Ví dụ:** {word_data.get('example','')}")
         st.markdown(f"*{word_data.get('example_meaning','')}*")
+        col1, col2, _ = st.columns([1, 1, 4])
+        if col1.button("🔊 Từ", key=f"learn_sound_word_{session['pos']}"):
+            play_sound(word_data["word"])
+        if word_data.get("example") and col2.button("🔊 Ví dụ", key=f"learn_sound_example_{session['pos']}"):
+            play_sound(word_data["example"])
 
         if st.button("➡️ Từ tiếp theo"):
             # ✅ Chỉ ở đây mới promote từ pending → words (SRS) và tính stats
-            promote_pending_to_words(word_id, user_data, st.session_state.username)
-            st.session_state.user_data = read_json(
-                os.path.join(USER_FOLDER, f"{st.session_state.username}.json")
-            )
+            promote_pending_to_words(word_id, st.session_state.user_data, st.session_state.username)
+            reload_user_data(st.session_state.username)
 
-            st.session_state.learn_index += 1
-            st.session_state.learn_mode = None
+            # Phiên học giữ danh sách riêng nên xoá pending không làm lệch vị trí
+            session["pos"] += 1
             st.session_state.learn_answered = False
             st.session_state.learn_correct = None
-            st.session_state.learn_choices = []
             st.session_state.learn_fill_input = ""
+            if session["pos"] < len(cards):
+                rerun_card()
             st.rerun()
 
+def learned_words_table(user_data):
+    """Bảng từ đã học có phân trang / sắp xếp / lọc; chỉ render các dòng của trang hiện tại."""
+    words = user_data.get("words", {})
+    if not words:
+        return
+
+    fingerprint = words_fingerprint(user_data)
+    cached = st.session_state.get("word_table_index")
+    if cached is None or cached[0] != fingerprint:
+        cached = (fingerprint, build_word_table_index(words, get_topic_map()))
+        st.session_state.word_table_index = cached
+    index = cached[1]
+
+    st.subheader(f"📖 Từ đã học ({len(words)})")
+    col1, col2, col3, col4 = st.columns([2, 2, 1, 1])
+    with col1:
+        topics = sorted({k[3] for k in index["keys"] if k[3]})
+        topic = st.selectbox("Topic", ["Tất cả"] + topics, key="word_table_topic")
+    with col2:
+        sort_label = st.selectbox("Sắp xếp theo", list(WORD_TABLE_SORTS), key="word_table_sort")
+    with col3:
+        descending = st.toggle("Giảm dần", key="word_table_desc")
+    with col4:
+        min_reviews = st.number_input("Số lần ôn ≥", min_value=0, step=1, key="word_table_min_reviews")
+
+    view = word_table_view(
+        index, WORD_TABLE_SORTS[sort_label],
+        None if topic == "Tất cả" else topic, int(min_reviews)
+    )
+    if not view:
+        st.info("Không có từ nào khớp bộ lọc.")
+        return
+
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        page_size = st.selectbox("Số dòng / trang", WORD_TABLE_PAGE_SIZES, key="word_table_page_size")
+    pages = (len(view) + page_size - 1) // page_size
+    with col2:
+        page = st.number_input(f"Trang (1–{pages})", min_value=1, max_value=pages, step=1, key="word_table_page")
+    page = min(int(page), pages)
+
+    start, end = (page - 1) * page_size, min(page * page_size, len(view))
+    if descending:
+        visible = view[len(view) - end:len(view) - start][::-1]
+    else:
+        visible = view[start:end]
+
+    rows_html = ""
+    for i in visible:
+        word_id = index["ids"][i]
+        w = word_view(word_id, words[word_id])
+        next_review = datetime.fromisoformat(w["next_review"]).strftime("%d/%m/%Y %H:%M")
+        rows_html += (
+            "<tr style='border-bottom: 1px solid rgba(255,255,255,0.1);'>"
+            f"<td style='padding:10px;'>{w['word']}</td>"
+            f"<td style='padding:10px;'>{w['meaning']}</td>"
+            f"<td style='padding:10px;'>{w.get('example', '')}</td>"
+            f"<td style='padding:10px;'>{w.get('example_meaning', '')}</td>"
+            f"<td style='padding:10px;'>{index['keys'][i][3]}</td>"
+            f"<td style='padding:10px;'>{w['review_count']}</td>"
+            f"<td style='padding:10px;'>{next_review}</td>"
+            "</tr>"
+        )
+
+    table_html = (
+        "<table style='width:100%; border-collapse:collapse; background:transparent; color:white;'>"
+        "<thead><tr style='border-bottom: 1px solid rgba(255,255,255,0.3);'>"
+        "<th style='padding:10px; text-align:left;'>Từ</th>"
+        "<th style='padding:10px; text-align:left;'>Nghĩa</th>"
+        "<th style='padding:10px; text-align:left;'>Ví dụ</th>"
+        "<th style='padding:10px; text-align:left;'>Nghĩa ví dụ</th>"
+        "<th style='padding:10px; text-align:left;'>Topic</th>"
+        "<th style='padding:10px; text-align:left;'>Số lần ôn</th>"
+        "<th style='padding:10px; text-align:left;'>Ôn tiếp theo</th>"
+        "</tr></thead>"
+        f"<tbody>{rows_html}</tbody></table>"
+    )
+    st.markdown(table_html, unsafe_allow_html=True)
+    st.caption(f"Hiển thị {start + 1}–{end} / {len(view)} từ")
+
+@metrics.instrument("review_page")
 def review_page():
     st.title("📝 Ôn Tập Từ Vựng")
     
     user_data = st.session_state.user_data
-    due_words = get_due_words(user_data)
-    len_due = len(due_words)
-    
-    if not due_words:
+    username = st.session_state.username
+    session = user_data.get("review_session")
+    now = datetime.now()
+
+    if session is None:
+        due_words = load_balance.apply_cap(get_due_words(user_data), user_data, "reviews")
+        if due_words:
+            session = start_review_session(due_words, user_data, username)
+            st.session_state.show_answer = False
+            st.session_state.review_checked_at = now
+    elif now - st.session_state.get("review_checked_at", datetime.min) >= timedelta(seconds=REVIEW_RESCAN_SECONDS):
+        append_late_due_words(session, user_data)
+        st.session_state.review_checked_at = now
+
+    if session is None:
+        if load_balance.remaining_today(user_data, "reviews") == 0:
+            st.success(f"🎯 Bạn đã ôn đủ {load_balance.MAX_REVIEWS_PER_DAY} lượt hôm nay. Các từ còn lại để ngày mai nhé!")
+            learned_words_table(user_data)
+            return
         st.success("🎉 Tuyệt vời! Bạn chưa có từ nào cần ôn tập.")
         st.info("💡 Hãy quay lại sau hoặc thêm từ mới để học!")
-        # Tạo bảng đẹp từ words
-        display_data = []
-        for word_id, w in user_data["words"].items():
-            next_review = datetime.fromisoformat(w["next_review"])
-            display_data.append({
-                "Từ": w["word"],
-                "Nghĩa": w["meaning"],
-                "Ví dụ": w.get("example", ""),
-                "Nghĩa ví dụ": w.get("example_meaning", ""),
-                "Ôn tiếp theo": next_review.strftime("%d/%m/%Y %H:%M")
-            })
-
-        df_display = pd.DataFrame(display_data)
-        rows_html = ""
-        for row in display_data:
-            rows_html += (
-                "<tr style='border-bottom: 1px solid rgba(255,255,255,0.1);'>"
-                f"<td style='padding:10px;'>{row['Từ']}</td>"
-                f"<td style='padding:10px;'>{row['Nghĩa']}</td>"
-                f"<td style='padding:10px;'>{row['Ví dụ']}</td>"
-                f"<td style='padding:10px;'>{row['Nghĩa ví dụ']}</td>"
-                f"<td style='padding:10px;'>{row['Ôn tiếp theo']}</td>"
-                "</tr>"
-            )
-
-        table_html = (
-            "<table style='width:100%; border-collapse:collapse; background:transparent; color:white;'>"
-            "<thead><tr style='border-bottom: 1px solid rgba(255,255,255,0.3);'>"
-            "<th style='padding:10px; text-align:left;'>Từ</th>"
-            "<th style='padding:10px; text-align:left;'>Nghĩa</th>"
-            "<th style='padding:10px; text-align:left;'>Ví dụ</th>"
-            "<th style='padding:10px; text-align:left;'>Nghĩa ví dụ</th>"
-            "<th style='padding:10px; text-align:left;'>Ôn tiếp theo</th>"
-            "</tr></thead>"
-            f"<tbody>{rows_html}</tbody></table>"
-        )
-        st.markdown(table_html, unsafe_allow_html=True)
+        learned_words_table(user_data)
         return
     
-    st.info(f"📚 Bạn có **{len_due}** từ cần ôn tập")
-    
-    if "review_index" not in st.session_state:
-        st.session_state.review_index = 0
+    if "show_answer" not in st.session_state:
+        st.session_state.show_answer = False
+
+    word_id = current_review_word(session, user_data)
+    if word_id is None and append_late_due_words(session, user_data):
+        word_id = current_review_word(session, user_data)
+
+    if word_id is None:
+        # Hết hàng đợi → xoá phiên (lần sau chụp lại hàng đợi mới), file user không giữ hàng đợi đã ôn
+        del user_data["review_session"]
+        save_user_data(username, user_data)
         st.session_state.show_answer = False
-    
-    if st.session_state.review_index >= len(due_words):
         st.success("🎊 Chúc mừng! Bạn đã hoàn thành phiên ôn tập!")
-        if st.button("🔄 Bắt đầu lại"):
-            st.session_state.review_index = 0
-            st.session_state.show_answer = False
-            st.rerun()
+        learned_words_table(user_data)
         return
+
+    if st.session_state.get("fast_cards"):
+        review_batch(session, user_data, username)
+        return
+    review_card()
+
+def review_batch(session, user_data, username):
+    """Chế độ thẻ trên trình duyệt: lật thẻ / trả lời cả lô rồi mới gọi server 1 lần."""
+    batch_id = f"review:{session['started_at']}:{session.get('done', 0) + session['pos']}"
+    cards = flashcards.review_payload(session["queue"], session["pos"], user_data["words"], word_view)
+    result = flashcards.flashcard_batch(cards, "review", batch_id)
+    if result:
+        # Tiến phiên trước để update_srs_batch lưu luôn vị trí mới vào file
+        session["pos"] = flashcards.answered_until(result["answers"])
+        update_srs_batch([(a["id"], a["correct"]) for a in result["answers"]], user_data, username)
+        reload_user_data(username)
+        st.rerun()
+
+@st.fragment
+@metrics.instrument("review_card")
+def review_card():
+    """Thẻ đang ôn: lật thẻ / trả lời chỉ chạy lại fragment này, hết hàng đợi mới chạy lại cả trang."""
+    user_data = st.session_state.user_data
+    username = st.session_state.username
+    session = user_data["review_session"]
+    word_id = current_review_word(session, user_data)
+    if word_id is None:
+        st.rerun()
+
+    queue_len = len(session["queue"])
+    st.info(f"📚 Bạn có **{queue_len - session['pos']}** từ cần ôn tập")
+
+    word_data = word_view(word_id, user_data["words"][word_id])
+    words = user_data["words"]
+    prefetch.schedule_cards([word_data] + [
+        word_view(wid, words[wid])
+        for wid in session["queue"][session["pos"] + 1:session["pos"] + 1 + prefetch.AHEAD]
+        if wid in words
+    ])
     
-    word_id = due_words[st.session_state.review_index]
-    word_data = user_data["words"][word_id]
-    
-    progress = (st.session_state.review_index + 1) / len(due_words)
-    st.progress(progress)
-    st.write(f"Từ {st.session_state.review_index + 1}/{len(due_words)}")
+    done = session.get("done", 0)
+    st.progress((done + session["pos"] + 1) / (done + queue_len))
+    st.write(f"Từ {done + session['pos'] + 1}/{done + queue_len}")
     
     st.markdown(f"""
     <div class="word-card">
@@ -758,10 +1409,13 @@ def review_page():
     </div>
     """, unsafe_allow_html=True)
     
+    if st.button("🔊 Phát âm", key=f"review_sound_{word_id}"):
+        play_sound(word_data["word"])
+
     if not st.session_state.show_answer:
         if st.button("👁️ Xem đáp án", use_container_width=True):
             st.session_state.show_answer = True
-            st.rerun()
+            rerun_card()
     else:
         st.markdown(f"""
         <div class="word-card">
@@ -778,27 +1432,27 @@ def review_page():
         
         with col1:
             if st.button("✅ Nhớ rồi", use_container_width=True, type="primary"):
-                update_srs(word_id, True, user_data, st.session_state.username)
-                st.session_state.user_data = read_json(
-                    os.path.join(USER_FOLDER, f"{st.session_state.username}.json")
-                )
-                st.session_state.review_index += 1
+                # Tiến phiên trước để update_srs lưu luôn vị trí mới vào file
+                advance_review_session(session)
+                update_srs(word_id, True, user_data, username)
+                reload_user_data(username)
                 st.session_state.show_answer = False
-                st.rerun()
+                rerun_card()
         
         with col2:
             if st.button("❌ Chưa nhớ", use_container_width=True):
-                update_srs(word_id, False, user_data, st.session_state.username)
-                st.session_state.user_data = read_json(
-                    os.path.join(USER_FOLDER, f"{st.session_state.username}.json")
-                )
-                st.session_state.review_index += 1
+                # Tiến phiên trước để update_srs lưu luôn vị trí mới vào file
+                advance_review_session(session)
+                update_srs(word_id, False, user_data, username)
+                reload_user_data(username)
                 st.session_state.show_answer = False
-                st.rerun()
+                rerun_card()
 
 # =====================
 # MAIN APP
 # =====================
+# So sánh với learn_card / review_card: chi phí 1 lần chạy lại cả trang vs chỉ thẻ
+@metrics.instrument("script_run")
 def main():
     os.makedirs(TOPIC_FOLDER, exist_ok=True)
     os.makedirs(USER_FOLDER, exist_ok=True)
@@ -820,16 +1474,22 @@ def main():
                 label_visibility="collapsed"
             )
             
+            st.toggle("⚡ Thẻ trên trình duyệt", key="fast_cards",
+                      help=f"Học / ôn theo lô {flashcards.BATCH_SIZE} thẻ, chỉ gửi về server khi xong lô")
             st.markdown("---")
             if st.button("🚪 Đăng xuất"):
+                due_scheduler.forget(st.session_state.username)
                 st.session_state.logged_in = False
                 st.session_state.username = None
                 st.session_state.user_data = None
-                for k in ["review_index", "show_answer", "learn_index", "learn_mode",
-                          "learn_answered", "learn_correct", "learn_choices", "learn_fill_input"]:
+                st.session_state.pop("vocab_store", None)
+                for k in ["show_answer", "review_checked_at", "word_table_index", "learn_session",
+                          "learn_answered", "learn_correct", "learn_fill_input", "render_cache",
+                          "user_version", "user_file_version", "current_page", "progress_export_file", "user_base"]:
                     st.session_state.pop(k, None)
                 st.rerun()
         
+        st.session_state.current_page = page
         if page == "🏠 Trang chủ":
             dashboard_page()
         elif page == "➕ Thêm từ mới":
@@ -841,19 +1501,27 @@ def main():
         elif page == "📊 Thống kê":
             dashboard_page()
         
-        import time
-        placeholder = st.empty()
-        with placeholder.container():
-            st.sidebar.write("---")
-            countdown_placeholder = st.sidebar.empty()
-            
-        REFRESH_INTERVAL = 3
+        if REFRESH_INTERVAL <= 0:
+            return
 
-        for remaining in range(REFRESH_INTERVAL, 0, -1):
-            countdown_placeholder.caption(f"🔄 Cập nhật sau: {remaining}s")
-            time.sleep(1)
-        
-        reload_user_data(st.session_state.username)
+        with st.sidebar:
+            st.write("---")
+            auto_refresh()
+
+@st.fragment(run_every=max(REFRESH_INTERVAL, 1))
+def auto_refresh():
+    """
+    Chạy mỗi REFRESH_INTERVAL giây (chỉ fragment này): đọc revision file user, nếu không
+    đổi và render cache của trang chưa hết hạn thì không làm gì thêm. Chỉ khi
+    file đổi (thiết bị / process khác ghi) hoặc có từ mới đến hạn mới tải lại và
+    chạy lại cả trang.
+    """
+    st.caption(f"🔄 Tự cập nhật mỗi {REFRESH_INTERVAL}s")
+    username = st.session_state.username
+    if user_file_version(username) != st.session_state.get("user_file_version"):
+        reload_user_data(username)
+        st.rerun()
+    if render_cache_expired(st.session_state.get("current_page")):
         st.rerun()
 
 if __name__ == "__main__":
@@ -0,0 +1,234 @@
+"""
+Import hàng loạt file Excel/CSV thành topic JSON, chạy song song bằng process pool.
+
+Mỗi file (1 task) được đọc, kiểm tra từng dòng rồi gán id ổn định (word_ids):
+    - thiếu cột bắt buộc → bỏ cả file
+    - word / meaning rỗng (ô trống / NaN / chỉ có khoảng trắng) → bỏ dòng
+    - chữ "none", "null", "nan"... là từ thật, giữ nguyên nhưng báo cảnh báo
+      (có thể là ô trống bị xuất ra thành chữ ở file nguồn)
+    - trùng word|pos trong cùng file → giữ dòng đầu, bỏ các dòng sau
+Topic mới được ghi ra <topic>.json.tmp; chỉ khi mọi file xử lý xong mới đổi
+tên hàng loạt sang file thật (--strict: có lỗi ở bất kỳ file nào thì không ghi gì).
+Cuối cùng in 1 báo cáo tổng hợp (và ghi JSON nếu có --report).
+
+Cách dùng:
+    python batch_import.py imports/                       # mọi .xlsx/.xls/.csv trong thư mục
+    python batch_import.py "imports/**/*.xlsx" --workers 16 --report report.json
+    python batch_import.py imports/ --strict --migrate    # migrate user theo remap
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import shared_state
+from storage import read_json, save_json
+from word_ids import (assign_ids, content_key, migrate_users, remap_payload,
+                      save_remap, stage_topic, topic_slug)
+
+TOPIC_FOLDER = "Topics"
+REQUIRED_COLUMNS = ("word", "pos", "meaning", "example", "example_meaning")
+REQUIRED_VALUES = ("word", "meaning")
+EXTENSIONS = (".xlsx", ".xls", ".csv")
+PLACEHOLDER_STRINGS = ("nan", "none", "null", "n/a")   # giữ nguyên nhưng cảnh báo
+
+# =====================
+# WORKER
+# =====================
+def read_table(path):
+    import pandas as pd
+    if path.lower().endswith(".csv"):
+        return pd.read_csv(path, dtype=str, keep_default_na=False)
+    return pd.read_excel(path, dtype=str)
+
+def clean_cell(value):
+    """Chuẩn hoá 1 ô: ô trống thật (None / NaN / NaT) → "", chuỗi thì bỏ khoảng trắng 2 đầu."""
+    import pandas as pd
+    if value is None or pd.isna(value):
+        return ""
+    return str(value).strip()
+
+def validate_rows(records):
+    """
+    Kiểm tra danh sách dòng (dict cột → ô). Trả về (entries hợp lệ, issues).
+    issue = {"row": số dòng trong file (tính cả header), "level": "error"|"warning", "msg": ...}
+    """
+    entries, issues, seen = [], [], {}
+    for i, record in enumerate(records):
+        row_no = i + 2
+        entry = {col: clean_cell(record.get(col)) for col in REQUIRED_COLUMNS}
+
+        empty = [col for col in REQUIRED_VALUES if not entry[col]]
+        if empty:
+            issues.append({"row": row_no, "level": "error", "msg": f"thiếu {', '.join(empty)}"})
+            continue
+
+        key = content_key(entry)
+        if key in seen:
+            issues.append({"row": row_no, "level": "error",
+                           "msg": f"trùng '{entry['word']}' với dòng {seen[key]}"})
+            continue
+        seen[key] = row_no
+        entries.append(entry)
+        placeholders = [col for col in REQUIRED_COLUMNS if entry[col].lower() in PLACEHOLDER_STRINGS]
+        if placeholders:
+            issues.append({"row": row_no, "level": "warning",
+                           "msg": ", ".join(f"{col} = '{entry[col]}'" for col in placeholders)
+                                  + " — giữ như chữ thật, kiểm tra lại nếu là ô trống"})
+    return entries, issues
+
+def convert_file(path, topic_folder):
+    """Xử lý 1 file: đọc, kiểm tra, ghi topic ra file tạm. Trả về báo cáo của file."""
+    output_name = os.path.splitext(os.path.basename(path))[0] + ".json"
+    output_path = os.path.join(topic_folder, output_name)
+    report = {"file": path, "topic": output_path, "rows": 0, "imported": 0,
+              "issues": [], "diff": None, "staged": None, "remap": None}
+    try:
+        df = read_table(path)
+    except Exception as e:   # file hỏng / thiếu openpyxl... → ghi vào báo cáo, không dừng cả lô
+        report["issues"].append({"row": None, "level": "error", "msg": f"không đọc được: {e}"})
+        return report
+
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    missing = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing:
+        report["issues"].append({"row": None, "level": "error", "msg": f"thiếu cột: {', '.join(missing)}"})
+        return report
+
+    entries, issues = validate_rows(df.to_dict("records"))
+    report.update(rows=len(df), imported=len(entries), issues=issues)
+    if not entries:
+        return report
+
+    new_vocab = assign_ids(topic_slug(output_name), entries)
+    old_vocab = read_json(output_path) if os.path.exists(output_path) else {}
+    diff, staged = stage_topic(output_path, old_vocab, new_vocab)
+    report["diff"] = {k: len(v) for k, v in diff.items()}
+    report["staged"] = staged
+    report["remap"] = remap_payload(output_path, old_vocab, diff)
+    return report
+
+# =====================
+# DRIVER
+# =====================
+def collect_files(patterns):
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, _, names in os.walk(pattern):
+                files += [os.path.join(root, n) for n in names if n.lower().endswith(EXTENSIONS)]
+        else:
+            files += [f for f in glob.glob(pattern, recursive=True) if f.lower().endswith(EXTENSIONS)]
+    return sorted(set(files))
+
+def has_errors(report):
+    return any(issue["level"] == "error" for issue in report["issues"])
+
+def run(files, topic_folder=TOPIC_FOLDER, workers=None, strict=False):
+    os.makedirs(topic_folder, exist_ok=True)
+
+    # 2 file cùng tên (khác thư mục) sẽ ghi đè cùng 1 topic → báo lỗi, chỉ lấy file đầu
+    by_topic, reports = {}, []
+    for path in files:
+        topic = os.path.splitext(os.path.basename(path))[0].lower()
+        if topic in by_topic:
+            reports.append({"file": path, "topic": None, "rows": 0, "imported": 0, "diff": None,
+                            "staged": None, "remap": None,
+                            "issues": [{"row": None, "level": "error",
+                                        "msg": f"trùng tên topic với {by_topic[topic]}"}]})
+        else:
+            by_topic[topic] = path
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        chunksize = max(1, len(by_topic) // ((workers or os.cpu_count() or 1) * 4))
+        reports += pool.map(convert_file, by_topic.values(),
+                            [topic_folder] * len(by_topic), chunksize=chunksize)
+
+    staged = [r for r in reports if r["staged"]]
+    if strict and any(has_errors(r) for r in reports):
+        for r in staged:
+            os.remove(r["staged"])
+            r["staged"] = None
+        return reports, False
+
+    # Đổi tên hàng loạt sau khi mọi file đã xử lý xong
+    for r in staged:
+        os.replace(r["staged"], r["topic"])
+        if r["remap"]:
+            r["remap_file"] = save_remap(r["topic"], r["remap"])
+    if staged:
+        shared_state.bump("topics")
+    return reports, True
+
+def summarize(reports, committed, elapsed):
+    files_ok = sum(1 for r in reports if r["imported"] and not r["issues"])
+    errors = sum(1 for r in reports for i in r["issues"] if i["level"] == "error")
+    warnings = sum(1 for r in reports for i in r["issues"] if i["level"] == "warning")
+    return {
+        "files": len(reports),
+        "files_clean": files_ok,
+        "files_with_issues": sum(1 for r in reports if r["issues"]),
+        "rows": sum(r["rows"] for r in reports),
+        "imported": sum(r["imported"] for r in reports),
+        "errors": errors,
+        "warnings": warnings,
+        "topics_written": sum(1 for r in reports if r["staged"]) if committed else 0,
+        "committed": committed,
+        "elapsed_s": round(elapsed, 2),
+        "details": [
+            {k: r.get(k) for k in ("file", "topic", "rows", "imported", "diff", "issues", "remap_file")}
+            for r in reports
+        ],
+    }
+
+# =====================
+# MAIN
+# =====================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import hàng loạt Excel/CSV thành topic")
+    parser.add_argument("paths", nargs="+", help="thư mục hoặc glob")
+    parser.add_argument("--topics", default=TOPIC_FOLDER)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--strict", action="store_true", help="có lỗi thì không ghi topic nào")
+    parser.add_argument("--migrate", action="store_true", help="migrate file user theo remap")
+    parser.add_argument("--report", default=None, help="ghi báo cáo JSON ra file này")
+    args = parser.parse_args()
+
+    files = collect_files(args.paths)
+    if not files:
+        print("⚠️ Không tìm thấy file .xlsx/.xls/.csv nào")
+        sys.exit(1)
+
+    print(f"📖 Đang import {len(files)} file...")
+    start = time.perf_counter()
+    reports, committed = run(files, args.topics, args.workers, args.strict)
+    summary = summarize(reports, committed, time.perf_counter() - start)
+
+    for r in reports:
+        if r["issues"]:
+            print(f"\n⚠️ {r['file']}")
+            for issue in r["issues"][:10]:
+                where = f"dòng {issue['row']}: " if issue["row"] else ""
+                print(f"   {'❌' if issue['level'] == 'error' else '⚠️'} {where}{issue['msg']}")
+            if len(r["issues"]) > 10:
+                print(f"   ... và {len(r['issues']) - 10} vấn đề khác")
+
+    print(f"\n📊 {summary['files']} file, {summary['rows']} dòng → {summary['imported']} từ hợp lệ "
+          f"({summary['errors']} lỗi, {summary['warnings']} cảnh báo) trong {summary['elapsed_s']}s")
+    if committed:
+        print(f"✅ Đã ghi {summary['topics_written']} topic vào {args.topics}/")
+    else:
+        print("❌ --strict: có lỗi nên không ghi topic nào")
+
+    if committed and args.migrate:
+        for r in reports:
+            if r.get("remap_file"):
+                users, moved = migrate_users(r["remap"]["remap"])
+                print(f"🔀 {os.path.basename(r['topic'])}: migrate {moved} từ của {users} user")
+
+    if args.report:
+        save_json(args.report, summary)
+        print(f"📁 Báo cáo: {args.report}")
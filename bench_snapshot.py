@@ -0,0 +1,104 @@
+"""
+Benchmark các định dạng snapshot file user (xem storage.py): kích thước,
+thời gian encode (ghi) và decode (đọc) trên user giả có 1k / 10k / 100k thẻ.
+
+Định dạng cần thư viện chưa cài (orjson, zstandard) được bỏ qua kèm ghi chú.
+
+Cách dùng:
+    python bench_snapshot.py
+    python bench_snapshot.py --cards 1000 10000 --repeat 5
+    python bench_snapshot.py --formats compact orjson+zstd
+"""
+
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import storage
+
+DEFAULT_FORMATS = ("pretty", "compact", "orjson", "compact+gzip", "orjson+gzip", "orjson+zstd")
+DEFAULT_CARDS = (1_000, 10_000, 100_000)
+
+def synthetic_user(n_cards, seed=0):
+    """User giả có n_cards thẻ SRS (kèm daily / stats giống file thật)."""
+    rng = random.Random(seed)
+    now = datetime.now()
+    words = {}
+    for i in range(n_cards):
+        interval = rng.choice([4, 10, 25, 62, 155, 390])
+        words[f"topic_{i % 50}__{i:010x}"] = {
+            "word": f"word {i}",
+            "pos": rng.choice(["N (noun)", "V (verb)", "Adj (adjective)"]),
+            "meaning": f"nghĩa tiếng Việt của từ số {i}",
+            "example": f"This is an example sentence for word number {i}.",
+            "example_meaning": f"Đây là câu ví dụ cho từ số {i}.",
+            "interval_hours": interval * rng.uniform(0.8, 1.2),
+            "ease_factor": round(rng.uniform(1.3, 3.0), 2),
+            "next_review": (now + timedelta(hours=rng.uniform(-48, interval))).isoformat(),
+            "review_count": rng.randint(0, 20),
+            "last_interval_hours": interval / 2.5,
+            "last_remembered": rng.random() < 0.85,
+        }
+    daily = {
+        (now.date() - timedelta(days=d)).isoformat(): {"reviews": 40, "correct": 34, "new_words": 5, "seconds": 900}
+        for d in range(365)
+    }
+    return {
+        "username": "bench",
+        "words": words,
+        "pending_words": {},
+        "knew_words": {},
+        "daily": daily,
+        "stats": {"total_words": n_cards, "words_mastered": 0, "total_reviews": 0,
+                  "streak_days": 0, "last_study": None},
+    }
+
+def time_it(fn, repeat):
+    """Trung vị thời gian chạy (giây) và kết quả lần chạy cuối."""
+    times, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+def bench(n_cards, formats, repeat):
+    user_data = synthetic_user(n_cards)
+    rows = []
+    for fmt in formats:
+        try:
+            storage.parse_format(fmt)
+            storage.encode({}, fmt)
+        except ValueError as e:
+            rows.append({"format": fmt, "skipped": str(e)})
+            continue
+        encode_s, raw = time_it(lambda: storage.encode(user_data, fmt), repeat)
+        decode_s, decoded = time_it(lambda: storage.decode(raw), repeat)
+        assert decoded == user_data
+        rows.append({"format": fmt, "bytes": len(raw), "encode_s": encode_s, "decode_s": decode_s})
+    return rows
+
+# =====================
+# MAIN
+# =====================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark định dạng snapshot file user")
+    parser.add_argument("--cards", type=int, nargs="+", default=list(DEFAULT_CARDS))
+    parser.add_argument("--formats", nargs="+", default=list(DEFAULT_FORMATS))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for n_cards in args.cards:
+        rows = bench(n_cards, args.formats, args.repeat)
+        base = next((r["bytes"] for r in rows if r.get("format") == "pretty"), None)
+        print(f"\n📊 {n_cards:,} thẻ")
+        print(f"   {'định dạng':<14}{'kích thước':>14}{'tỉ lệ':>8}{'encode':>11}{'decode':>11}")
+        for r in rows:
+            if "skipped" in r:
+                print(f"   {r['format']:<14}⚠️ bỏ qua: {r['skipped']}")
+                continue
+            ratio = f"{r['bytes'] / base:.2f}" if base else "-"
+            print(f"   {r['format']:<14}{r['bytes'] / 1024:>11,.0f} KB{ratio:>8}"
+                  f"{r['encode_s'] * 1000:>8.1f} ms{r['decode_s'] * 1000:>8.1f} ms")
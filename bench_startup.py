@@ -0,0 +1,80 @@
+"""
+Benchmark thời gian khởi động (cold start) và first paint của trang đăng nhập.
+
+Mỗi lần đo chạy 1 interpreter Python mới (giống worker vừa restart):
+    - import_s:  thời gian import streamlit
+    - paint_s:   thời gian chạy script lần đầu tới khi trang login render xong
+Đồng thời kiểm tra các module nặng (pandas, plotly.express, gtts) KHÔNG bị load khi
+chỉ mở trang login; thoát với mã 1 nếu có.
+
+Cách dùng:
+    python bench_startup.py --runs 5
+    python bench_startup.py --app app.py
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# streamlit tự import plotly.graph_objects khi khởi động nên chỉ kiểm tra plotly.express
+HEAVY_MODULES = ("pandas", "plotly.express", "gtts")
+
+_CHILD = r"""
+import json, os, sys, time
+os.environ["VOCAB_REFRESH_INTERVAL"] = "0"
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+t1 = time.perf_counter()
+at = AppTest.from_file(sys.argv[1], default_timeout=60)
+at.run()
+t2 = time.perf_counter()
+print(json.dumps({
+    "import_s": t1 - t0,
+    "paint_s": t2 - t1,
+    "exception": [e.message for e in at.exception],
+    "loaded": [m for m in sys.argv[2:] if m in sys.modules],
+}))
+"""
+
+def measure_once(app_file):
+    out = subprocess.run(
+        [sys.executable, "-c", _CHILD, app_file, *HEAVY_MODULES],
+        cwd=APP_DIR, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark cold start trang login")
+    parser.add_argument("--app", default="app_ver2.py")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    app_file = os.path.join(APP_DIR, args.app)
+    results = [measure_once(app_file) for _ in range(args.runs)]
+
+    import_s = [r["import_s"] for r in results]
+    paint_s = [r["paint_s"] for r in results]
+    loaded = sorted({m for r in results for m in r["loaded"]})
+    errors = sorted({e for r in results for e in r["exception"]})
+
+    print(f"📊 {args.app} — {args.runs} lần chạy")
+    print(f"   import streamlit : median {statistics.median(import_s) * 1000:.0f} ms")
+    print(f"   first paint login: median {statistics.median(paint_s) * 1000:.0f} ms"
+          f" (min {min(paint_s) * 1000:.0f}, max {max(paint_s) * 1000:.0f})")
+    print(f"   module nặng đã load: {', '.join(loaded) if loaded else 'không có'}")
+
+    failed = False
+    for e in errors:
+        print(f"❌ {e}")
+        failed = True
+    if loaded:
+        print("⚠️ Trang login không được load pandas/plotly.express/gtts")
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
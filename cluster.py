@@ -0,0 +1,285 @@
+"""
+Cluster mode: N process Streamlit chạy app_ver2.py sau 1 load balancer sticky.
+
+1 process Streamlit bị GIL giới hạn ở 1 core. cluster.py chạy N process app
+(cổng PORT+1..PORT+N) và 1 proxy TCP trên cổng PORT:
+    - Sticky theo cookie vocab_node: request đầu tiên (chưa có cookie) được
+      chuyển tới process đang ít kết nối nhất và proxy gắn Set-Cookie vào
+      response; các kết nối sau (kể cả websocket của session) về đúng process đó.
+    - Process chết thì bị loại khỏi vòng chọn, được khởi động lại, sẵn sàng
+      (/_stcore/health) thì nhận kết nối lại.
+Trạng thái dùng chung giữa các process:
+    - File user / topic ghi nguyên tử (storage._write); session tự tải lại khi
+      file user đổi (auto_refresh trong app). Ghi file user là compare-and-swap
+      theo version file dưới khoá: 2 session của cùng user ở 2 process thì bên
+      ghi sau gộp với bản trên đĩa (user_sync.py), không ghi đè câu trả lời.
+    - Version trong SQLite (shared_state.py) để báo bỏ cache topic.
+    - Kho từ vựng: 1 file biên dịch mmap chung cho mọi process (topic_cache.py).
+    - Leaderboard (journal + flock), lịch nhắc (SQLite) vốn đã dùng chung được.
+
+Cách dùng:
+    python cluster.py run --workers 4 --port 8501
+    python cluster.py bench --workers 1,2,4 --clients 16 --seconds 20   # cần pip install websockets
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import subprocess
+import sys
+import time
+import urllib.request
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_FILE = os.path.join(APP_DIR, "app_ver2.py")
+LOG_FOLDER = os.path.join(APP_DIR, "Cluster")
+DEFAULT_PORT = 8501
+COOKIE = "vocab_node"
+HEAD_LIMIT = 64 * 1024        # header HTTP tối đa của 1 request
+READY_TIMEOUT = 60
+SUPERVISE_SECONDS = 2
+
+_COOKIE_RE = re.compile(rb"(?im)^cookie:[^\r\n]*\b" + COOKIE.encode() + rb"=(\d+)")
+
+# =====================
+# PROCESS APP
+# =====================
+def start_worker(node, port):
+    os.makedirs(LOG_FOLDER, exist_ok=True)
+    env = dict(os.environ, VOCAB_CLUSTER_NODE=str(node))
+    # Mỗi process 1 cổng metrics riêng (nếu bật prometheus)
+    env["VOCAB_METRICS_PORT"] = str(int(os.environ.get("VOCAB_METRICS_PORT", "9464")) + node)
+    log = open(os.path.join(LOG_FOLDER, f"worker-{node}.log"), "ab")
+    return subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", APP_FILE,
+         "--server.port", str(port), "--server.address", "127.0.0.1",
+         "--server.headless", "true", "--browser.gatherUsageStats", "false"],
+        cwd=APP_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+
+def is_ready(port):
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1) as resp:
+            return resp.status == 200
+    except OSError:
+        return False
+
+def wait_ready(ports, timeout=READY_TIMEOUT):
+    deadline = time.monotonic() + timeout
+    pending = set(ports)
+    while pending:
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"process app ở cổng {sorted(pending)} không sẵn sàng sau {timeout}s")
+        pending = {p for p in pending if not is_ready(p)}
+        time.sleep(0.2)
+
+def stop_workers(procs):
+    for p in procs:
+        p.terminate()
+    for p in procs:
+        try:
+            p.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            p.kill()
+
+# =====================
+# PROXY STICKY
+# =====================
+def new_proxy(ports):
+    return {"ports": list(ports), "active": [0] * len(ports), "up": [True] * len(ports)}
+
+def pick_node(proxy, head, exclude=()):
+    """(node, cần gắn cookie mới) — theo cookie nếu còn sống, không thì process ít kết nối nhất."""
+    m = _COOKIE_RE.search(head)
+    if m:
+        node = int(m.group(1))
+        if node < len(proxy["ports"]) and proxy["up"][node] and node not in exclude:
+            return node, False
+    candidates = [i for i, up in enumerate(proxy["up"]) if up and i not in exclude]
+    if not candidates:
+        return None, False
+    return min(candidates, key=lambda i: proxy["active"][i]), True
+
+async def _pipe(reader, writer):
+    try:
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+async def _pipe_response(reader, writer, node):
+    """Chuyển response về client; node khác None → gắn Set-Cookie vào header đầu tiên."""
+    if node is not None:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+        cookie = f"Set-Cookie: {COOKIE}={node}; Path=/; HttpOnly; SameSite=Lax\r\n".encode()
+        writer.write(head[:-2] + cookie + b"\r\n")
+    await _pipe(reader, writer)
+
+async def handle_client(proxy, client_reader, client_writer):
+    try:
+        head = await client_reader.readuntil(b"\r\n\r\n")
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+        client_writer.close()
+        return
+
+    tried = set()
+    while True:
+        node, set_cookie = pick_node(proxy, head, tried)
+        if node is None:
+            client_writer.write(b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\n\r\n")
+            client_writer.close()
+            return
+        try:
+            backend_reader, backend_writer = await asyncio.open_connection(
+                "127.0.0.1", proxy["ports"][node], limit=HEAD_LIMIT)
+            break
+        except OSError:
+            # Process đang khởi động lại → thử process khác, cookie cũ sẽ được thay
+            proxy["up"][node] = False
+            tried.add(node)
+
+    proxy["active"][node] += 1
+    try:
+        backend_writer.write(head)
+        await asyncio.gather(
+            _pipe(client_reader, backend_writer),
+            _pipe_response(backend_reader, client_writer, node if set_cookie else None),
+        )
+    finally:
+        proxy["active"][node] -= 1
+
+async def start_proxy(proxy, port):
+    return await asyncio.start_server(
+        lambda r, w: handle_client(proxy, r, w), "0.0.0.0", port, limit=HEAD_LIMIT)
+
+async def supervise(proxy, procs):
+    """Khởi động lại process chết; đưa lại vào vòng chọn khi health check OK."""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(SUPERVISE_SECONDS)
+        for node, proc in enumerate(procs):
+            port = proxy["ports"][node]
+            if proc.poll() is not None:
+                print(f"⚠️ process {node} (cổng {port}) đã dừng (mã {proc.returncode}) → khởi động lại")
+                proxy["up"][node] = False
+                procs[node] = start_worker(node, port)
+            elif not proxy["up"][node] and await loop.run_in_executor(None, is_ready, port):
+                print(f"✅ process {node} (cổng {port}) sẵn sàng")
+                proxy["up"][node] = True
+
+# =====================
+# RUN
+# =====================
+def run(workers, port):
+    ports = [port + 1 + i for i in range(workers)]
+    procs = [start_worker(i, p) for i, p in enumerate(ports)]
+    try:
+        wait_ready(ports)
+        print(f"🚀 {workers} process app (cổng {ports[0]}–{ports[-1]}) → http://localhost:{port}")
+
+        async def main():
+            proxy = new_proxy(ports)
+            server = await start_proxy(proxy, port)
+            async with server:
+                await asyncio.gather(server.serve_forever(), supervise(proxy, procs))
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_workers(procs)
+
+# =====================
+# LOAD TEST
+# =====================
+async def _client(url, deadline, latencies):
+    """1 session: chạy lại script liên tục qua websocket, ghi độ trễ mỗi lượt."""
+    import websockets
+    from streamlit.proto.BackMsg_pb2 import BackMsg
+    from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+    async def rerun(ws):
+        msg = BackMsg()
+        msg.rerun_script.query_string = ""
+        await ws.send(msg.SerializeToString())
+        while True:
+            fwd = ForwardMsg()
+            fwd.ParseFromString(await ws.recv())
+            if fwd.WhichOneof("type") == "script_finished":
+                return
+
+    async with websockets.connect(url, subprotocols=["streamlit"], max_size=None) as ws:
+        await rerun(ws)   # lượt đầu (import module, cache) không tính
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await rerun(ws)
+            latencies.append(time.perf_counter() - start)
+
+async def _bench_round(ports, port, clients, seconds):
+    proxy = new_proxy(ports)
+    server = await start_proxy(proxy, port)
+    latencies = []
+    try:
+        deadline = time.perf_counter() + seconds
+        await asyncio.gather(*(
+            _client(f"ws://127.0.0.1:{port}/_stcore/stream", deadline, latencies)
+            for _ in range(clients)
+        ))
+    finally:
+        server.close()
+        await server.wait_closed()
+    return latencies
+
+def bench(worker_counts, clients, seconds, port):
+    try:
+        import websockets  # noqa: F401
+    except ImportError:
+        raise SystemExit("❌ Cần cài websockets để chạy load test: pip install websockets")
+
+    print(f"📊 {clients} session, mỗi mức {seconds}s, {os.cpu_count()} CPU")
+    base = None
+    for workers in worker_counts:
+        ports = [port + 1 + i for i in range(workers)]
+        procs = [start_worker(i, p) for i, p in enumerate(ports)]
+        try:
+            wait_ready(ports)
+            latencies = sorted(asyncio.run(_bench_round(ports, port, clients, seconds)))
+        finally:
+            stop_workers(procs)
+        throughput = len(latencies) / seconds
+        base = base or throughput
+        p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0
+        p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0
+        print(f"   {workers} process: {throughput:7.1f} lượt chạy script/s "
+              f"(x{throughput / base:.2f}), p50 {p50:.0f} ms, p95 {p95:.0f} ms")
+
+# =====================
+# MAIN
+# =====================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chạy app nhiều process sau load balancer sticky")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_run = sub.add_parser("run", help="chạy cluster")
+    p_run.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    p_run.add_argument("--port", type=int, default=DEFAULT_PORT)
+    p_bench = sub.add_parser("bench", help="đo throughput theo số process")
+    p_bench.add_argument("--workers", default="1,2,4", help="danh sách số process, vd 1,2,4")
+    p_bench.add_argument("--clients", type=int, default=16)
+    p_bench.add_argument("--seconds", type=float, default=20)
+    p_bench.add_argument("--port", type=int, default=8700)
+    args = parser.parse_args()
+
+    if args.cmd == "run":
+        run(args.workers, args.port)
+    else:
+        bench([int(n) for n in args.workers.split(",")], args.clients, args.seconds, args.port)
@@ -0,0 +1,394 @@
+"""
+Lịch nhắc ôn tập toàn hệ thống: biết khi nào từng user có đủ thẻ đến hạn mà
+không phải đọc lại file user.
+
+- App gọi update_user() trong update_srs / promote_pending_to_words kèm các
+  word_id vừa đổi: tính thời điểm user có đủ REMINDER_THRESHOLD thẻ đến hạn (thẻ
+  thứ K có next_review nhỏ nhất; user ít thẻ hơn K thì lấy thẻ cuối). Mỗi process
+  giữ list next_review đã sắp của user (bisect, O(log n) tìm / thẻ đổi) nên không
+  duyệt lại toàn bộ words. List gắn với version file user mà nó phản ánh: app
+  báo saved() sau mỗi lần ghi để list đi tiếp sang version mới (session nạp lại
+  dict mới sau khi ghi cũng không phải sắp lại); version khác (session khác ghi,
+  merge, import) → dựng lại. Giữ tối đa TRACKED_USERS user (LRU), forget() khi
+  đăng xuất. Dòng mới được gom lại và 1 thread nền upsert vào bảng
+  due_index (SQLite) mỗi FLUSH_SECONDS trong 1 transaction — không ghi SQLite
+  trong lượt chạy script, dòng không đổi thì không ghi.
+- Mỗi lần upsert gán seq = MAX(seq) + 1 ngay trong transaction ghi (SQLite chỉ
+  có 1 writer tại 1 thời điểm) → seq tăng đúng theo thứ tự commit.
+- Worker (python due_scheduler.py run) giữ min-heap (threshold_at, username) của
+  mọi user, đọc bù các dòng có seq > seq lớn nhất đã thấy (không dựa vào đồng hồ
+  của process ghi), xoá lười (entry cũ trong heap bị bỏ qua khi pop) và ghi 1
+  dòng vào bảng outbox reminders khi tới giờ.
+  Notifier đọc reminders có sent_at IS NULL rồi gọi mark_sent().
+- User đang học (vừa update) mà đã quá ngưỡng thì không nhắc nữa.
+
+Dữ liệu: Scheduler/due.db (WAL, app ghi / worker đọc cùng lúc được).
+Tắt phía app bằng VOCAB_DUE_SCHEDULER=0.
+
+Cách dùng:
+    python due_scheduler.py rebuild            # nạp due_index từ file user (lần đầu)
+    python due_scheduler.py run                # worker
+    python due_scheduler.py outbox             # xem nhắc nhở chưa gửi
+    python due_scheduler.py bench --users 1000000
+"""
+
+import argparse
+import atexit
+import heapq
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from datetime import datetime
+
+from storage import iter_user_files, read_json
+
+SCHEDULER_DB = os.path.join("Scheduler", "due.db")
+USER_FOLDER = "Users"
+ENABLED = os.environ.get("VOCAB_DUE_SCHEDULER", "1") != "0"
+REMINDER_THRESHOLD = int(os.environ.get("VOCAB_REMINDER_THRESHOLD", "10"))
+POLL_SECONDS = 5
+FLUSH_SECONDS = 1.0
+TRACKED_USERS = 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS due_index (
+    username     TEXT PRIMARY KEY,
+    next_due     REAL,              -- epoch giây của thẻ đến hạn sớm nhất
+    threshold_at REAL,              -- epoch giây khi số thẻ đến hạn đạt ngưỡng
+    due_count    INTEGER NOT NULL,  -- số thẻ đến hạn tại threshold_at
+    notified_for REAL,              -- threshold_at đã nhắc / bỏ qua
+    updated_at   REAL NOT NULL,
+    seq          INTEGER NOT NULL DEFAULT 0   -- thứ tự thay đổi (tăng dần theo commit)
+);
+CREATE TABLE IF NOT EXISTS reminders (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    username   TEXT NOT NULL,
+    due_count  INTEGER NOT NULL,
+    due_since  REAL NOT NULL,
+    created_at REAL NOT NULL,
+    sent_at    REAL
+);
+CREATE INDEX IF NOT EXISTS ix_reminders_unsent ON reminders (sent_at, id);
+"""
+
+_NEXT_SEQ = "(SELECT COALESCE(MAX(seq), 0) + 1 FROM due_index)"
+
+_local = threading.local()
+_lock = threading.Lock()
+_tracked = OrderedDict()   # username → {"version": version file, "by_word": {id: next_review}, "times": [(next_review, id)]} (LRU)
+_pending = {}    # username → row chờ ghi
+_written = {}    # username → row đã ghi gần nhất
+_flusher = None
+
+def connect(path=None):
+    path = path or SCHEDULER_DB
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    # DB tạo trước khi có cột seq
+    if "seq" not in {row[1] for row in conn.execute("PRAGMA table_info(due_index)")}:
+        try:
+            conn.execute("ALTER TABLE due_index ADD COLUMN seq INTEGER NOT NULL DEFAULT 0")
+        except sqlite3.OperationalError:
+            pass   # process khác vừa thêm
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_due_seq ON due_index (seq)")
+    return conn
+
+def _conn():
+    """1 connection / thread (Streamlit chạy mỗi session trên thread riêng)."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _local.conn = connect()
+    return conn
+
+# =====================
+# PHÍA APP
+# =====================
+def due_row(user_data, threshold=REMINDER_THRESHOLD):
+    """(next_due, threshold_at, due_count) dạng epoch giây, None nếu user chưa có thẻ."""
+    # next_review là ISO cùng định dạng nên so sánh chuỗi được
+    times = heapq.nsmallest(threshold, (s["next_review"] for s in user_data.get("words", {}).values()))
+    return _row(times)
+
+def _row(times):
+    if not times:
+        return None, None, 0
+    return (datetime.fromisoformat(times[0]).timestamp(),
+            datetime.fromisoformat(times[-1]).timestamp(), len(times))
+
+def _track(username, user_data, word_ids=None, version=None):
+    """
+    due_row() cập nhật dần: chỉ đặt lại vị trí của word_ids trong list đã sắp.
+    Dựng lại list khi version file khác version list đang theo dõi hoặc lệch số thẻ.
+    """
+    words = user_data.get("words", {})
+    t = _tracked.get(username)
+    if t is None or t["version"] != version or word_ids is None:
+        t = _tracked[username] = {"version": version, "by_word": {}, "times": []}
+        word_ids = list(words)
+    _tracked.move_to_end(username)
+    while len(_tracked) > TRACKED_USERS:
+        _tracked.popitem(last=False)
+    by_word, times = t["by_word"], t["times"]
+    for word_id in word_ids:
+        old = by_word.pop(word_id, None)
+        if old is not None:
+            del times[bisect_left(times, (old, word_id))]
+        state = words.get(word_id)
+        if state is None:
+            continue
+        by_word[word_id] = state.get("next_review")   # None: thẻ chưa có lịch
+        if by_word[word_id] is not None:
+            insort(times, (by_word[word_id], word_id))
+    if len(by_word) != len(words):
+        # Thẻ bị xoá / thêm ngoài luồng → dựng lại
+        return _track(username, user_data, None, version)
+    return _row([at for at, _ in times[:REMINDER_THRESHOLD]])
+
+def _upsert(conn, username, row, now):
+    next_due, threshold_at, due_count = row
+    # User đang học mà đã quá ngưỡng → coi như đã nhắc
+    notified = threshold_at if threshold_at is not None and threshold_at <= now else None
+    conn.execute(
+        "INSERT INTO due_index (username, next_due, threshold_at, due_count, notified_for, updated_at, seq) "
+        f"VALUES (?, ?, ?, ?, ?, ?, {_NEXT_SEQ}) "
+        "ON CONFLICT(username) DO UPDATE SET next_due = excluded.next_due, "
+        "threshold_at = excluded.threshold_at, due_count = excluded.due_count, "
+        "notified_for = excluded.notified_for, updated_at = excluded.updated_at, seq = excluded.seq",
+        (username, next_due, threshold_at, due_count, notified, now),
+    )
+
+def update_user(username, user_data, word_ids=None, version=None):
+    """
+    word_ids: các thẻ vừa đổi next_review (None = tính lại toàn bộ).
+    version: version file user mà user_data được nạp từ đó (trước thay đổi này).
+    """
+    if not ENABLED:
+        return
+    global _flusher
+    with _lock:
+        row = _track(username, user_data, word_ids, version)
+        if _pending.get(username, _written.get(username)) == row:
+            return
+        _pending[username] = row
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, name="due_scheduler", daemon=True)
+            _flusher.start()
+            atexit.register(flush)
+
+def saved(username, old_version, new_version):
+    """File user vừa được ghi từ đúng dữ liệu đang theo dõi (không merge) → list đi tiếp sang version mới."""
+    with _lock:
+        t = _tracked.get(username)
+        if t is not None and t["version"] == old_version:
+            t["version"] = new_version
+
+def forget(username):
+    """Bỏ list đã sắp của user (đăng xuất)."""
+    with _lock:
+        _tracked.pop(username, None)
+
+def flush():
+    """Ghi các dòng đang chờ vào due_index (1 transaction). Trả về số user đã ghi."""
+    with _lock:
+        batch = dict(_pending)
+        _pending.clear()
+    if not batch:
+        return 0
+    conn = _conn()
+    now = time.time()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        for username, row in batch.items():
+            _upsert(conn, username, row, now)
+        conn.execute("COMMIT")
+    except sqlite3.Error:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        with _lock:
+            # Ghi lại ở lần sau (giữ dòng mới hơn nếu đã có)
+            for username, row in batch.items():
+                _pending.setdefault(username, row)
+        return 0
+    with _lock:
+        _written.update(batch)
+    return len(batch)
+
+def _flush_loop():
+    while True:
+        time.sleep(FLUSH_SECONDS)
+        flush()
+
+def rebuild(user_folder=USER_FOLDER, conn=None):
+    """Nạp due_index từ toàn bộ file user (1 transaction)."""
+    conn = conn or connect()
+    now, n = time.time(), 0
+    conn.execute("BEGIN")
+    for path in iter_user_files(user_folder):
+        user_data = read_json(path)
+        username = user_data.get("username") or os.path.basename(path)[:-5]
+        row = due_row(user_data)
+        # Dựng lại offline: không coi ai là đang học → chưa nhắc
+        conn.execute(
+            "INSERT OR REPLACE INTO due_index "
+            "(username, next_due, threshold_at, due_count, notified_for, updated_at, seq) "
+            f"VALUES (?, ?, ?, ?, NULL, ?, {_NEXT_SEQ})",
+            (username, row[0], row[1], row[2], now),
+        )
+        n += 1
+    conn.execute("COMMIT")
+    return n
+
+# =====================
+# WORKER
+# =====================
+def new_heap():
+    """Min-heap (thời điểm, username) với xoá lười: current giữ giá trị hiện hành."""
+    return {"heap": [], "current": {}}
+
+def heap_set(h, username, at):
+    if at is None:
+        h["current"].pop(username, None)
+        return
+    if h["current"].get(username) == at:
+        return
+    h["current"][username] = at
+    heapq.heappush(h["heap"], (at, username))
+    # Quá nhiều entry cũ → dựng lại heap
+    if len(h["heap"]) > 2 * len(h["current"]) + 1024:
+        h["heap"] = [(t, u) for u, t in h["current"].items()]
+        heapq.heapify(h["heap"])
+
+def heap_pop_due(h, now):
+    due, heap, current = [], h["heap"], h["current"]
+    while heap and heap[0][0] <= now:
+        at, username = heapq.heappop(heap)
+        if current.get(username) == at:
+            del current[username]
+            due.append((username, at))
+    return due
+
+def _load_changes(conn, heap, last_seq):
+    """Đưa các dòng có seq > last_seq vào heap. Trả về seq lớn nhất đã thấy."""
+    rows = conn.execute(
+        "SELECT username, threshold_at, notified_for, seq FROM due_index WHERE seq > ? ORDER BY seq",
+        (last_seq,),
+    )
+    for username, threshold_at, notified_for, seq in rows:
+        heap_set(heap, username, None if threshold_at == notified_for else threshold_at)
+        last_seq = seq
+    return last_seq
+
+def fire(conn, due, now):
+    """Ghi nhắc nhở vào outbox và đánh dấu đã nhắc (1 transaction)."""
+    if not due:
+        return 0
+    conn.execute("BEGIN")
+    n = 0
+    for username, at in due:
+        # Chỉ nhắc nếu threshold_at trong DB vẫn là giá trị heap đang giữ
+        cur = conn.execute(
+            "UPDATE due_index SET notified_for = threshold_at "
+            "WHERE username = ? AND threshold_at = ? AND notified_for IS NOT threshold_at",
+            (username, at),
+        )
+        if cur.rowcount:
+            conn.execute(
+                "INSERT INTO reminders (username, due_count, due_since, created_at) "
+                "SELECT username, due_count, threshold_at, ? FROM due_index WHERE username = ?",
+                (now, username),
+            )
+            n += 1
+    conn.execute("COMMIT")
+    return n
+
+def run(poll_seconds=POLL_SECONDS, once=False):
+    conn = connect()
+    heap = new_heap()
+    last_seq = _load_changes(conn, heap, -1)
+    print(f"⏰ Đang theo dõi {len(heap['current'])} user")
+    while True:
+        last_seq = _load_changes(conn, heap, last_seq)
+        now = time.time()
+        sent = fire(conn, heap_pop_due(heap, now), now)
+        if sent:
+            print(f"🔔 {datetime.now():%H:%M:%S} — {sent} nhắc nhở mới")
+        if once:
+            return heap
+        nxt = heap["heap"][0][0] if heap["heap"] else None
+        time.sleep(max(0.05, min(poll_seconds, nxt - time.time() if nxt else poll_seconds)))
+
+# =====================
+# OUTBOX
+# =====================
+def pending_reminders(limit=100, conn=None):
+    conn = conn or _conn()
+    return conn.execute(
+        "SELECT id, username, due_count, due_since, created_at FROM reminders "
+        "WHERE sent_at IS NULL ORDER BY id LIMIT ?", (limit,),
+    ).fetchall()
+
+def mark_sent(ids, conn=None):
+    conn = conn or _conn()
+    conn.executemany("UPDATE reminders SET sent_at = ? WHERE id = ?", [(time.time(), i) for i in ids])
+
+# =====================
+# BENCHMARK
+# =====================
+def bench(n_users, n_updates):
+    import random
+    rng = random.Random(0)
+    now = time.time()
+    heap = new_heap()
+
+    start = time.perf_counter()
+    for i in range(n_users):
+        heap_set(heap, f"user_{i}", now + rng.uniform(0, 86400 * 7))
+    load_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(n_updates):
+        heap_set(heap, f"user_{rng.randrange(n_users)}", now + rng.uniform(0, 86400 * 7))
+    update_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fired = heap_pop_due(heap, now + 3600)
+    pop_s = time.perf_counter() - start
+
+    print(f"📊 {n_users:,} user")
+    print(f"   nạp heap        : {load_s:.2f}s")
+    print(f"   {n_updates:,} cập nhật: {update_s / n_updates * 1e6:.2f} µs / lần")
+    print(f"   pop 1 giờ tới   : {len(fired):,} user trong {pop_s * 1000:.1f} ms")
+
+# =====================
+# MAIN
+# =====================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lịch nhắc ôn tập toàn hệ thống")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_rebuild = sub.add_parser("rebuild", help="nạp due_index từ file user")
+    p_rebuild.add_argument("--users", default=USER_FOLDER)
+    p_run = sub.add_parser("run", help="chạy worker")
+    p_run.add_argument("--poll", type=float, default=POLL_SECONDS)
+    p_run.add_argument("--once", action="store_true", help="chạy 1 vòng rồi thoát")
+    sub.add_parser("outbox", help="in nhắc nhở chưa gửi")
+    p_bench = sub.add_parser("bench", help="đo heap với nhiều user giả")
+    p_bench.add_argument("--users", type=int, default=1_000_000)
+    p_bench.add_argument("--updates", type=int, default=200_000)
+    args = parser.parse_args()
+
+    if args.cmd == "rebuild":
+        print(f"✅ Đã nạp {rebuild(args.users)} user vào {SCHEDULER_DB}")
+    elif args.cmd == "run":
+        run(args.poll, args.once)
+    elif args.cmd == "outbox":
+        for rid, username, due_count, due_since, created_at in pending_reminders(conn=connect()):
+            print(f"🔔 #{rid} {username}: {due_count} thẻ đến hạn từ {datetime.fromtimestamp(due_since):%d/%m %H:%M}")
+    else:
+        bench(args.users, args.updates)
@@ -4,9 +4,11 @@ Yêu cầu: pip install pandas openpyxl
 """
 
 import pandas as pd
-import json
 import os
 
+from storage import read_json
+from word_ids import assign_ids, migrate_users, print_diff, topic_slug, write_topic
+
 def excel_to_json(excel_file, output_name=None):
     """
     Chuyển đổi file Excel sang JSON
@@ -32,19 +34,6 @@ def excel_to_json(excel_file, output_name=None):
         print(f"📋 Các cột hiện có: {', '.join(df.columns)}")
         return
     
-    # Chuyển đổi sang dictionary
-    vocab_dict = {}
-    
-    for idx, row in df.iterrows():
-        word_id = f"word_{idx + 1}"
-        vocab_dict[word_id] = {
-            "word": str(row['word']).strip(),
-            "pos": str(row['pos']).strip(),
-            "meaning": str(row['meaning']).strip(),
-            "example": str(row['example']).strip(),
-            "example_meaning": str(row['example_meaning']).strip()
-        }
-    
     # Tạo tên file output
     if output_name is None:
         base_name = os.path.splitext(os.path.basename(excel_file))[0]
@@ -54,16 +43,35 @@ def excel_to_json(excel_file, output_name=None):
     if not output_name.endswith('.json'):
         output_name += '.json'
     
-    # Lưu vào thư mục Topics
+    # Chuyển đổi sang dictionary, id sinh từ nội dung (không theo số dòng)
+    entries = [
+        {
+            "word": str(row['word']).strip(),
+            "pos": str(row['pos']).strip(),
+            "meaning": str(row['meaning']).strip(),
+            "example": str(row['example']).strip(),
+            "example_meaning": str(row['example_meaning']).strip()
+        }
+        for _, row in df.iterrows()
+    ]
+    vocab_dict = assign_ids(topic_slug(output_name), entries)
+    
+    # Lưu vào thư mục Topics (chỉ ghi lại khi nội dung đổi)
     output_path = os.path.join("Topics", output_name)
     os.makedirs("Topics", exist_ok=True)
-    
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(vocab_dict, f, ensure_ascii=False, indent=2)
+    old_vocab = read_json(output_path) if os.path.exists(output_path) else {}
+    diff, remap_path = write_topic(output_path, old_vocab, vocab_dict)
     
     print(f"✅ Đã chuyển đổi thành công!")
     print(f"📁 File output: {output_path}")
     print(f"📊 Tổng số từ: {len(vocab_dict)}")
+    print_diff(diff)
+    
+    if remap_path:
+        print(f"🔀 File remap: {remap_path}")
+        if input("Migrate tiến độ của các user theo remap? (y/n): ").strip().lower() == "y":
+            users, moved = migrate_users(read_json(remap_path)["remap"])
+            print(f"✅ Đã migrate {moved} từ của {users} user")
     
     # Hiển thị preview
     print("\n🔍 Preview 3 từ đầu tiên:")
@@ -0,0 +1,81 @@
+"""
+Component thẻ học / ôn chạy hoàn toàn trên trình duyệt.
+
+Giao diện thẻ thường (nút Streamlit) tốn 1 lượt gọi server cho mỗi lần lật thẻ
+và mỗi câu trả lời. Component này nhận 1 lô BATCH_SIZE thẻ, tự xử lý lật thẻ,
+chọn đáp án trắc nghiệm, kiểm tra từ điền ở trình duyệt, rồi gửi cả lô câu trả
+lời về 1 lần. App áp dụng lô bằng update_srs_batch / promote_pending_batch
+(ghi file user 1 lần / lô).
+
+Mỗi lô có batch_id riêng (vị trí bắt đầu trong phiên); giá trị trả về mang
+batch_id của lô nên lô đã áp dụng rồi không bị áp dụng lại khi script chạy lại.
+
+Frontend: components/flashcards/index.html (HTML + JS thuần, không cần build).
+
+Cách dùng (trong app):
+    result = flashcards.flashcard_batch(cards, mode="review", batch_id="...")
+    if result: ... result["answers"] = [{"i": vị trí, "id": word_id, "correct": bool}]
+"""
+
+import os
+
+BATCH_SIZE = 10
+COMPONENT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "components", "flashcards")
+CARD_FIELDS = ("word", "pos", "meaning", "example", "example_meaning")
+
+_component = None
+
+def _get_component():
+    global _component
+    if _component is None:
+        import streamlit.components.v1 as components   # chỉ import khi dùng component
+        _component = components.declare_component("flashcards", path=COMPONENT_PATH)
+    return _component
+
+# =====================
+# PAYLOAD
+# =====================
+def review_payload(queue, pos, words, view, size=BATCH_SIZE):
+    """Các thẻ ôn tiếp theo trong hàng đợi (bỏ qua từ đã bị xoá khỏi words)."""
+    cards = []
+    i = pos
+    while i < len(queue) and len(cards) < size:
+        word_id = queue[i]
+        if word_id in words:
+            data = view(word_id, words[word_id])
+            card = {k: data.get(k, "") for k in CARD_FIELDS}
+            card.update(i=i, id=word_id, review_count=data.get("review_count", 0))
+            cards.append(card)
+        i += 1
+    return cards
+
+def learn_payload(session_cards, pos, size=BATCH_SIZE):
+    """Thẻ học tiếp theo; đáp án trắc nghiệm gửi dưới dạng chỉ số lựa chọn đúng."""
+    cards = []
+    for i in range(pos, min(pos + size, len(session_cards))):
+        card = session_cards[i]
+        payload = {k: card["data"].get(k, "") for k in CARD_FIELDS}
+        payload.update(i=i, id=card["word_id"], mode=card["mode"], hint=card["hint"])
+        if card["mode"] == "mc":
+            payload["choices"] = [text for text, _ in card["choices"]]
+            payload["correct"] = next(j for j, (_, ok) in enumerate(card["choices"]) if ok)
+        cards.append(payload)
+    return cards
+
+# =====================
+# COMPONENT
+# =====================
+def flashcard_batch(cards, mode, batch_id):
+    """
+    Hiện 1 lô thẻ. Trả về {"batch_id", "answers"} khi trình duyệt gửi lô về
+    (None nếu chưa có hoặc là lô cũ).
+    """
+    value = _get_component()(cards=cards, mode=mode, batch_id=batch_id,
+                             key=f"flashcards_{batch_id}", default=None)
+    if not value or value.get("batch_id") != batch_id:
+        return None
+    return value
+
+def answered_until(answers):
+    """Vị trí ngay sau thẻ cuối cùng đã trả lời (để tiến phiên)."""
+    return max(a["i"] for a in answers) + 1
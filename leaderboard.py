@@ -0,0 +1,337 @@
+"""
+Bảng xếp hạng giữa các user, được cập nhật dần mỗi khi ghi (không quét Users/).
+
+3 bảng:
+    - reviews_week:   số lượt ôn trong tuần hiện tại (theo user_data["daily"])
+    - streak:         chuỗi ngày học liên tiếp
+    - words_mastered: số từ đã thuộc (ôn ≥ 5 lần)
+Mỗi bảng là dict username → (giá trị, mốc) + các list (-giá trị, username) luôn
+được sắp xếp (bisect), 1 list cho mỗi mốc (tuần của reviews_week, ngày học cuối
+của streak; words_mastered không có mốc). Đọc chỉ đụng list của mốc còn hiệu
+lực: top-K là cắt đầu list (streak: trộn list hôm nay + hôm qua), tìm vị trí là
+O(log n). List của mốc đã hết hạn bị bỏ hẳn (kèm giá trị) ở lần đọc / ghi đầu
+tiên trong ngày, nên user nghỉ học không cần ai cập nhật lại và không nằm chắn
+đầu bảng. Thêm / đổi giá trị là insort / del trên list Python: O(n) memmove, vẫn
+nhanh tới vài trăm nghìn user mỗi mốc.
+
+Lưu trữ (sống qua restart, dùng chung giữa nhiều process):
+    Leaderboard/snapshot.json   ← toàn bộ bảng
+    Leaderboard/journal.jsonl   ← mỗi dòng 1 thay đổi, append-only; đọc tiếp từ
+                                  offset cũ để thấy thay đổi của process khác
+Journal dài quá COMPACT_LINES dòng thì được gộp vào snapshot. Mỗi lần gộp tăng
+"generation": ghi trong snapshot và ở dòng đầu journal ({"gen": n}); process
+thấy generation của journal khác của mình thì nạp lại snapshot (không dựa vào
+kích thước file — journal có thể đã dài lại quá offset cũ).
+Tắt bằng VOCAB_LEADERBOARD=0.
+
+Cách dùng:
+    python leaderboard.py rebuild           # dựng lại từ file user (offline)
+    python leaderboard.py top --metric streak -k 20
+"""
+
+import argparse
+import heapq
+import json
+import os
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+
+from storage import iter_user_files, read_json, save_json
+
+try:
+    import fcntl
+except ImportError:   # Windows: không khoá file, chỉ khoá trong process
+    fcntl = None
+
+LEADERBOARD_FOLDER = "Leaderboard"
+USER_FOLDER = "Users"
+ENABLED = os.environ.get("VOCAB_LEADERBOARD", "1") != "0"
+METRICS = ("reviews_week", "streak", "words_mastered")
+COMPACT_LINES = 10_000
+
+_lock = threading.RLock()
+_state = None   # xem _empty_state()
+
+def _paths():
+    return (os.path.join(LEADERBOARD_FOLDER, "snapshot.json"),
+            os.path.join(LEADERBOARD_FOLDER, "journal.jsonl"))
+
+def _empty_state():
+    return {
+        "values": {m: {} for m in METRICS},   # metric → {username: (giá trị, mốc)}
+        "order": {m: {} for m in METRICS},    # metric → {mốc: [(-giá trị, username)] đã sắp}
+        "pruned_for": None,                   # ngày đã bỏ các mốc hết hạn
+        "offset": 0,                          # đã đọc journal tới byte này
+        "generation": 0,                      # số lần journal đã được gộp vào snapshot
+        "journal_lines": 0,
+    }
+
+# =====================
+# TÍNH GIÁ TRỊ
+# =====================
+def week_id(day):
+    year, week, _ = day.isocalendar()
+    return f"{year}-W{week:02d}"
+
+def user_metrics(user_data, now=None):
+    """metric → (giá trị, mốc) của 1 user. O(7) — chỉ đọc 7 ngày của tuần này."""
+    today = (now or datetime.now()).date()
+    stats = user_data.get("stats", {})
+    daily = user_data.get("daily", {})
+    monday = today - timedelta(days=today.weekday())
+    week_reviews = sum(
+        daily.get((monday + timedelta(days=i)).isoformat(), {}).get("reviews", 0)
+        for i in range(today.weekday() + 1)
+    )
+    return {
+        "reviews_week": (week_reviews, week_id(today)),
+        "streak": (stats.get("streak_days", 0), stats.get("last_study")),
+        "words_mastered": (stats.get("words_mastered", 0), None),
+    }
+
+def current_stamps(metric, today):
+    """Các mốc còn hiệu lực của bảng."""
+    if metric == "reviews_week":
+        return (week_id(today),)
+    if metric == "streak":
+        return (today.isoformat(), (today - timedelta(days=1)).isoformat())
+    return (None,)
+
+def is_current(metric, stamp, today):
+    return stamp in current_stamps(metric, today)
+
+def is_expired(metric, stamp, today):
+    """Mốc đã qua (mốc ở tương lai — đồng hồ process khác lệch — vẫn giữ)."""
+    if metric == "words_mastered":
+        return False
+    # week_id / ngày ISO đều so chuỗi được
+    return stamp is None or stamp < min(current_stamps(metric, today))
+
+# =====================
+# CẤU TRÚC TRONG BỘ NHỚ
+# =====================
+def _set(state, metric, username, value, stamp):
+    values, order = state["values"][metric], state["order"][metric]
+    old = values.get(username)
+    if old is not None:
+        if old == (value, stamp):
+            return False
+        bucket = order.get(old[1], [])
+        i = bisect_left(bucket, (-old[0], username))
+        if i < len(bucket) and bucket[i] == (-old[0], username):
+            del bucket[i]
+        if not bucket:
+            order.pop(old[1], None)
+    values[username] = (value, stamp)
+    insort(order.setdefault(stamp, []), (-value, username))
+    return True
+
+def _prune(state, today):
+    """Bỏ list (và giá trị) của các mốc đã hết hạn — chạy 1 lần / ngày / process."""
+    if state["pruned_for"] == today:
+        return
+    for metric in METRICS:
+        values, order = state["values"][metric], state["order"][metric]
+        for stamp in [s for s in order if is_expired(metric, s, today)]:
+            for _, username in order.pop(stamp):
+                del values[username]
+    state["pruned_for"] = today
+
+def _apply_line(state, line):
+    try:
+        rec = json.loads(line)
+        _set(state, rec["m"], rec["u"], rec["v"], rec.get("s"))
+    except (ValueError, KeyError):
+        pass   # dòng ghi dở (process khác đang append) → bỏ qua
+
+def _load():
+    state = _empty_state()
+    snapshot_path, _ = _paths()
+    snapshot = read_json(snapshot_path)
+    state["generation"] = snapshot.get("generation", 0)
+    for metric, entries in snapshot.get("boards", {}).items():
+        if metric in state["values"]:
+            for username, (value, stamp) in entries.items():
+                _set(state, metric, username, value, stamp)
+    return state
+
+def _read_header(f):
+    """(generation, vị trí sau dòng header) của journal; journal chưa gộp lần nào → (0, 0)."""
+    f.seek(0)
+    line = f.readline()
+    if line.startswith(b'{"gen"') and line.endswith(b"\n"):
+        try:
+            return json.loads(line)["gen"], len(line)
+        except (ValueError, KeyError):
+            pass
+    return 0, 0
+
+def _header_line(generation):
+    return (json.dumps({"gen": generation}) + "\n").encode("utf-8")
+
+def _catch_up(state):
+    """Đọc phần journal mới (kể cả do process khác ghi) từ offset đã đọc."""
+    _, journal_path = _paths()
+    if not os.path.exists(journal_path):
+        return state
+    with open(journal_path, "rb") as f:
+        generation, header_end = _read_header(f)
+        if generation != state["generation"]:
+            # Journal đã được compact bởi process khác → nạp lại snapshot
+            state = _load()
+            if generation != state["generation"]:
+                return state   # đang compact dở (snapshot / journal chưa khớp) → lần sau đọc tiếp
+        state["offset"] = max(state["offset"], header_end)
+        f.seek(state["offset"])
+        chunk = f.read()
+    # Chỉ xử lý tới dòng hoàn chỉnh cuối cùng
+    end = chunk.rfind(b"\n") + 1
+    for line in chunk[:end].splitlines():
+        _apply_line(state, line)
+        state["journal_lines"] += 1
+    state["offset"] += end
+    return state
+
+def _get_state(today):
+    global _state
+    if _state is None:
+        _state = _load()
+    _state = _catch_up(_state)
+    _prune(_state, today)
+    return _state
+
+# =====================
+# GHI
+# =====================
+def update_user(username, user_data, now=None):
+    """Cập nhật 3 bảng cho 1 user (gọi sau update_srs / promote). Chỉ append journal khi đổi."""
+    global _state
+    if not ENABLED:
+        return
+    now = now or datetime.now()
+    records = []
+    with _lock:
+        state = _get_state(now.date())
+        for metric, (value, stamp) in user_metrics(user_data, now).items():
+            if _set(state, metric, username, value, stamp):
+                records.append({"m": metric, "u": username, "v": value, "s": stamp})
+        if not records:
+            return
+        lines = [json.dumps(rec, ensure_ascii=False) for rec in records]
+        os.makedirs(LEADERBOARD_FOLDER, exist_ok=True)
+        _, journal_path = _paths()
+        with open(journal_path, "ab") as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            # Process khác có thể vừa append: đọc bù trước khi ghi để offset khớp
+            state = _catch_up(state)
+            # (có thể vừa nạp lại snapshot / áp dòng cũ hơn của process khác) → đặt lại giá trị mới
+            for rec in records:
+                _set(state, rec["m"], rec["u"], rec["v"], rec["s"])
+            _prune(state, now.date())
+            data = ("\n".join(lines) + "\n").encode("utf-8")
+            f.write(data)
+            f.flush()
+            state["offset"] += len(data)
+            state["journal_lines"] += len(lines)
+            if state["journal_lines"] >= COMPACT_LINES:
+                state["generation"] += 1
+                _write_snapshot(state)
+                header = _header_line(state["generation"])
+                f.truncate(0)
+                f.write(header)
+                f.flush()
+                state["offset"], state["journal_lines"] = len(header), 0
+        _state = state
+
+def _write_snapshot(state):
+    snapshot_path, _ = _paths()
+    tmp_path = snapshot_path + ".tmp"
+    save_json(tmp_path, {
+        "generated_at": datetime.now().isoformat(),
+        "generation": state["generation"],
+        "boards": {
+            metric: {u: list(v) for u, v in values.items()}
+            for metric, values in state["values"].items()
+        },
+    })
+    os.replace(tmp_path, snapshot_path)
+
+# =====================
+# ĐỌC
+# =====================
+def top(metric, k=10, now=None):
+    """[(username, giá trị)] của k user đứng đầu (chỉ giá trị còn hiệu lực) — O(k)."""
+    today = (now or datetime.now()).date()
+    result = []
+    with _lock:
+        state = _get_state(today)
+        order = state["order"][metric]
+        # Các list đã sắp → trộn lấy đầu
+        for neg_value, username in heapq.merge(*(order.get(s, ()) for s in current_stamps(metric, today))):
+            if len(result) >= k or neg_value >= 0:
+                break
+            result.append((username, -neg_value))
+    return result
+
+def position(metric, username, now=None):
+    """Vị trí (1-based) của user trong các giá trị còn hiệu lực, None nếu không có — O(log n)."""
+    today = (now or datetime.now()).date()
+    with _lock:
+        state = _get_state(today)
+        value = state["values"][metric].get(username)
+        if value is None or not is_current(metric, value[1], today):
+            return None
+        order = state["order"][metric]
+        return sum(
+            bisect_left(order.get(s, ()), (-value[0], username)) for s in current_stamps(metric, today)
+        ) + 1
+
+# =====================
+# DỰNG LẠI OFFLINE
+# =====================
+def rebuild(user_folder=USER_FOLDER, now=None):
+    """Tính lại toàn bộ từ file user, ghi snapshot mới và xoá journal."""
+    global _state
+    state = _empty_state()
+    for path in iter_user_files(user_folder):
+        user_data = read_json(path)
+        username = user_data.get("username") or os.path.basename(path)[:-5]
+        for metric, (value, stamp) in user_metrics(user_data, now).items():
+            _set(state, metric, username, value, stamp)
+
+    os.makedirs(LEADERBOARD_FOLDER, exist_ok=True)
+    snapshot_path, journal_path = _paths()
+    with _lock, open(journal_path, "ab") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        state["generation"] = read_json(snapshot_path).get("generation", 0) + 1
+        _write_snapshot(state)
+        header = _header_line(state["generation"])
+        f.truncate(0)
+        f.write(header)
+        f.flush()
+        state["offset"] = len(header)
+        _state = state
+    return len(state["values"]["streak"])
+
+# =====================
+# MAIN
+# =====================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bảng xếp hạng giữa các user")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_rebuild = sub.add_parser("rebuild", help="dựng lại từ file user")
+    p_rebuild.add_argument("--users", default=USER_FOLDER)
+    p_top = sub.add_parser("top", help="in top-K")
+    p_top.add_argument("--metric", choices=METRICS, default="reviews_week")
+    p_top.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.cmd == "rebuild":
+        n = rebuild(args.users)
+        print(f"✅ Đã dựng lại bảng xếp hạng cho {n} user")
+    else:
+        for i, (username, value) in enumerate(top(args.metric, args.k), 1):
+            print(f"{i:>3}. {username:<20} {value}")
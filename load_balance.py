@@ -0,0 +1,191 @@
+"""
+Dàn đều lịch ôn (load balancing) + giới hạn số thẻ mỗi ngày.
+
+update_srs đặt next_review = now + interval chính xác, nên các thẻ học cùng lúc
+đến hạn cùng lúc → user có ngày phải ôn hàng trăm thẻ, server bị dồn request.
+Khi bật chế độ này:
+    - Khoảng ôn ≥ 1 ngày được phép lệch ±FUZZ_FACTOR (tối đa MAX_FUZZ_DAYS ngày).
+      Trong các ngày ứng viên, chọn ngày đang có ít thẻ đến hạn nhất (hoà thì
+      chọn ngày gần mục tiêu nhất), giữ nguyên giờ trong ngày.
+    - Số thẻ đến hạn theo ngày của user nằm ở user_data["due_days"]
+      ({"YYYY-MM-DD": số thẻ}) kèm tổng user_data["due_total"], cập nhật O(1)
+      mỗi lần ôn / thêm thẻ và dựng lại từ words khi nạp user hoặc khi tổng lệch
+      số thẻ (bắt cả thay đổi ngoài app: import, migrate...). Đây là dữ liệu
+      dẫn xuất chỉ sống trong session: strip() bỏ đi trước khi ghi file user.
+    - Giới hạn mỗi ngày: MAX_NEW_PER_DAY từ mới và MAX_REVIEWS_PER_DAY lượt ôn
+      (đếm theo user_data["daily"]); 0 = không giới hạn.
+
+Cấu hình:
+    VOCAB_LOAD_BALANCE=1            bật (mặc định tắt)
+    VOCAB_MAX_NEW_PER_DAY=20
+    VOCAB_MAX_REVIEWS_PER_DAY=200
+
+Cách dùng:
+    python load_balance.py --cards 500 --days 90    # mô phỏng đỉnh tải trước / sau
+"""
+
+import argparse
+import os
+import random
+from datetime import datetime, timedelta
+
+ENABLED = os.environ.get("VOCAB_LOAD_BALANCE", "0") == "1"
+MAX_NEW_PER_DAY = int(os.environ.get("VOCAB_MAX_NEW_PER_DAY", "20"))
+MAX_REVIEWS_PER_DAY = int(os.environ.get("VOCAB_MAX_REVIEWS_PER_DAY", "200"))
+FUZZ_FACTOR = 0.1       # lệch tối đa ±10% khoảng ôn
+MAX_FUZZ_DAYS = 7
+MIN_FUZZ_HOURS = 24     # khoảng ôn ngắn hơn thì giữ nguyên (ôn trong ngày)
+DERIVED_KEYS = ("due_days", "due_total")   # dựng lại khi nạp, không ghi vào file user
+
+# =====================
+# HISTOGRAM THEO NGÀY
+# =====================
+def day_of(iso):
+    return iso[:10]   # next_review dạng ISO → "YYYY-MM-DD"
+
+def refresh(user_data):
+    """Gọi khi nạp user vào session: dựng lại histogram (tắt thì bỏ đi)."""
+    strip(user_data)
+    if ENABLED:
+        histogram(user_data)
+
+def strip(user_data):
+    """Bỏ histogram khỏi user_data (gọi trên bản sẽ ghi file)."""
+    for key in DERIVED_KEYS:
+        user_data.pop(key, None)
+    return user_data
+
+def histogram(user_data, unscheduled=0):
+    """unscheduled: số thẻ đã nằm trong words nhưng chưa có next_review."""
+    words = user_data.get("words", {})
+    hist = user_data.get("due_days")
+    # Lệch tổng (thẻ bị xoá / thêm ngoài luồng) → dựng lại
+    if hist is None or user_data.get("due_total") != len(words) - unscheduled:
+        hist = user_data["due_days"] = {}
+        for state in words.values():
+            if "next_review" in state:
+                _move(hist, None, state["next_review"])
+        user_data["due_total"] = sum(hist.values())
+    return hist
+
+def _move(hist, old_iso, new_iso):
+    if old_iso:
+        day = day_of(old_iso)
+        if hist.get(day, 0) <= 1:
+            hist.pop(day, None)
+        else:
+            hist[day] -= 1
+    day = day_of(new_iso)
+    hist[day] = hist.get(day, 0) + 1
+
+# =====================
+# CHỌN NGÀY ĐẾN HẠN
+# =====================
+def fuzz_days(interval_hours):
+    if interval_hours < MIN_FUZZ_HOURS:
+        return 0
+    return min(MAX_FUZZ_DAYS, max(1, round(interval_hours / 24 * FUZZ_FACTOR)))
+
+def choose_due(hist, interval_hours, now):
+    """Thời điểm đến hạn trong khoảng fuzz, ưu tiên ngày ít thẻ nhất."""
+    target = now + timedelta(hours=interval_hours)
+    fuzz = fuzz_days(interval_hours)
+    if fuzz == 0:
+        return target
+    best = None
+    for offset in range(-fuzz, fuzz + 1):
+        due = target + timedelta(days=offset)
+        # Không dời về hôm nay / sớm hơn 1 ngày
+        if due - now < timedelta(hours=MIN_FUZZ_HOURS):
+            continue
+        score = (hist.get(due.date().isoformat(), 0), abs(offset))
+        if best is None or score < best[0]:
+            best = (score, due)
+    return best[1] if best else target
+
+def schedule(user_data, word_id, interval_hours, now=None):
+    """
+    Đặt next_review cho words[word_id] (thẻ mới hoặc vừa ôn) và cập nhật histogram.
+    Trả về khoảng ôn thực tế (giờ) sau khi dời ngày.
+    """
+    now = now or datetime.now()
+    state = user_data["words"][word_id]
+    if not ENABLED:
+        state["next_review"] = (now + timedelta(hours=interval_hours)).isoformat()
+        return interval_hours
+    old = state.get("next_review")
+    hist = histogram(user_data, unscheduled=int(old is None))
+    due = choose_due(hist, interval_hours, now)
+    state["next_review"] = due.isoformat()
+    _move(hist, old, state["next_review"])
+    if old is None:
+        user_data["due_total"] += 1
+    return (due - now).total_seconds() / 3600
+
+# =====================
+# GIỚI HẠN MỖI NGÀY
+# =====================
+def remaining_today(user_data, kind, now=None):
+    """Số thẻ `kind` ("new_words" / "reviews") còn được học hôm nay, None = không giới hạn."""
+    cap = {"new_words": MAX_NEW_PER_DAY, "reviews": MAX_REVIEWS_PER_DAY}[kind]
+    if not ENABLED or cap <= 0:
+        return None
+    today = (now or datetime.now()).date().isoformat()
+    done = user_data.get("daily", {}).get(today, {}).get(kind, 0)
+    return max(0, cap - done)
+
+def apply_cap(items, user_data, kind, taken=0):
+    """Cắt list theo giới hạn còn lại, trừ `taken` thẻ đã nằm trong hàng đợi."""
+    left = remaining_today(user_data, kind)
+    if left is None:
+        return items
+    return items[:max(0, left - taken)]
+
+# =====================
+# MÔ PHỎNG
+# =====================
+def simulate(n_cards, days, balanced, seed=0, recall=0.9,
+             init_hours=4, ease=2.5, ease_bonus=0.1, lapse_factor=0.5, min_hours=2):
+    """Số thẻ đến hạn mỗi ngày khi n_cards thẻ được học cùng lúc ngày 0."""
+    global ENABLED
+    rng = random.Random(seed)
+    start = datetime(2026, 1, 1, 9)
+    user_data = {"words": {}, "daily": {}}
+    enabled, ENABLED = ENABLED, balanced
+    try:
+        for i in range(n_cards):
+            user_data["words"][f"w{i}"] = {"interval_hours": init_hours, "ease_factor": ease}
+            schedule(user_data, f"w{i}", init_hours, start)
+        due_per_day = [0] * days
+        for day in range(days):
+            now = start + timedelta(days=day)
+            end = (now + timedelta(days=1)).isoformat()
+            for word_id, state in user_data["words"].items():
+                # Ôn mọi thẻ đến hạn trong ngày (kể cả thẻ vừa dời tới hôm nay)
+                while state["next_review"] < end:
+                    due_per_day[day] += 1
+                    if rng.random() < recall:
+                        interval = state["interval_hours"] * state["ease_factor"]
+                        state["ease_factor"] += ease_bonus
+                    else:
+                        interval = max(min_hours, state["interval_hours"] * lapse_factor)
+                    reviewed_at = max(now, datetime.fromisoformat(state["next_review"]))
+                    state["interval_hours"] = schedule(user_data, word_id, interval, reviewed_at)
+        return due_per_day
+    finally:
+        ENABLED = enabled
+
+# =====================
+# MAIN
+# =====================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mô phỏng dàn đều lịch ôn")
+    parser.add_argument("--cards", type=int, default=500, help="số thẻ học cùng ngày")
+    parser.add_argument("--days", type=int, default=90)
+    args = parser.parse_args()
+
+    for balanced in (False, True):
+        per_day = simulate(args.cards, args.days, balanced)
+        busy = [n for n in per_day[7:] if n]
+        print(f"📊 {'dàn đều' if balanced else 'gốc    '}: đỉnh {max(per_day[7:])} thẻ / ngày "
+              f"(từ ngày 7), {len(busy)}/{args.days - 7} ngày có ôn, tổng {sum(per_day)} lượt")
@@ -0,0 +1,337 @@
+"""
+Load test cho app_ver2.py dựa trên streamlit.testing.v1.AppTest
+
+Mỗi phiên giả lập chạy kịch bản: đăng nhập → thêm từ → học từ → ôn tập → trang chủ.
+Nhiều phiên chạy song song bằng process pool, kết quả gồm p50/p95/p99 thời gian
+chạy script theo từng trang / hành động và số byte file đọc/ghi cho mỗi hành động.
+
+Cách dùng:
+    python loadtest.py --sessions 40 --workers 8 --budget-ms 800
+    python loadtest.py --sessions 10 --report bench_output.json
+
+Thoát với mã 1 nếu có hành động vượt ngân sách độ trễ (--budget-ms, áp dụng cho
+percentile --budget-percentile), hoặc nếu script ném exception.
+"""
+
+import argparse
+import builtins
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_FILE = os.path.join(APP_DIR, "app_ver2.py")
+TOPIC_FILE = "basic_vocab.json"
+PASSWORD = "loadtest"
+
+# =====================
+# WORKSPACE
+# =====================
+def prepare_workspace(workspace, sessions, due_per_user):
+    """
+    Tạo thư mục làm việc riêng cho load test (không đụng vào Users/ thật):
+    copy Topics/, link static/, đăng ký sẵn user và gieo sẵn các từ đến hạn ôn.
+    """
+    shutil.copytree(os.path.join(APP_DIR, "Topics"), os.path.join(workspace, "Topics"))
+    os.symlink(os.path.join(APP_DIR, "static"), os.path.join(workspace, "static"))
+    user_folder = os.path.join(workspace, "Users")
+    os.makedirs(user_folder)
+
+    with open(os.path.join(workspace, "Topics", TOPIC_FILE), "r", encoding="utf-8") as f:
+        vocab = json.load(f)
+    # Từ gieo sẵn để ôn lấy từ cuối topic, phần đầu để dành cho bước thêm/học
+    seeded = list(vocab.items())[-due_per_user:] if due_per_user > 0 else []
+    due_time = (datetime.now() - timedelta(hours=1)).isoformat()
+
+    users = {}
+    for i in range(sessions):
+        username = f"lt_{i}"
+        users[username] = PASSWORD
+        words = {}
+        for word_id, info in seeded:
+            words[word_id] = dict(info, interval_hours=4, ease_factor=2.5,
+                                  next_review=due_time, review_count=0)
+        user_data = {
+            "username": username,
+            "words": words,
+            "pending_words": {},
+            "stats": {
+                "total_words": len(words),
+                "words_mastered": 0,
+                "total_reviews": 0,
+                "streak_days": 0,
+                "last_study": None
+            },
+            "knew_words": {}
+        }
+        with open(os.path.join(user_folder, f"{username}.json"), "w", encoding="utf-8") as f:
+            json.dump(user_data, f, ensure_ascii=False, indent=2)
+
+    with open(os.path.join(user_folder, "total_users.json"), "w", encoding="utf-8") as f:
+        json.dump(users, f, ensure_ascii=False, indent=2)
+
+# =====================
+# IO COUNTER
+# =====================
+_io = {"read": 0, "written": 0}
+_watched_dirs = ()
+
+class _CountingFile:
+    """Bọc file object để đếm số byte đọc/ghi (text được tính theo UTF-8)."""
+
+    def __init__(self, f):
+        self._f = f
+
+    def read(self, *args):
+        data = self._f.read(*args)
+        _io["read"] += len(data.encode("utf-8")) if isinstance(data, str) else len(data)
+        return data
+
+    def write(self, data):
+        _io["written"] += len(data.encode("utf-8")) if isinstance(data, str) else len(data)
+        return self._f.write(data)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return self._f.__exit__(*exc)
+
+    def __iter__(self):
+        return iter(self._f)
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+def _counting_open(original_open):
+    def _open(file, *args, **kwargs):
+        f = original_open(file, *args, **kwargs)
+        if isinstance(file, (str, bytes, os.PathLike)):
+            path = os.path.abspath(os.fsdecode(file))
+            if path.startswith(_watched_dirs):
+                return _CountingFile(f)
+        return f
+    return _open
+
+def _init_worker(workspace):
+    global _watched_dirs
+    os.chdir(workspace)
+    os.environ["VOCAB_REFRESH_INTERVAL"] = "0"   # bỏ qua vòng lặp sleep trong main()
+    os.environ["VOCAB_PREFETCH"] = "0"           # không gọi gTTS (cần mạng) khi load test
+    _watched_dirs = tuple(
+        os.path.join(workspace, d) + os.sep for d in ("Users", "Topics")
+    )
+    builtins.open = _counting_open(builtins.open)
+
+# =====================
+# SESSION SCRIPT
+# =====================
+def _find_button(at, label_prefix):
+    for b in at.button:
+        if b.label.startswith(label_prefix) and not b.disabled:
+            return b
+    return None
+
+def run_session(index, words_to_add=4, timeout=30):
+    """Chạy 1 phiên giả lập, trả về (danh sách bản ghi, danh sách lỗi)."""
+    from streamlit.testing.v1 import AppTest
+
+    records = []
+    errors = []
+    at = AppTest.from_file(APP_FILE, default_timeout=timeout)
+
+    def step(page, action, fn):
+        _io["read"] = _io["written"] = 0
+        start = time.perf_counter()
+        fn()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        records.append({
+            "page": page,
+            "action": action,
+            "ms": elapsed_ms,
+            "bytes_read": _io["read"],
+            "bytes_written": _io["written"],
+        })
+        if at.exception:
+            errors.append(f"lt_{index} {page}/{action}: {at.exception[0].message}")
+            return False
+        return True
+
+    def goto(label):
+        at.sidebar.radio[0].set_value(label)
+        at.run()
+
+    # --- Đăng nhập ---
+    if not step("login", "open", at.run):
+        return records, errors
+
+    def login():
+        at.text_input(key="login_username").input(f"lt_{index}")
+        at.text_input(key="login_password").input(PASSWORD)
+        at.button(key="login_btn").click().run()
+    if not step("login", "submit", login):
+        return records, errors
+
+    # --- Thêm từ ---
+    if not step("add_words", "open", lambda: goto("➕ Thêm từ mới")):
+        return records, errors
+
+    def show_topic():
+        at.selectbox[0].set_value(TOPIC_FILE).run()
+        _find_button(at, "🔍").click().run()
+    if not step("add_words", "show_topic", show_topic):
+        return records, errors
+
+    for _ in range(words_to_add):
+        if not any(b.key == "add_0" for b in at.button):
+            break
+        if not step("add_words", "add_word", lambda: at.button(key="add_0").click().run()):
+            return records, errors
+
+    # --- Học từ ---
+    if not step("learn", "open", lambda: goto("🎓 Học từ vựng")):
+        return records, errors
+
+    for _ in range(words_to_add * 3):
+        next_btn = _find_button(at, "➡️")
+        if next_btn is not None:
+            if not step("learn", "next", lambda: next_btn.click().run()):
+                return records, errors
+            continue
+        if any(b.key == "mc_0" for b in at.button):
+            action = lambda: at.button(key="mc_0").click().run()
+        else:
+            check_btn = _find_button(at, "✔️")
+            if check_btn is None:
+                break
+            def action():
+                at.text_input[0].input("loadtest")
+                check_btn.click().run()
+        if not step("learn", "answer", action):
+            return records, errors
+
+    # --- Ôn tập ---
+    if not step("review", "open", lambda: goto("📝 Ôn tập")):
+        return records, errors
+
+    remembered = True
+    while True:
+        flip_btn = _find_button(at, "👁️")
+        if flip_btn is None:
+            break
+        if not step("review", "flip", lambda: flip_btn.click().run()):
+            return records, errors
+        answer_btn = _find_button(at, "✅" if remembered else "❌")
+        if answer_btn is None:
+            break
+        if not step("review", "answer", lambda: answer_btn.click().run()):
+            return records, errors
+        remembered = not remembered
+
+    # --- Trang chủ ---
+    step("dashboard", "open", lambda: goto("🏠 Trang chủ"))
+    return records, errors
+
+# =====================
+# REPORT
+# =====================
+def percentile(sorted_values, p):
+    """Percentile theo nearest-rank trên list đã sắp xếp."""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+def summarize(records):
+    groups = defaultdict(list)
+    for r in records:
+        groups[(r["page"], r["action"])].append(r)
+        groups[(r["page"], "*")].append(r)
+
+    summary = {}
+    for (page, action), rows in sorted(groups.items()):
+        ms = sorted(r["ms"] for r in rows)
+        summary[f"{page}/{action}"] = {
+            "n": len(rows),
+            "p50_ms": percentile(ms, 50),
+            "p95_ms": percentile(ms, 95),
+            "p99_ms": percentile(ms, 99),
+            "bytes_read": sum(r["bytes_read"] for r in rows) / len(rows),
+            "bytes_written": sum(r["bytes_written"] for r in rows) / len(rows),
+        }
+    return summary
+
+def print_summary(summary):
+    header = f"{'page/action':<24}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'read B':>12}{'write B':>12}"
+    print(header)
+    print("-" * len(header))
+    for name, s in summary.items():
+        print(f"{name:<24}{s['n']:>6}{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}"
+              f"{s['bytes_read']:>12.0f}{s['bytes_written']:>12.0f}")
+
+# =====================
+# MAIN
+# =====================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test app_ver2.py bằng AppTest")
+    parser.add_argument("--sessions", type=int, default=8, help="số phiên giả lập")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="số process chạy song song")
+    parser.add_argument("--words", type=int, default=4, help="số từ thêm/học mỗi phiên")
+    parser.add_argument("--due", type=int, default=4, help="số từ đến hạn ôn gieo sẵn cho mỗi user")
+    parser.add_argument("--budget-ms", type=float, default=None, help="ngân sách độ trễ cho mỗi hành động")
+    parser.add_argument("--budget-percentile", type=int, default=95, choices=[50, 95, 99])
+    parser.add_argument("--report", default=None, help="ghi kết quả ra file JSON")
+    args = parser.parse_args(argv)
+
+    # AppTest thay sys.modules["__main__"] khi chạy script, nên worker phải tham
+    # chiếu hàm qua tên module thật thay vì __main__
+    import loadtest
+
+    workspace = tempfile.mkdtemp(prefix="vocab_loadtest_")
+    try:
+        prepare_workspace(workspace, args.sessions, args.due)
+        records, errors = [], []
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=loadtest._init_worker,
+                                 initargs=(workspace,)) as pool:
+            futures = [pool.submit(loadtest.run_session, i, args.words) for i in range(args.sessions)]
+            for fut in futures:
+                session_records, session_errors = fut.result()
+                records.extend(session_records)
+                errors.extend(session_errors)
+        wall = time.perf_counter() - start
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    summary = summarize(records)
+    print_summary(summary)
+    print(f"\n⏱️ {args.sessions} phiên, {len(records)} lượt chạy script trong {wall:.1f}s")
+
+    failed = False
+    for e in errors:
+        print(f"❌ {e}")
+        failed = True
+
+    if args.budget_ms is not None:
+        key = f"p{args.budget_percentile}_ms"
+        for name, s in summary.items():
+            if not name.endswith("/*") and s[key] > args.budget_ms:
+                print(f"⚠️ {name}: {key}={s[key]:.1f} vượt ngân sách {args.budget_ms:.1f}ms")
+                failed = True
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"summary": summary, "errors": errors, "wall_seconds": wall},
+                      f, ensure_ascii=False, indent=2)
+
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+"""
+Đo đạc hot path cho app (opt-in): số lần gọi, histogram độ trễ và số byte.
+
+Bật bằng biến môi trường:
+    VOCAB_METRICS=prometheus   → HTTP endpoint dạng Prometheus text tại
+                                 http://<host>:VOCAB_METRICS_PORT/metrics (mặc định 9464)
+    VOCAB_METRICS=jsonl        → ghi snapshot mỗi VOCAB_METRICS_INTERVAL giây (mặc định 15)
+                                 vào VOCAB_METRICS_FILE (mặc định metrics/metrics.jsonl),
+                                 tự xoay vòng file khi vượt VOCAB_METRICS_MAX_BYTES
+
+Khi tắt (mặc định), instrument() trả về nguyên hàm gốc và add_bytes() chỉ là
+một lần kiểm tra cờ, nên gần như không tốn chi phí.
+"""
+
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+from functools import wraps
+
+MODE = os.environ.get("VOCAB_METRICS", "").strip().lower()
+ENABLED = MODE in ("prometheus", "jsonl")
+
+PORT = int(os.environ.get("VOCAB_METRICS_PORT", "9464"))
+JSONL_FILE = os.environ.get("VOCAB_METRICS_FILE", os.path.join("metrics", "metrics.jsonl"))
+JSONL_INTERVAL = float(os.environ.get("VOCAB_METRICS_INTERVAL", "15"))
+JSONL_MAX_BYTES = int(os.environ.get("VOCAB_METRICS_MAX_BYTES", str(10 * 1024 * 1024)))
+JSONL_BACKUPS = 5
+
+# Biên trên của các bucket histogram (giây)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_calls = {}     # name -> [count, errors, sum_seconds, [bucket counts..., +Inf]]
+_bytes = {}     # (name, direction) -> tổng số byte
+_events = {}    # (name, kind) -> số lần (vd prefetch hit / miss)
+_started = False
+
+# =====================
+# GHI NHẬN
+# =====================
+def observe(name, seconds, error=False):
+    with _lock:
+        entry = _calls.get(name)
+        if entry is None:
+            entry = _calls[name] = [0, 0, 0.0, [0] * (len(BUCKETS) + 1)]
+        entry[0] += 1
+        if error:
+            entry[1] += 1
+        entry[2] += seconds
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                entry[3][i] += 1
+                break
+        else:
+            entry[3][-1] += 1
+
+def add_bytes(name, n, direction="read"):
+    if not ENABLED:
+        return
+    with _lock:
+        key = (name, direction)
+        _bytes[key] = _bytes.get(key, 0) + n
+
+def inc(name, kind, n=1):
+    """Đếm sự kiện (vd inc("prefetch_audio", "hit"))."""
+    if not ENABLED:
+        return
+    with _lock:
+        key = (name, kind)
+        _events[key] = _events.get(key, 0) + n
+
+def instrument(name):
+    """Decorator đo số lần gọi / độ trễ của hàm. Trả về hàm gốc khi metrics tắt."""
+    def decorator(fn):
+        if not ENABLED:
+            return fn
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            error = False
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                # st.rerun()/st.stop() là BaseException nên không bị tính là lỗi
+                error = True
+                raise
+            finally:
+                observe(name, time.perf_counter() - start, error)
+        return wrapper
+    return decorator
+
+def snapshot():
+    with _lock:
+        calls = {
+            name: {
+                "count": count,
+                "errors": errors,
+                "sum_seconds": total,
+                "buckets": dict(zip([str(b) for b in BUCKETS] + ["+Inf"], buckets)),
+            }
+            for name, (count, errors, total, buckets) in _calls.items()
+        }
+        io_bytes = {f"{name}:{direction}": n for (name, direction), n in _bytes.items()}
+        events = {f"{name}:{kind}": n for (name, kind), n in _events.items()}
+    return {"calls": calls, "bytes": io_bytes, "events": events}
+
+# =====================
+# EXPORT
+# =====================
+def render_prometheus():
+    with _lock:
+        calls = [(name, list(v[:3]), list(v[3])) for name, v in sorted(_calls.items())]
+        io_bytes = sorted(_bytes.items())
+        events = sorted(_events.items())
+
+    lines = [
+        "# HELP vocab_call_duration_seconds Thời gian chạy hàm được đo.",
+        "# TYPE vocab_call_duration_seconds histogram",
+    ]
+    for name, (count, _, total), buckets in calls:
+        cumulative = 0
+        for bound, n in zip(BUCKETS, buckets):
+            cumulative += n
+            lines.append(f'vocab_call_duration_seconds_bucket{{fn="{name}",le="{bound}"}} {cumulative}')
+        lines.append(f'vocab_call_duration_seconds_bucket{{fn="{name}",le="+Inf"}} {count}')
+        lines.append(f'vocab_call_duration_seconds_sum{{fn="{name}"}} {total}')
+        lines.append(f'vocab_call_duration_seconds_count{{fn="{name}"}} {count}')
+
+    lines.append("# HELP vocab_call_errors_total Số lần hàm ném exception.")
+    lines.append("# TYPE vocab_call_errors_total counter")
+    for name, (_, errors, _), _ in calls:
+        lines.append(f'vocab_call_errors_total{{fn="{name}"}} {errors}')
+
+    lines.append("# HELP vocab_io_bytes_total Số byte đọc/ghi/sinh ra.")
+    lines.append("# TYPE vocab_io_bytes_total counter")
+    for (name, direction), n in io_bytes:
+        lines.append(f'vocab_io_bytes_total{{fn="{name}",direction="{direction}"}} {n}')
+
+    lines.append("# HELP vocab_events_total Số lần xảy ra sự kiện (prefetch hit/miss...).")
+    lines.append("# TYPE vocab_events_total counter")
+    for (name, kind), n in events:
+        lines.append(f'vocab_events_total{{fn="{name}",kind="{kind}"}} {n}')
+    return "\n".join(lines) + "\n"
+
+def _serve_prometheus():
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("", PORT), Handler)
+    server.serve_forever()
+
+def _write_jsonl():
+    os.makedirs(os.path.dirname(JSONL_FILE) or ".", exist_ok=True)
+    logger = logging.getLogger("vocab.metrics")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.handlers.RotatingFileHandler(
+        JSONL_FILE, maxBytes=JSONL_MAX_BYTES, backupCount=JSONL_BACKUPS, encoding="utf-8"
+    ))
+    while True:
+        time.sleep(JSONL_INTERVAL)
+        record = {"ts": time.time(), "pid": os.getpid()}
+        record.update(snapshot())
+        logger.info(json.dumps(record, ensure_ascii=False))
+
+def start():
+    """Khởi động exporter (1 lần mỗi process). Gọi lại nhiều lần không sao."""
+    global _started
+    if not ENABLED or _started:
+        return
+    with _lock:
+        if _started:
+            return
+        _started = True
+    target = _serve_prometheus if MODE == "prometheus" else _write_jsonl
+    threading.Thread(target=target, name="vocab-metrics", daemon=True).start()
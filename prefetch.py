@@ -0,0 +1,133 @@
+"""
+Chuẩn bị trước audio của các thẻ sắp tới trong phiên học / ôn tập.
+
+Khi user đang xem thẻ N, app gọi schedule_cards() với thẻ N..N+AHEAD; các
+thread nền sinh sẵn audio (gTTS) cho từ và câu ví dụ. Bấm 🔊 thì get_audio()
+lấy bytes đã có sẵn (hit), chờ nốt nếu đang sinh dở (wait) hoặc sinh ngay
+nếu chưa được chuẩn bị (miss). Cache LRU dùng chung cho mọi session của process
+(cùng 1 text → cùng 1 file audio).
+
+Số liệu hit / wait / miss có ở stats() và ở metrics (vocab_events_total
+khi bật VOCAB_METRICS).
+
+Cấu hình:
+    VOCAB_PREFETCH=1            bật (mặc định tắt: mỗi thẻ hiển thị sẽ gọi gTTS qua
+                                mạng cho cả các thẻ user có thể không bấm nghe;
+                                tắt thì get_audio luôn sinh đồng bộ)
+    VOCAB_PREFETCH_AHEAD=3      số thẻ chuẩn bị trước
+    VOCAB_PREFETCH_WORKERS=2    số thread nền
+
+Cách dùng:
+    import prefetch
+    prefetch.schedule_cards([word_data, ...])
+    audio = prefetch.get_audio(text)
+"""
+
+import io
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import metrics
+
+ENABLED = os.environ.get("VOCAB_PREFETCH", "0") == "1"
+AHEAD = int(os.environ.get("VOCAB_PREFETCH_AHEAD", "3"))
+WORKERS = int(os.environ.get("VOCAB_PREFETCH_WORKERS", "2"))
+AUDIO_CACHE_SIZE = 512
+AUDIO_TIMEOUT = 10   # giây, cho request gTTS
+
+_lock = threading.Lock()
+_pool = None
+_audio = OrderedDict()   # text → Future[bytes]
+_stats = {"scheduled": 0, "hit": 0, "wait": 0, "miss": 0, "error": 0}
+
+def synthesize(text):
+    from gtts import gTTS   # chỉ import khi thật sự cần audio
+    audio = io.BytesIO()
+    gTTS(text=text, lang="en", timeout=AUDIO_TIMEOUT).write_to_fp(audio)
+    metrics.add_bytes("play_sound", audio.tell(), "audio")
+    return audio.getvalue()
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="prefetch")
+    return _pool
+
+def _count(kind):
+    _stats[kind] += 1
+    metrics.inc("prefetch_audio", kind)
+
+def _remember(text, fut):
+    _audio[text] = fut
+    _audio.move_to_end(text)
+    while len(_audio) > AUDIO_CACHE_SIZE:
+        _audio.popitem(last=False)
+
+# =====================
+# API
+# =====================
+def schedule_audio(texts):
+    """Đưa các text chưa có trong cache vào hàng đợi sinh audio nền."""
+    if not ENABLED:
+        return
+    with _lock:
+        for text in texts:
+            if not text:
+                continue
+            fut = _audio.get(text)
+            # Lần trước lỗi (vd mất mạng) thì thử lại
+            if fut is not None and not (fut.done() and fut.exception() is not None):
+                _audio.move_to_end(text)
+                continue
+            _remember(text, _get_pool().submit(synthesize, text))
+            _stats["scheduled"] += 1
+
+def schedule_cards(cards):
+    """cards: các word_data (đủ text) của thẻ hiện tại và các thẻ kế tiếp."""
+    texts = []
+    for word_data in cards[:AHEAD + 1]:
+        texts.append(word_data.get("word", ""))
+        texts.append(word_data.get("example", ""))
+    schedule_audio(texts)
+
+def get_audio(text):
+    """Bytes mp3 của text: lấy từ cache nếu đã chuẩn bị, nếu chưa thì sinh ngay."""
+    with _lock:
+        fut = _audio.get(text)
+        if fut is not None:
+            _audio.move_to_end(text)
+
+    if fut is not None:
+        if fut.done():
+            if fut.exception() is None:
+                with _lock:
+                    _count("hit")
+                return fut.result()
+            with _lock:
+                _count("error")
+        else:
+            with _lock:
+                _count("wait")
+            try:
+                return fut.result(timeout=AUDIO_TIMEOUT)
+            except Exception:
+                with _lock:
+                    _count("error")
+
+    with _lock:
+        _count("miss")
+    data = synthesize(text)
+    done = Future()
+    done.set_result(data)
+    with _lock:
+        _remember(text, done)
+    return data
+
+def stats():
+    with _lock:
+        result = dict(_stats)
+    served = result["hit"] + result["wait"] + result["miss"]
+    result["hit_rate"] = (result["hit"] + result["wait"]) / served if served else None
+    return result
@@ -0,0 +1,409 @@
+"""
+Xuất / nhập tiến độ học của user (CSV và gói Anki .apkg).
+
+Xuất:
+    - CSV: mỗi dòng 1 từ trong words / pending_words / knew_words kèm trạng thái SRS,
+      ghi từng dòng ra file (không dựng cả file trong bộ nhớ).
+    - Anki (.apkg): collection.anki2 (schema v11) với 1 note type 6 trường
+      (Word, POS, Meaning, Example, ExampleMeaning, WordId). words → thẻ ôn tập
+      (ivl/factor/due quy đổi từ interval_hours/ease_factor/next_review),
+      pending_words → thẻ mới, knew_words → thẻ bị suspend gắn tag "knew".
+Nhập:
+    - Đọc CSV / .apkg theo từng lô IMPORT_CHUNK_ROWS dòng, quy đổi ivl (ngày) →
+      interval_hours và factor (‰) → ease_factor, gộp vào user_data rồi ghi file
+      user đúng 1 lần (không ghi lại file sau từng thẻ), sau đó cập nhật lịch
+      nhắc (due_scheduler) và bảng xếp hạng (leaderboard) của user.
+
+Cách dùng:
+    python progress_io.py export --user a --format csv --out a.csv
+    python progress_io.py export --user a --format apkg --out a.apkg
+    python progress_io.py import --user a deck.apkg [--overwrite]
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import time
+import zipfile
+from datetime import datetime, timedelta
+from itertools import islice
+
+import due_scheduler
+import leaderboard
+import user_sync
+from storage import read_json
+
+USER_FOLDER = "Users"
+IMPORT_CHUNK_ROWS = 1000
+SECTIONS = ("words", "pending_words", "knew_words")
+TEXT_FIELDS = ("word", "pos", "meaning", "example", "example_meaning")
+CSV_COLUMNS = ("section", "word_id") + TEXT_FIELDS + (
+    "interval_hours", "ease_factor", "next_review", "review_count"
+)
+
+# Giá trị mặc định khi nguồn nhập không có trạng thái SRS (khớp app_ver2.py)
+DEFAULT_INTERVAL_HOURS = 4
+DEFAULT_EASE = 2.5
+
+ANKI_MODEL_ID = 1700000000001
+ANKI_DECK_ID = 1700000000002
+ANKI_FIELDS = ("Word", "POS", "Meaning", "Example", "ExampleMeaning", "WordId")
+
+# Lỗi có thể gặp khi file nhập hỏng / sai định dạng
+IMPORT_ERRORS = (ValueError, KeyError, OSError, csv.Error, sqlite3.Error, zipfile.BadZipFile)
+
+# =====================
+# ĐỌC / GHI CHUNG
+# =====================
+def iter_entries(user_data):
+    """Duyệt (section, word_id, entry) của cả 3 nhóm từ."""
+    for section in SECTIONS:
+        for word_id, entry in user_data.get(section, {}).items():
+            yield section, word_id, entry
+
+def merge_entries(user_data, entries, overwrite=False):
+    """
+    Gộp các (section, word_id, entry) vào user_data (chưa ghi file).
+    Trả về số từ được thêm / cập nhật theo từng section.
+    """
+    counts = dict.fromkeys(SECTIONS, 0)
+    for section, word_id, entry in entries:
+        exists = any(word_id in user_data.setdefault(s, {}) for s in SECTIONS)
+        if exists and not overwrite:
+            continue
+        for s in SECTIONS:
+            user_data[s].pop(word_id, None)
+        user_data[section][word_id] = entry
+        counts[section] += 1
+    user_data.setdefault("stats", {})["total_words"] = len(user_data["words"])
+    return counts
+
+def import_file(path, username, overwrite=False, user_folder=USER_FOLDER):
+    """Nhập CSV hoặc .apkg vào file user, ghi file đúng 1 lần."""
+    user_file = os.path.join(user_folder, f"{username}.json")
+    if path.lower().endswith(".apkg"):
+        entries = read_apkg(path)
+    else:
+        entries = read_csv(path)
+
+    # Giữ khoá file user từ lúc đọc tới lúc ghi (session khác không ghi chen giữa)
+    with user_sync.locked(user_file):
+        user_data = read_json(user_file)
+        if not user_data:
+            raise FileNotFoundError(f"Không tìm thấy user: {username}")
+
+        counts = dict.fromkeys(SECTIONS, 0)
+        # Đọc nguồn theo lô, gộp vào user_data trong bộ nhớ
+        while True:
+            chunk = list(islice(entries, IMPORT_CHUNK_ROWS))
+            if not chunk:
+                break
+            for section, n in merge_entries(user_data, chunk, overwrite).items():
+                counts[section] += n
+
+        revision = user_sync.write(user_file, user_data)
+    # Lịch nhắc / xếp hạng thấy ngay thẻ vừa nhập, không chờ lượt trả lời tiếp theo
+    due_scheduler.update_user(username, user_data, version=revision)
+    leaderboard.update_user(username, user_data)
+    return user_data, counts
+
+def naive_local_iso(value):
+    """
+    next_review dạng ISO giờ địa phương không kèm múi giờ (app so với datetime.now()).
+    Có múi giờ → đổi sang giờ địa phương; sai định dạng → ValueError.
+    """
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone().replace(tzinfo=None)
+    return dt.isoformat()
+
+def _card_state(interval_hours, ease, next_review, review_count, text):
+    state = dict(text)
+    state.update({
+        "interval_hours": interval_hours,
+        "ease_factor": ease,
+        "next_review": next_review,
+        "review_count": review_count,
+    })
+    return state
+
+# =====================
+# CSV
+# =====================
+def export_csv(user_data, path):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_COLUMNS)
+        for section, word_id, entry in iter_entries(user_data):
+            writer.writerow(
+                [section, word_id] + [entry.get(k, "") for k in TEXT_FIELDS] + [
+                    entry.get("interval_hours", ""),
+                    entry.get("ease_factor", ""),
+                    entry.get("next_review", ""),
+                    entry.get("review_count", ""),
+                ]
+            )
+
+def read_csv(path):
+    """Đọc CSV theo từng dòng (cột giống export_csv; thiếu cột SRS → dùng mặc định)."""
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        for row in csv.DictReader(f):
+            word = (row.get("word") or "").strip()
+            if not word:
+                continue
+            text = {k: (row.get(k) or "").strip() for k in TEXT_FIELDS}
+            word_id = (row.get("word_id") or "").strip() or _imported_id(word, text["pos"])
+            section = row.get("section") if row.get("section") in SECTIONS else "words"
+
+            if section != "words":
+                yield section, word_id, text
+                continue
+            yield section, word_id, _card_state(
+                float(row.get("interval_hours") or DEFAULT_INTERVAL_HOURS),
+                float(row.get("ease_factor") or DEFAULT_EASE),
+                naive_local_iso(row.get("next_review") or datetime.now().isoformat()),
+                int(float(row.get("review_count") or 0)),
+                text,
+            )
+
+def _imported_id(word, pos):
+    digest = hashlib.sha1(f"{word.lower()}|{pos.lower()}".encode("utf-8")).hexdigest()[:12]
+    return f"import__{digest}"
+
+# =====================
+# ANKI
+# =====================
+_ANKI_SCHEMA = """
+CREATE TABLE col (id integer primary key, crt integer not null, mod integer not null,
+    scm integer not null, ver integer not null, dty integer not null, usn integer not null,
+    ls integer not null, conf text not null, models text not null, decks text not null,
+    dconf text not null, tags text not null);
+CREATE TABLE notes (id integer primary key, guid text not null, mid integer not null,
+    mod integer not null, usn integer not null, tags text not null, flds text not null,
+    sfld integer not null, csum integer not null, flags integer not null, data text not null);
+CREATE TABLE cards (id integer primary key, nid integer not null, did integer not null,
+    ord integer not null, mod integer not null, usn integer not null, type integer not null,
+    queue integer not null, due integer not null, ivl integer not null, factor integer not null,
+    reps integer not null, lapses integer not null, left integer not null, odue integer not null,
+    odid integer not null, flags integer not null, data text not null);
+CREATE TABLE revlog (id integer primary key, cid integer not null, usn integer not null,
+    ease integer not null, ivl integer not null, lastIvl integer not null, factor integer not null,
+    time integer not null, type integer not null);
+CREATE TABLE graves (usn integer not null, oid integer not null, type integer not null);
+CREATE INDEX ix_notes_usn on notes (usn);
+CREATE INDEX ix_cards_usn on cards (usn);
+CREATE INDEX ix_revlog_usn on revlog (usn);
+CREATE INDEX ix_cards_nid on cards (nid);
+CREATE INDEX ix_cards_sched on cards (did, queue, due);
+CREATE INDEX ix_revlog_cid on revlog (cid);
+CREATE INDEX ix_notes_csum on notes (csum);
+"""
+
+def _anki_col_row(deck_name, crt, now):
+    model = {
+        "id": ANKI_MODEL_ID, "name": "English Vocab", "type": 0, "mod": now, "usn": -1,
+        "sortf": 0, "did": ANKI_DECK_ID, "tags": [], "vers": [],
+        "flds": [
+            {"name": name, "ord": i, "sticky": False, "rtl": False, "font": "Arial", "size": 20, "media": []}
+            for i, name in enumerate(ANKI_FIELDS)
+        ],
+        "tmpls": [{
+            "name": "Card 1", "ord": 0, "did": None, "bqfmt": "", "bafmt": "",
+            "qfmt": "<h2>{{Word}}</h2> {{POS}}",
+            "afmt": "{{FrontSide}}<hr id=answer>{{Meaning}}<br><i>{{Example}}</i><br>{{ExampleMeaning}}",
+        }],
+        "css": ".card { font-family: arial; font-size: 20px; text-align: center; }",
+        "latexPre": "", "latexPost": "", "req": [[0, "any", [0]]],
+    }
+    deck = lambda did, name: {
+        "id": did, "name": name, "desc": "", "mod": now, "usn": -1, "collapsed": False,
+        "newToday": [0, 0], "revToday": [0, 0], "lrnToday": [0, 0], "timeToday": [0, 0],
+        "dyn": 0, "conf": 1, "extendNew": 10, "extendRev": 50,
+    }
+    dconf = {"1": {
+        "id": 1, "name": "Default", "mod": 0, "usn": 0, "maxTaken": 60, "autoplay": True,
+        "timer": 0, "replayq": True, "dyn": False,
+        "new": {"delays": [1, 10], "ints": [1, 4, 7], "initialFactor": 2500, "order": 1, "perDay": 20},
+        "lapse": {"delays": [10], "mult": 0, "minInt": 1, "leechFails": 8, "leechAction": 0},
+        "rev": {"perDay": 200, "ease4": 1.3, "fuzz": 0.05, "maxIvl": 36500, "ivlFct": 1},
+    }}
+    conf = {"nextPos": 1, "estTimes": True, "activeDecks": [1], "sortType": "noteFld",
+            "timeLim": 0, "sortBackwards": False, "addToCur": True, "curDeck": 1,
+            "newSpread": 0, "dueCounts": True, "curModel": str(ANKI_MODEL_ID), "collapseTime": 1200}
+    return (1, crt, now * 1000, now * 1000, 11, 0, 0, 0,
+            json.dumps(conf), json.dumps({str(ANKI_MODEL_ID): model}),
+            json.dumps({"1": deck(1, "Default"), str(ANKI_DECK_ID): deck(ANKI_DECK_ID, deck_name)}),
+            json.dumps(dconf), "{}")
+
+def _anki_rows(user_data, crt, now):
+    """Sinh (note, card) cho từng từ — quy đổi trạng thái SRS sang lịch của Anki."""
+    crt_day = datetime.fromtimestamp(crt).date()
+    new_pos = 0
+    for i, (section, word_id, entry) in enumerate(iter_entries(user_data)):
+        note_id = card_id = now * 1000 + i
+        flds = [entry.get(k, "") for k in TEXT_FIELDS] + [word_id]
+        sfld = flds[0]
+        csum = int(hashlib.sha1(sfld.encode("utf-8")).hexdigest()[:8], 16)
+        tags = f" vocab::{section} "
+
+        if section == "words":
+            next_review = datetime.fromisoformat(entry["next_review"])
+            interval_hours = entry.get("interval_hours", DEFAULT_INTERVAL_HOURS)
+            factor = int(round(entry.get("ease_factor", DEFAULT_EASE) * 1000))
+            if interval_hours < 24:
+                # Khoảng ôn dưới 1 ngày → thẻ learning, due là epoch giây
+                ctype, queue, due, ivl = 1, 1, int(next_review.timestamp()), 0
+            else:
+                ctype, queue, ivl = 2, 2, max(1, round(interval_hours / 24))
+                due = (next_review.date() - crt_day).days
+            reps, lapses = entry.get("review_count", 0), entry.get("lapses", 0)
+        else:
+            new_pos += 1
+            ctype, due, ivl, factor, reps, lapses = 0, new_pos, 0, 0, 0, 0
+            queue = -1 if section == "knew_words" else 0   # từ đã biết → suspend
+
+        note = (note_id, word_id, ANKI_MODEL_ID, now, -1, tags, "\x1f".join(flds), sfld, csum, 0, "")
+        card = (card_id, note_id, ANKI_DECK_ID, 0, now, -1, ctype, queue, due, ivl,
+                factor, reps, lapses, 0, 0, 0, 0, "")
+        yield note, card
+
+def export_apkg(user_data, path, deck_name=None):
+    deck_name = deck_name or f"English Vocab - {user_data.get('username', '')}"
+    now = int(time.time())
+    crt = int(datetime.combine(datetime.now().date(), datetime.min.time()).timestamp())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "collection.anki2")
+        conn = sqlite3.connect(db_path)
+        try:
+            conn.executescript(_ANKI_SCHEMA)
+            conn.execute("INSERT INTO col VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)", _anki_col_row(deck_name, crt, now))
+            rows = _anki_rows(user_data, crt, now)
+            while True:
+                chunk = list(islice(rows, IMPORT_CHUNK_ROWS))
+                if not chunk:
+                    break
+                conn.executemany("INSERT INTO notes VALUES (?,?,?,?,?,?,?,?,?,?,?)", [n for n, _ in chunk])
+                conn.executemany("INSERT INTO cards VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+                                 [c for _, c in chunk])
+            conn.commit()
+        finally:
+            conn.close()
+
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+            zf.write(db_path, "collection.anki2")
+            zf.writestr("media", "{}")
+
+_TAG_RE = re.compile(r"<[^>]+>")
+
+def _strip_html(text):
+    return _TAG_RE.sub("", text).replace("&nbsp;", " ").strip()
+
+def read_apkg(path):
+    """
+    Đọc thẻ từ gói .apkg theo lô (fetchmany). Hỗ trợ collection.anki2 / .anki21;
+    định dạng mới chỉ có collection.anki21b thì cần export lại từ Anki với
+    tuỳ chọn "Support older Anki versions".
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        with zipfile.ZipFile(path) as zf:
+            names = set(zf.namelist())
+            name = next((n for n in ("collection.anki21", "collection.anki2") if n in names), None)
+            if name is None:
+                raise ValueError("Gói .apkg không có collection.anki2/.anki21")
+            db_path = os.path.join(tmp, "collection.db")
+            with zf.open(name) as src, open(db_path, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+
+        conn = sqlite3.connect(db_path)
+        try:
+            crt = conn.execute("SELECT crt FROM col").fetchone()[0]
+            crt_day = datetime.fromtimestamp(crt)
+            cursor = conn.execute(
+                "SELECT n.guid, n.flds, n.tags, c.type, c.queue, c.due, c.ivl, c.factor, c.reps, c.lapses "
+                "FROM cards c JOIN notes n ON c.nid = n.id WHERE c.ord = 0"
+            )
+            while True:
+                rows = cursor.fetchmany(IMPORT_CHUNK_ROWS)
+                if not rows:
+                    break
+                for row in rows:
+                    entry = _apkg_entry(row, crt_day)
+                    if entry is not None:
+                        yield entry
+        finally:
+            conn.close()
+
+def _apkg_entry(row, crt_day):
+    guid, flds, tags, ctype, queue, due, ivl, factor, reps, lapses = row
+    fields = [_strip_html(f) for f in flds.split("\x1f")]
+    if not fields or not fields[0]:
+        return None
+
+    if len(fields) >= len(ANKI_FIELDS):
+        # Note type do export_apkg tạo ra
+        text = dict(zip(TEXT_FIELDS, fields))
+        word_id = fields[5] or _imported_id(text["word"], text["pos"])
+    else:
+        # Note Basic (Front/Back) của deck ngoài
+        text = {"word": fields[0], "pos": "", "meaning": fields[1] if len(fields) > 1 else "",
+                "example": "", "example_meaning": ""}
+        word_id = f"anki__{guid}"
+
+    if "knew_words" in tags or queue == -1:
+        return "knew_words", word_id, text
+    if ctype == 0:
+        return "pending_words", word_id, text
+
+    ease = factor / 1000 if factor else DEFAULT_EASE
+    if ctype == 2:
+        interval_hours = max(ivl, 1) * 24
+    else:
+        # learning / relearning: ivl âm nghĩa là giây
+        interval_hours = abs(ivl) / 3600 if ivl < 0 else max(ivl * 24, DEFAULT_INTERVAL_HOURS)
+    try:
+        if ctype == 2 or queue == 3:
+            # Thẻ ôn và learning theo ngày (queue 3): due là số ngày kể từ crt
+            next_review = datetime.combine((crt_day + timedelta(days=due)).date(), crt_day.time())
+        else:
+            # learning trong ngày (queue 1): due là epoch giây
+            next_review = datetime.fromtimestamp(due)
+    except (OverflowError, OSError) as e:
+        raise ValueError(f"due không hợp lệ ({due}) ở thẻ {word_id}") from e
+    state = _card_state(interval_hours, ease, next_review.isoformat(), reps, text)
+    if lapses:
+        state["lapses"] = lapses
+    return "words", word_id, state
+
+# =====================
+# MAIN
+# =====================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Xuất / nhập tiến độ học")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_export = sub.add_parser("export")
+    p_export.add_argument("--user", required=True)
+    p_export.add_argument("--format", choices=["csv", "apkg"], default="csv")
+    p_export.add_argument("--out", required=True)
+    p_import = sub.add_parser("import")
+    p_import.add_argument("--user", required=True)
+    p_import.add_argument("path")
+    p_import.add_argument("--overwrite", action="store_true", help="ghi đè từ đã có")
+    args = parser.parse_args()
+
+    if args.cmd == "export":
+        user_data = read_json(os.path.join(USER_FOLDER, f"{args.user}.json"))
+        if not user_data:
+            print(f"⚠️ Không tìm thấy user: {args.user}")
+        else:
+            (export_csv if args.format == "csv" else export_apkg)(user_data, args.out)
+            print(f"✅ Đã xuất: {args.out}")
+    else:
+        _, counts = import_file(args.path, args.user, args.overwrite)
+        print(f"✅ Đã nhập: {counts}")
@@ -0,0 +1,212 @@
+"""
+Lưu lịch sử từng lượt ôn tập dạng Parquet (phân vùng theo ngày) để phân tích.
+
+Mỗi câu trả lời trong update_srs được ghi 1 dòng:
+    username, word_id, ts, remembered,
+    prev_interval_hours, new_interval_hours, prev_ease, new_ease
+
+Cấu trúc thư mục (hive partitioning):
+    ReviewLog/date=2026-10-19/part-<ms>-<pid>-<n>.parquet   ← file nhỏ khi flush buffer
+    ReviewLog/date=2026-10-18/compacted.parquet              ← sau khi compact
+
+- Ghi được gom trong buffer, flush khi đủ BUFFER_ROWS dòng hoặc sau FLUSH_SECONDS giây
+  (và khi process thoát).
+- compact() gộp các file nhỏ của 1 ngày thành 1 file, sắp theo username để
+  thống kê row group giúp predicate pushdown hiệu quả.
+- read_reviews() đọc qua pyarrow.dataset với filter → chỉ đọc các phân vùng /
+  row group cần thiết, không đụng tới file user.
+
+Tắt bằng VOCAB_REVIEW_LOG=0. pyarrow chỉ được import khi flush/đọc.
+
+Cách dùng:
+    python review_log.py compact               # gộp các ngày trước hôm nay
+    python review_log.py query --user a --since 2026-10-01
+"""
+
+import argparse
+import atexit
+import itertools
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+REVIEW_LOG_FOLDER = "ReviewLog"
+ENABLED = os.environ.get("VOCAB_REVIEW_LOG", "1") != "0"
+BUFFER_ROWS = 500
+FLUSH_SECONDS = 30
+
+_lock = threading.Lock()
+_buffer = []
+_timer = None
+_file_counter = itertools.count()
+
+def _schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("username", pa.string()),
+        ("word_id", pa.string()),
+        ("ts", pa.timestamp("us")),
+        ("remembered", pa.bool_()),
+        ("prev_interval_hours", pa.float64()),
+        ("new_interval_hours", pa.float64()),
+        ("prev_ease", pa.float64()),
+        ("new_ease", pa.float64()),
+    ])
+
+# =====================
+# GHI
+# =====================
+def log_review(username, word_id, remembered, prev_interval, new_interval, prev_ease, new_ease, ts=None):
+    """Thêm 1 lượt ôn vào buffer (rất rẻ, không I/O trừ khi buffer đầy)."""
+    global _timer
+    if not ENABLED:
+        return
+    row = (username, word_id, ts or datetime.now(), bool(remembered),
+           float(prev_interval), float(new_interval), float(prev_ease), float(new_ease))
+    with _lock:
+        _buffer.append(row)
+        full = len(_buffer) >= BUFFER_ROWS
+        if not full and _timer is None:
+            _timer = threading.Timer(FLUSH_SECONDS, flush)
+            _timer.daemon = True
+            _timer.start()
+    if full:
+        flush()
+
+def flush():
+    """Ghi toàn bộ buffer ra các file Parquet (mỗi ngày 1 file mới)."""
+    global _timer
+    with _lock:
+        rows = _buffer[:]
+        _buffer.clear()
+        if _timer is not None:
+            _timer.cancel()
+            _timer = None
+    if not rows:
+        return 0
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    by_date = {}
+    for row in rows:
+        by_date.setdefault(row[2].date().isoformat(), []).append(row)
+
+    schema = _schema()
+    for day, day_rows in by_date.items():
+        columns = list(zip(*day_rows))
+        table = pa.Table.from_arrays(
+            [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+            schema=schema,
+        )
+        folder = os.path.join(REVIEW_LOG_FOLDER, f"date={day}")
+        os.makedirs(folder, exist_ok=True)
+        name = f"part-{int(time.time() * 1000)}-{os.getpid()}-{next(_file_counter)}.parquet"
+        # Ghi ra file ẩn rồi đổi tên để người đọc không thấy file ghi dở
+        tmp_path = os.path.join(folder, "." + name)
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, os.path.join(folder, name))
+    return len(rows)
+
+atexit.register(flush)
+
+# =====================
+# COMPACT
+# =====================
+def compact(day):
+    """Gộp mọi file của 1 ngày thành compacted.parquet (sắp theo username, ts)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    folder = os.path.join(REVIEW_LOG_FOLDER, f"date={day}")
+    if not os.path.isdir(folder):
+        return 0
+    files = sorted(f for f in os.listdir(folder) if f.endswith(".parquet") and not f.startswith("."))
+    if not files or files == ["compacted.parquet"]:
+        return 0
+
+    tables = [pq.ParquetFile(os.path.join(folder, f)).read() for f in files]
+    merged = pa.concat_tables(tables).sort_by([("username", "ascending"), ("ts", "ascending")])
+
+    tmp_path = os.path.join(folder, ".compacted.parquet")
+    pq.write_table(merged, tmp_path, row_group_size=128 * 1024)
+    os.replace(tmp_path, os.path.join(folder, "compacted.parquet"))
+    for f in files:
+        if f != "compacted.parquet":
+            os.remove(os.path.join(folder, f))
+    return merged.num_rows
+
+def compact_all(before=None):
+    """Compact mọi ngày trước `before` (mặc định hôm nay — ngày đang ghi không đụng tới)."""
+    before = before or date.today().isoformat()
+    if not os.path.isdir(REVIEW_LOG_FOLDER):
+        return {}
+    result = {}
+    for entry in sorted(os.listdir(REVIEW_LOG_FOLDER)):
+        if entry.startswith("date=") and entry[5:] < before:
+            result[entry[5:]] = compact(entry[5:])
+    return result
+
+# =====================
+# ĐỌC
+# =====================
+def read_reviews(username=None, word_id=None, start=None, end=None, columns=None):
+    """
+    Đọc lịch sử ôn tập thành pyarrow.Table với predicate pushdown.
+    start/end là date hoặc datetime (end không bao gồm).
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    if not os.path.isdir(REVIEW_LOG_FOLDER):
+        return _schema().empty_table()
+
+    dataset = ds.dataset(REVIEW_LOG_FOLDER, format="parquet", partitioning="hive",
+                         schema=_schema().append(pa.field("date", pa.string())))
+    expr = None
+
+    def add(cond):
+        nonlocal expr
+        expr = cond if expr is None else expr & cond
+
+    if username is not None:
+        add(ds.field("username") == username)
+    if word_id is not None:
+        add(ds.field("word_id") == word_id)
+    if start is not None:
+        start_dt = start if isinstance(start, datetime) else datetime.combine(start, datetime.min.time())
+        add(ds.field("date") >= start_dt.date().isoformat())   # lọc phân vùng
+        add(ds.field("ts") >= start_dt)
+    if end is not None:
+        end_dt = end if isinstance(end, datetime) else datetime.combine(end, datetime.min.time())
+        add(ds.field("date") <= end_dt.date().isoformat())
+        add(ds.field("ts") < end_dt)
+
+    return dataset.to_table(columns=columns, filter=expr)
+
+# =====================
+# MAIN
+# =====================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Quản lý lịch sử ôn tập dạng Parquet")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_compact = sub.add_parser("compact", help="gộp file nhỏ theo ngày")
+    p_compact.add_argument("--date", default=None, help="chỉ compact 1 ngày (YYYY-MM-DD)")
+    p_query = sub.add_parser("query", help="đọc thử lịch sử")
+    p_query.add_argument("--user", default=None)
+    p_query.add_argument("--word", default=None)
+    p_query.add_argument("--since", default=None, help="YYYY-MM-DD")
+    p_query.add_argument("--days", type=int, default=None, help="số ngày kể từ --since")
+    args = parser.parse_args()
+
+    if args.cmd == "compact":
+        result = {args.date: compact(args.date)} if args.date else compact_all()
+        for day, n in result.items():
+            print(f"📦 {day}: {n} dòng")
+    else:
+        start = date.fromisoformat(args.since) if args.since else None
+        end = start + timedelta(days=args.days) if start and args.days else None
+        table = read_reviews(username=args.user, word_id=args.word, start=start, end=end)
+        print(f"📊 {table.num_rows} lượt ôn")
+        print(table.slice(0, 10).to_pandas())
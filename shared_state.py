@@ -0,0 +1,118 @@
+"""
+Version dùng chung giữa các process app (cluster mode, xem cluster.py).
+
+Mỗi process có cache riêng (kho từ vựng, danh sách topic...). Khi 1 process
+hoặc 1 script offline đổi dữ liệu nguồn, nó gọi bump(tên) để tăng version trong
+bảng SQLite; các process khác so version (1 SELECT theo khoá chính) và tự bỏ
+cache cũ. Không cần socket hay process điều phối riêng.
+
+Tên đang dùng:
+    "topics"   ← batch_import.py, excel_to_json.py / word_ids.py khi ghi topic
+
+Dữ liệu: Cluster/state.db (WAL). Chỉ bật trong process do cluster.py chạy
+(VOCAB_CLUSTER_NODE) hoặc khi VOCAB_SHARED_STATE=1; chạy 1 process thì không tạo
+DB, không SELECT — cached() chỉ hết hạn theo max_age hoặc khi chính process đó
+bump(). Script offline (batch_import...) vẫn bump vào DB nếu DB đã có (đã từng
+chạy cluster). VOCAB_SHARED_STATE=0 tắt hẳn.
+
+Cách dùng:
+    import shared_state
+    shared_state.bump("topics")
+    sig = shared_state.cached("topics", scan_topics, max_age=30)
+    python shared_state.py             # in các version hiện tại
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+STATE_DB = os.path.join("Cluster", "state.db")
+_SETTING = os.environ.get("VOCAB_SHARED_STATE")
+ENABLED = _SETTING != "0" and (_SETTING == "1" or "VOCAB_CLUSTER_NODE" in os.environ)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS versions (
+    name       TEXT PRIMARY KEY,
+    version    INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+_local = threading.local()
+_lock = threading.Lock()
+_memo = {}   # tên → (version, thời điểm tính, giá trị)
+
+def connect(path=None):
+    path = path or STATE_DB
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+def _conn():
+    """1 connection / thread (Streamlit chạy mỗi session trên thread riêng)."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _local.conn = connect()
+    return conn
+
+# =====================
+# VERSION
+# =====================
+def version(name):
+    if not ENABLED:
+        return 0
+    row = _conn().execute("SELECT version FROM versions WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else 0
+
+def bump(name):
+    """Báo cho mọi process: dữ liệu `name` vừa đổi. Trả về version mới."""
+    with _lock:
+        _memo.pop(name, None)
+    if _SETTING == "0" or not (ENABLED or os.path.exists(STATE_DB)):
+        return 0
+    return _conn().execute(
+        "INSERT INTO versions (name, version, updated_at) VALUES (?, 1, ?) "
+        "ON CONFLICT(name) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at "
+        "RETURNING version",
+        (name, time.time()),
+    ).fetchone()[0]
+
+def all_versions(conn=None):
+    conn = conn or _conn()
+    return conn.execute("SELECT name, version, updated_at FROM versions ORDER BY name").fetchall()
+
+# =====================
+# CACHE THEO VERSION
+# =====================
+def cached(name, compute, max_age=None):
+    """
+    compute() được cache trong process tới khi version của `name` đổi
+    (hoặc quá max_age giây — lưới an toàn cho thay đổi không qua bump, vd sửa tay).
+    """
+    current = version(name)
+    now = time.monotonic()
+    with _lock:
+        hit = _memo.get(name)
+    if hit is not None and hit[0] == current and (max_age is None or now - hit[1] < max_age):
+        return hit[2]
+    value = compute()
+    with _lock:
+        _memo[name] = (current, now, value)
+    return value
+
+# =====================
+# MAIN
+# =====================
+if __name__ == "__main__":
+    from datetime import datetime
+
+    rows = all_versions(connect())
+    if not rows:
+        print("📭 Chưa có version nào")
+    for name, ver, updated_at in rows:
+        print(f"   {name:<20} v{ver:<6} {datetime.fromtimestamp(updated_at):%d/%m %H:%M:%S}")
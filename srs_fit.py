@@ -0,0 +1,300 @@
+"""
+Fit tham số lịch ôn (SRS) từ lịch sử ôn tập (review_log) bằng NumPy.
+
+Mô hình (half-life regression):
+    h  = 2 ** (θ0 + θ1 * số_lần_nhớ + θ2 * số_lần_quên)     # half-life (giờ)
+    p  = 2 ** (-Δ / h)                                      # xác suất nhớ sau Δ giờ
+Log-likelihood và gradient được tính vector hoá trên toàn bộ lượt ôn cùng lúc,
+tối ưu bằng Newton + backtracking, có L2 kéo về lịch mặc định để user
+ít dữ liệu không bị fit lệch.
+
+Quy đổi sang tham số của update_srs (với tỉ lệ nhớ mục tiêu R):
+    init_interval_hours = 2 ** θ0 * (-log2 R)   → khoảng ôn đầu tiên (kẹp [2 giờ, 1 tuần])
+    init_ease           = 2 ** θ1               → hệ số nhân khi nhớ
+    lapse_factor        = 2 ** θ2               → hệ số nhân khi quên
+Kết quả ghi vào SRS/params.json (mặc định cho cả cohort + riêng từng user đủ dữ liệu).
+
+Cách dùng:
+    python srs_fit.py                       # fit từ ReviewLog/
+    python srs_fit.py --since 2026-01-01 --min-reviews 200
+    python srs_fit.py --synthetic 1000000   # benchmark trên dữ liệu giả lập
+"""
+
+import argparse
+import math
+import os
+import time
+from datetime import date, datetime
+
+from storage import read_json, save_json
+
+PARAMS_FILE = os.path.join("SRS", "params.json")
+TARGET_RETENTION = 0.9
+MIN_REVIEWS_PER_USER = 200
+
+# Lịch mặc định (khớp INIT_INTERVAL_HOURS / INIT_EASE / LAPSE_FACTOR trong app_ver2.py),
+# dùng làm điểm khởi đầu + tâm của L2
+PRIOR_INIT_INTERVAL_HOURS = 4
+PRIOR_INIT_EASE = 2.5
+PRIOR_LAPSE_FACTOR = 0.5
+L2 = 1.0
+# Khoảng ôn đầu tiên fit ra được kẹp trong [MIN_INTERVAL_HOURS của app, 1 tuần]
+MIN_INIT_INTERVAL_HOURS = 2
+MAX_INIT_INTERVAL_HOURS = 24 * 7
+
+_LN2 = math.log(2)
+_EPS = 1e-6
+
+# =====================
+# FEATURES
+# =====================
+def build_features(card_keys, ts_hours, remembered, prev_interval_hours):
+    """
+    Tính đặc trưng cho từng lượt ôn, vector hoá hoàn toàn.
+    card_keys: mã số nguyên của (user, word) — các lượt của cùng 1 thẻ phải liền nhau
+    và theo thứ tự thời gian.
+    Trả về (X [n, 3], Δ giờ, y).
+    """
+    import numpy as np
+
+    y = remembered.astype(np.float64)
+    n = len(y)
+    starts = np.ones(n, dtype=bool)
+    starts[1:] = card_keys[1:] != card_keys[:-1]
+    start_idx = np.maximum.accumulate(np.where(starts, np.arange(n), 0))
+
+    # Số lần nhớ / quên TRƯỚC lượt hiện tại trong cùng thẻ
+    correct_before = np.cumsum(y) - y
+    correct_before -= correct_before[start_idx]
+    position = np.arange(n) - start_idx
+    wrong_before = position - correct_before
+
+    # Δ = thời gian từ lượt trước; lượt đầu tiên của thẻ dùng khoảng ôn đã lên lịch
+    elapsed = np.empty(n)
+    elapsed[0] = 0
+    elapsed[1:] = ts_hours[1:] - ts_hours[:-1]
+    elapsed = np.where(starts, prev_interval_hours, elapsed)
+    elapsed = np.maximum(elapsed, 1 / 60)
+
+    X = np.column_stack([np.ones(n), correct_before, wrong_before])
+    return X, elapsed, y
+
+# =====================
+# FIT
+# =====================
+def prior_theta(target_retention=TARGET_RETENTION):
+    import numpy as np
+    return np.array([
+        math.log2(PRIOR_INIT_INTERVAL_HOURS / -math.log2(target_retention)),
+        math.log2(PRIOR_INIT_EASE),
+        math.log2(PRIOR_LAPSE_FACTOR),
+    ])
+
+def log_likelihood(theta, X, elapsed, y, prior, l2, hessian=False):
+    """
+    Trả về (log-likelihood trung bình có L2, gradient[, hessian]).
+    Không có vòng lặp Python: mọi phép tính là phép toán mảng trên toàn bộ lượt ôn.
+    """
+    import numpy as np
+
+    h = np.exp2(X @ theta)
+    a = _LN2 * elapsed / h                      # -ln p
+    p = np.clip(np.exp(-a), _EPS, 1 - _EPS)
+    ll = np.sum(y * np.log(p) + (1 - y) * np.log1p(-p))
+
+    # ℓ = g(a) với g(a) = -y*a + (1-y)*ln(1-e^-a) và da/dθ = -ln2 * a * x
+    g1 = -y + (1 - y) * p / (1 - p)
+    grad = X.T @ (-_LN2 * a * g1)
+
+    n = len(y)
+    diff = theta - prior
+    value = ll / n - l2 * diff @ diff / n
+    grad = grad / n - 2 * l2 * diff / n
+    if not hessian:
+        return value, grad
+
+    g2 = -(1 - y) * p / (1 - p) ** 2
+    weight = _LN2 ** 2 * (g2 * a * a + g1 * a)
+    hess = (X * weight[:, None]).T @ X / n - 2 * l2 * np.eye(len(theta)) / n
+    return value, grad, hess
+
+def fit_theta(X, elapsed, y, prior, l2=L2, max_iter=50, tol=1e-9):
+    """Newton (fallback về gradient khi Hessian không cho hướng tăng) + backtracking."""
+    import numpy as np
+
+    theta = prior.copy()
+    value, grad, hess = log_likelihood(theta, X, elapsed, y, prior, l2, hessian=True)
+    for _ in range(max_iter):
+        try:
+            direction = -np.linalg.solve(hess, grad)
+        except np.linalg.LinAlgError:
+            direction = grad
+        if direction @ grad <= 0:
+            direction = grad
+
+        step = 1.0
+        while step > 1e-10:
+            candidate = theta + step * direction
+            new_value, _ = log_likelihood(candidate, X, elapsed, y, prior, l2)
+            if new_value >= value:
+                break
+            step *= 0.5
+        else:
+            break
+
+        improvement = new_value - value
+        theta = candidate
+        value, grad, hess = log_likelihood(theta, X, elapsed, y, prior, l2, hessian=True)
+        if improvement < tol:
+            break
+    return theta, value
+
+def theta_to_params(theta, n_reviews, target_retention=TARGET_RETENTION):
+    return {
+        "init_interval_hours": round(float(min(max(2 ** theta[0] * -math.log2(target_retention),
+                                                   MIN_INIT_INTERVAL_HOURS), MAX_INIT_INTERVAL_HOURS)), 3),
+        "init_ease": round(float(min(max(2 ** theta[1], 1.3), 5.0)), 3),
+        "lapse_factor": round(float(min(max(2 ** theta[2], 0.1), 1.0)), 3),
+        "reviews": int(n_reviews),
+    }
+
+def fit(table, min_reviews=MIN_REVIEWS_PER_USER, target_retention=TARGET_RETENTION):
+    """
+    Fit tham số cho cả cohort và từng user có >= min_reviews lượt ôn.
+    table: pyarrow.Table theo schema của review_log.
+    """
+    import numpy as np
+    import pyarrow.compute as pc
+
+    if table.num_rows == 0:
+        return {"default": None, "users": {}}
+
+    users = table["username"].combine_chunks().dictionary_encode()
+    user_codes = users.indices.to_numpy()
+    word_codes = pc.dictionary_encode(table["word_id"]).combine_chunks().indices.to_numpy()
+    ts_hours = table["ts"].cast("int64").to_numpy() / 3.6e9
+    order = np.lexsort((ts_hours, word_codes, user_codes))
+
+    user_codes = user_codes[order]
+    card_keys = user_codes.astype(np.int64) * (int(word_codes.max()) + 1) + word_codes[order]
+    X, elapsed, y = build_features(
+        card_keys,
+        ts_hours[order],
+        table["remembered"].to_numpy(zero_copy_only=False)[order],
+        table["prev_interval_hours"].to_numpy()[order],
+    )
+
+    prior = prior_theta(target_retention)
+    theta, _ = fit_theta(X, elapsed, y, prior)
+    result = {"default": theta_to_params(theta, len(y), target_retention), "users": {}}
+
+    # Mỗi user: dữ liệu đã sắp theo user nên là 1 đoạn liên tiếp, L2 kéo về tham số cohort
+    names = users.dictionary.to_pylist()
+    boundaries = np.flatnonzero(np.diff(user_codes)) + 1
+    for start, end in zip(np.r_[0, boundaries], np.r_[boundaries, len(y)]):
+        if end - start < min_reviews:
+            continue
+        user_theta, _ = fit_theta(X[start:end], elapsed[start:end], y[start:end], theta)
+        result["users"][names[user_codes[start]]] = theta_to_params(user_theta, end - start, target_retention)
+    return result
+
+# =====================
+# LOAD (dùng trong update_srs)
+# =====================
+_cache = {"mtime": None, "params": {}}
+
+def load_fitted_params(username, path=PARAMS_FILE):
+    """
+    Tham số đã fit cho user (hoặc của cohort), {} nếu chưa có file.
+    Đọc lại file chỉ khi mtime đổi.
+    """
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {}
+    if _cache["mtime"] != mtime:
+        _cache["params"] = read_json(path)
+        _cache["mtime"] = mtime
+    params = _cache["params"]
+    fitted = params.get("users", {}).get(username) or params.get("default") or {}
+    return {k: v for k, v in fitted.items() if k != "reviews"}
+
+# =====================
+# SYNTHETIC BENCHMARK
+# =====================
+def synthetic_table(n_reviews, n_users=100, true_theta=(2.0, 1.2, -0.8), seed=0):
+    """Sinh lượt ôn giả lập theo đúng mô hình để kiểm tra tốc độ / khả năng khôi phục θ."""
+    import numpy as np
+    import pyarrow as pa
+
+    rng = np.random.default_rng(seed)
+    reviews_per_card = 8
+    n_cards = n_reviews // reviews_per_card
+    users = rng.integers(0, n_users, n_cards)
+
+    correct = np.zeros(n_cards)
+    wrong = np.zeros(n_cards)
+    t = np.zeros(n_cards)
+    interval = np.full(n_cards, float(PRIOR_INIT_INTERVAL_HOURS))
+    cols = {k: [] for k in ("username", "word_id", "ts", "remembered", "prev_interval_hours")}
+    base = datetime(2026, 1, 1).timestamp()
+    for _ in range(reviews_per_card):
+        elapsed = interval * rng.uniform(0.8, 1.5, n_cards)
+        t += elapsed
+        h = np.exp2(true_theta[0] + true_theta[1] * correct + true_theta[2] * wrong)
+        ok = rng.random(n_cards) < np.exp2(-elapsed / h)
+        cols["username"].append(users)
+        cols["word_id"].append(np.arange(n_cards))
+        cols["ts"].append(((base + t * 3600) * 1e6).astype("int64"))
+        cols["remembered"].append(ok)
+        cols["prev_interval_hours"].append(interval.copy())
+        correct += ok
+        wrong += ~ok
+        interval = np.where(ok, interval * 2.5, np.maximum(2, interval / 2))
+
+    return pa.table({
+        "username": pa.array([f"u{u}" for u in np.concatenate(cols["username"])]),
+        "word_id": pa.array([f"w{w}" for w in np.concatenate(cols["word_id"])]),
+        "ts": pa.array(np.concatenate(cols["ts"]), type=pa.timestamp("us")),
+        "remembered": pa.array(np.concatenate(cols["remembered"])),
+        "prev_interval_hours": pa.array(np.concatenate(cols["prev_interval_hours"])),
+    })
+
+# =====================
+# MAIN
+# =====================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit tham số SRS từ lịch sử ôn tập")
+    parser.add_argument("--since", default=None, help="chỉ dùng lượt ôn từ ngày này (YYYY-MM-DD)")
+    parser.add_argument("--min-reviews", type=int, default=MIN_REVIEWS_PER_USER,
+                        help="số lượt ôn tối thiểu để fit riêng cho 1 user")
+    parser.add_argument("--retention", type=float, default=TARGET_RETENTION, help="tỉ lệ nhớ mục tiêu")
+    parser.add_argument("--output", default=PARAMS_FILE)
+    parser.add_argument("--synthetic", type=int, default=None,
+                        help="benchmark trên N lượt ôn giả lập (không ghi file)")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        table = synthetic_table(args.synthetic)
+    else:
+        import review_log
+        review_log.flush()
+        start_date = date.fromisoformat(args.since) if args.since else None
+        table = review_log.read_reviews(start=start_date, columns=[
+            "username", "word_id", "ts", "remembered", "prev_interval_hours"
+        ])
+
+    print(f"📖 {table.num_rows} lượt ôn")
+    start = time.perf_counter()
+    result = fit(table, args.min_reviews, args.retention)
+    print(f"✅ Fit xong trong {time.perf_counter() - start:.2f}s")
+    print(f"📊 Cohort: {result['default']}")
+    print(f"👤 Số user fit riêng: {len(result['users'])}")
+
+    if not args.synthetic and result["default"]:
+        result["fitted_at"] = datetime.now().isoformat()
+        result["target_retention"] = args.retention
+        tmp_path = args.output + ".tmp"
+        save_json(tmp_path, result)
+        os.replace(tmp_path, args.output)
+        print(f"📁 File output: {args.output}")
@@ -0,0 +1,127 @@
+"""
+Đọc / ghi file dữ liệu (user, topic) dùng chung cho app và các script offline.
+
+File user (save_snapshot) được ghi theo định dạng cấu hình bằng
+VOCAB_SNAPSHOT_FORMAT = "<encoder>[+<nén>]":
+    encoder: pretty (mặc định, indent=2) | compact | orjson (cần pip install orjson)
+    nén:     gzip | zstd (cần pip install zstandard)
+ví dụ "compact+gzip", "orjson+zstd". read_json tự nhận dạng định dạng qua
+magic bytes nên đổi cấu hình không cần migrate file cũ. Topic và các file
+báo cáo vẫn ghi bằng save_json (JSON dễ đọc).
+
+Cách dùng:
+    VOCAB_SNAPSHOT_FORMAT=orjson+zstd streamlit run app_ver2.py
+    python bench_snapshot.py     # so sánh kích thước / tốc độ các định dạng
+"""
+
+import gzip
+import json
+import os
+import threading
+
+import metrics
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+SNAPSHOT_FORMAT = os.environ.get("VOCAB_SNAPSHOT_FORMAT", "pretty")
+ENCODERS = ("pretty", "compact", "orjson")
+CODECS = ("none", "gzip", "zstd")
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+GZIP_LEVEL = 1
+ZSTD_LEVEL = 3
+
+# =====================
+# ENCODE / DECODE
+# =====================
+def parse_format(fmt):
+    """"orjson+zstd" → ("orjson", "zstd"); báo lỗi nếu định dạng không hợp lệ."""
+    encoder, _, codec = fmt.partition("+")
+    codec = codec or "none"
+    if encoder not in ENCODERS or codec not in CODECS:
+        raise ValueError(f"Định dạng snapshot không hợp lệ: {fmt!r}")
+    if encoder == "orjson" and orjson is None:
+        raise ValueError("VOCAB_SNAPSHOT_FORMAT=orjson cần pip install orjson")
+    return encoder, codec
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError("Nén zstd cần pip install zstandard") from None
+    return zstandard
+
+def encode(data, fmt="pretty"):
+    encoder, codec = parse_format(fmt)
+    if encoder == "orjson":
+        raw = orjson.dumps(data)
+    elif encoder == "compact":
+        raw = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    else:
+        raw = json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+
+    if codec == "gzip":
+        # mtime=0 để cùng dữ liệu → cùng bytes
+        return gzip.compress(raw, compresslevel=GZIP_LEVEL, mtime=0)
+    if codec == "zstd":
+        return _zstd().ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    return raw
+
+def decode(raw):
+    """Giải mã bytes bất kỳ định dạng nào encode() sinh ra (nhận dạng qua magic bytes)."""
+    if raw[:2] == GZIP_MAGIC:
+        raw = gzip.decompress(raw)
+    elif raw[:4] == ZSTD_MAGIC:
+        raw = _zstd().ZstdDecompressor().decompress(raw)
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            pass   # vd NaN do json.dump ghi ra — orjson không nhận, để json xử lý
+    return json.loads(raw)
+
+# =====================
+# FILE
+# =====================
+@metrics.instrument("read_json")
+def read_json(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "rb") as f:
+        raw = f.read()
+    if metrics.ENABLED:
+        metrics.add_bytes("read_json", len(raw), "read")
+    return decode(raw)
+
+def _write(path, raw):
+    """
+    Ghi nguyên tử: ghi ra file tạm cùng thư mục rồi os.replace, nên process khác
+    (cluster mode, job offline) không bao giờ đọc phải file ghi dở.
+    """
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(raw)
+    os.replace(tmp_path, path)
+    if metrics.ENABLED:
+        metrics.add_bytes("save_json", len(raw), "written")
+
+@metrics.instrument("save_json")
+def save_json(path, data):
+    _write(path, encode(data))
+
+@metrics.instrument("save_json")
+def save_snapshot(path, data):
+    """Ghi file user theo VOCAB_SNAPSHOT_FORMAT."""
+    _write(path, encode(data, SNAPSHOT_FORMAT))
+
+def iter_user_files(user_folder):
+    """Duyệt (lazy) đường dẫn các file user, bỏ qua total_users.json."""
+    with os.scandir(user_folder) as it:
+        for entry in it:
+            if entry.is_file() and entry.name.endswith(".json") and entry.name != "total_users.json":
+                yield entry.path
@@ -0,0 +1,439 @@
+"""
+Kho từ vựng dạng file mmap dùng chung giữa các process app (cluster mode).
+
+vocab_store.build_store() parse mọi topic thành dict trong từng process, nên
+N process giữ N bản sao. Ở đây toàn bộ topic được biên dịch 1 lần thành 1 file
+nhị phân (Cluster/topic_cache/topics-<hash>.bin); mọi process mmap file đó
+(read-only, dùng chung page cache của OS) và chỉ decode entry khi được hỏi tới.
+
+Định dạng file (little-endian):
+    header   : magic, generation, mốc mtime, số topic / bản ghi / từ text / slot hash
+    topics   : (tên, bản ghi đầu, số bản ghi, vị trí trong index theo id) / topic
+    records  : (word_id, entry JSON) / từ, theo thứ tự trong file topic
+    by_id    : chỉ số bản ghi của từng topic, sắp theo word_id (tra nhị phân)
+    text     : chỉ số bản ghi của mỗi id 1 lần (topic đầu tiên thắng), thứ tự như file
+    slots    : bảng băm (crc32, dò tuyến tính) word_id → bản ghi text, tra O(1)
+    blob     : chuỗi UTF-8 (tên topic, word_id, entry JSON)
+
+Tra cứu: store["text"][id] đi qua bảng băm (vài phép so bytes) và entry đã
+decode được giữ trong LRU ENTRY_CACHE_SIZE entry / process, nên word_view /
+full_user trên cùng các thẻ của user không decode JSON lại. Duyệt 1 topic
+(items / values) đi thẳng theo bản ghi, không tra lại từng id.
+
+Generation: version "topics" của shared_state (batch_import / excel_to_json bump
+khi import lại topic) kèm mtime lớn nhất của các topic trong signature. Tên file
+theo hash của (tên file, mtime) các topic nên sửa tay topic cũng tạo file mới.
+File mới được ghi ra .tmp rồi os.replace; chỉ file có generation cũ hơn file vừa
+ghi bị xoá (process còn giữ signature cũ không xoá được file mới hơn), file đã
+xoá vẫn đọc được tới khi process cũ nhả mmap.
+
+Bật bằng VOCAB_TOPIC_CACHE=mmap (mặc định khi chạy dưới cluster.py),
+VOCAB_TOPIC_CACHE=memory để dùng dict như cũ. VOCAB_TOPIC_CACHE_ENTRIES: cỡ LRU.
+
+Cách dùng:
+    python topic_cache.py build                          # biên dịch Topics/
+    python topic_cache.py bench --workers 4 --words 100000
+"""
+
+import argparse
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import struct
+import zlib
+from collections.abc import ItemsView, Mapping, ValuesView
+from functools import lru_cache
+from types import MappingProxyType
+
+import shared_state
+from storage import read_json
+
+try:
+    import fcntl
+except ImportError:   # Windows: không khoá file, 2 process có thể cùng biên dịch (vẫn đúng)
+    fcntl = None
+
+TOPIC_FOLDER = "Topics"
+CACHE_FOLDER = os.path.join("Cluster", "topic_cache")
+MODE = os.environ.get("VOCAB_TOPIC_CACHE", "mmap" if "VOCAB_CLUSTER_NODE" in os.environ else "memory")
+ENABLED = MODE == "mmap"
+ENTRY_CACHE_SIZE = int(os.environ.get("VOCAB_TOPIC_CACHE_ENTRIES", "16384"))
+MAGIC = b"VOCABTC2"
+
+_HEADER = struct.Struct("<8sQdIIII")  # magic, generation, stamp, n_topics, n_records, n_text, n_slots
+_TOPIC = struct.Struct("<IIIII")      # name_off, name_len, rec_start, rec_count, by_id_start
+_RECORD = struct.Struct("<IIII")      # id_off, id_len, data_off, data_len
+_INDEX = struct.Struct("<I")
+
+# =====================
+# BIÊN DỊCH
+# =====================
+def _slot_count(n):
+    size = 8
+    while size < 2 * n:
+        size *= 2
+    return size
+
+def compile_topics(topic_folder, files, generation=0, stamp=0.0):
+    """Bytes của file cache cho các topic `files` (theo thứ tự, topic đầu tiên thắng khi trùng id)."""
+    blob = bytearray()
+
+    def add(data):
+        off = len(blob)
+        blob.extend(data)
+        return off, len(data)
+
+    topics, records, ids, by_id = [], [], [], []
+    text = {}
+    for name in files:
+        rec_start = len(records)
+        for word_id, entry in read_json(os.path.join(topic_folder, name)).items():
+            text.setdefault(word_id, len(records))
+            ids.append(word_id.encode("utf-8"))
+            entry_json = json.dumps(entry, ensure_ascii=False, separators=(",", ":"))
+            records.append(add(ids[-1]) + add(entry_json.encode("utf-8")))
+        topic_records = range(rec_start, len(records))
+        topics.append(add(name[:-5].encode("utf-8")) + (rec_start, len(topic_records), len(by_id)))
+        by_id.extend(sorted(topic_records, key=ids.__getitem__))
+
+    n_slots = _slot_count(len(text))
+    slots = [0] * n_slots
+    for i in text.values():
+        k = zlib.crc32(ids[i]) & (n_slots - 1)
+        while slots[k]:
+            k = (k + 1) & (n_slots - 1)
+        slots[k] = i + 1   # 0 = slot trống
+
+    out = bytearray(_HEADER.pack(MAGIC, generation, stamp, len(topics), len(records), len(text), n_slots))
+    for t in topics:
+        out += _TOPIC.pack(*t)
+    for r in records:
+        out += _RECORD.pack(*r)
+    for i in by_id + list(text.values()) + slots:
+        out += _INDEX.pack(i)
+    return bytes(out + blob)
+
+def cache_path(signature, folder=CACHE_FOLDER):
+    digest = hashlib.sha1(repr(tuple(signature)).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(folder, f"topics-{digest}.bin")
+
+def file_generation(path):
+    """(generation, mốc mtime) trong header của 1 file cache, None nếu không đọc được."""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(_HEADER.size)
+    except OSError:
+        return None
+    if len(head) < _HEADER.size or not head.startswith(MAGIC):
+        return None
+    return _HEADER.unpack(head)[1:3]
+
+def ensure_compiled(topic_folder, signature, folder=CACHE_FOLDER):
+    """Đường dẫn file cache cho signature; biên dịch (1 process, có khoá) nếu chưa có."""
+    path = cache_path(signature, folder)
+    if os.path.exists(path):
+        return path
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, ".lock"), "ab") as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        if os.path.exists(path):   # process khác vừa biên dịch xong
+            return path
+        generation = (shared_state.version("topics"), max((m for _, m in signature), default=0.0))
+        data = compile_topics(topic_folder, [name for name, _ in signature], *generation)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        # Chỉ xoá file cũ hơn (process đang mmap vẫn đọc được: POSIX giữ inode tới khi nhả)
+        for name in os.listdir(folder):
+            other = os.path.join(folder, name)
+            if not name.startswith("topics-") or other == path:
+                continue
+            other_generation = file_generation(other)
+            if other_generation is None or other_generation < generation:
+                try:
+                    os.remove(other)
+                except OSError:
+                    pass
+    return path
+
+# =====================
+# ĐỌC (ZERO-COPY)
+# =====================
+def open_cache(path):
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, generation, stamp, n_topics, n_records, n_text, n_slots = _HEADER.unpack_from(mm, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path} không phải file topic cache")
+    topics_at = _HEADER.size
+    records_at = topics_at + n_topics * _TOPIC.size
+    by_id_at = records_at + n_records * _RECORD.size
+    text_at = by_id_at + n_records * _INDEX.size
+    slots_at = text_at + n_text * _INDEX.size
+    cache = {
+        "mm": mm, "path": path, "generation": (generation, stamp),
+        "n_topics": n_topics, "n_text": n_text, "n_slots": n_slots,
+        "topics_at": topics_at, "records_at": records_at,
+        "by_id_at": by_id_at, "text_at": text_at, "slots_at": slots_at,
+        "blob_at": slots_at + n_slots * _INDEX.size,
+    }
+    # LRU entry đã decode (theo chỉ số bản ghi) + kết quả tra text theo id, riêng cho mỗi file
+    cache["entry"] = lru_cache(maxsize=ENTRY_CACHE_SIZE)(lambda i: _decode_entry(cache, i))
+    cache["text"] = lru_cache(maxsize=ENTRY_CACHE_SIZE)(lambda word_id: _text_entry(cache, word_id))
+    return cache
+
+def _string(cache, off, length):
+    start = cache["blob_at"] + off
+    return cache["mm"][start:start + length]
+
+def _record(cache, i):
+    return _RECORD.unpack_from(cache["mm"], cache["records_at"] + i * _RECORD.size)
+
+def _record_id(cache, i):
+    id_off, id_len, _, _ = _record(cache, i)
+    return _string(cache, id_off, id_len)
+
+def _decode_entry(cache, i):
+    _, _, data_off, data_len = _record(cache, i)
+    return MappingProxyType(json.loads(_string(cache, data_off, data_len)))
+
+def _index_at(cache, at, k):
+    return _INDEX.unpack_from(cache["mm"], at + k * _INDEX.size)[0]
+
+def _lookup(cache, key):
+    """Bản ghi text của word_id (bytes) qua bảng băm, None nếu không có."""
+    mm, slots_at, records_at, blob_at = cache["mm"], cache["slots_at"], cache["records_at"], cache["blob_at"]
+    mask = cache["n_slots"] - 1
+    k = zlib.crc32(key) & mask
+    while True:
+        slot = _INDEX.unpack_from(mm, slots_at + k * _INDEX.size)[0]
+        if slot == 0:
+            return None
+        id_off, id_len, _, _ = _RECORD.unpack_from(mm, records_at + (slot - 1) * _RECORD.size)
+        if id_len == len(key) and mm[blob_at + id_off:blob_at + id_off + id_len] == key:
+            return slot - 1
+        k = (k + 1) & mask
+
+def _text_entry(cache, word_id):
+    i = _lookup(cache, word_id.encode("utf-8"))
+    return None if i is None else cache["entry"](i)
+
+def _find_sorted(cache, index_at, count, key):
+    """Tra nhị phân trong index theo id của 1 topic (id trùng với topic trước đó)."""
+    at = lambda j: _index_at(cache, index_at, j)
+    k = bisect.bisect_left(range(count), key, key=lambda j: _record_id(cache, at(j)))
+    if k < count and _record_id(cache, at(k)) == key:
+        return at(k)
+    return None
+
+class _Items(ItemsView):
+    def __iter__(self):
+        view = self._mapping
+        for i in view._order():
+            yield _record_id(view._cache, i).decode("utf-8"), view._cache["entry"](i)
+
+class _Values(ValuesView):
+    def __iter__(self):
+        view = self._mapping
+        for i in view._order():
+            yield view._cache["entry"](i)
+
+class _IndexView(Mapping):
+    """
+    Mapping word_id → entry (read-only) trên 1 đoạn của file mmap.
+    Thay được cho MappingProxyType của vocab_store ở mọi chỗ chỉ đọc.
+    """
+
+    def __init__(self, cache, order, count, records=None, by_id_at=None):
+        self._cache, self._order, self._count = cache, order, count
+        self._records, self._by_id_at = records, by_id_at   # None: view text toàn kho
+
+    def _find(self, word_id):
+        key = word_id.encode("utf-8")
+        i = _lookup(self._cache, key)
+        if self._records is None or (i is not None and i in self._records):
+            return i
+        if i is None:
+            return None
+        return _find_sorted(self._cache, self._by_id_at, self._count, key)
+
+    def __getitem__(self, word_id):
+        entry = self.get(word_id)
+        if entry is None:
+            raise KeyError(word_id)
+        return entry
+
+    def get(self, word_id, default=None):
+        if not isinstance(word_id, str):
+            return default
+        if self._records is None:
+            # View text: word_view / slim_user / full_user tra ở đây cho mọi thẻ của user
+            entry = self._cache["text"](word_id)
+            return default if entry is None else entry
+        i = self._find(word_id)
+        return default if i is None else self._cache["entry"](i)
+
+    def __contains__(self, word_id):
+        return isinstance(word_id, str) and self._find(word_id) is not None
+
+    def __iter__(self):
+        for i in self._order():
+            yield _record_id(self._cache, i).decode("utf-8")
+
+    def __len__(self):
+        return self._count
+
+    def items(self):
+        return _Items(self)
+
+    def values(self):
+        return _Values(self)
+
+def attach_store(topic_folder, signature, folder=CACHE_FOLDER):
+    """Kho giống vocab_store.build_store() nhưng dữ liệu nằm trong file mmap dùng chung."""
+    cache = open_cache(ensure_compiled(topic_folder, signature, folder))
+    topics = {}
+    for t in range(cache["n_topics"]):
+        name_off, name_len, rec_start, rec_count, by_id_start = _TOPIC.unpack_from(
+            cache["mm"], cache["topics_at"] + t * _TOPIC.size)
+        records = range(rec_start, rec_start + rec_count)
+        topics[_string(cache, name_off, name_len).decode("utf-8")] = _IndexView(
+            # Duyệt topic theo đúng thứ tự trong file gốc
+            cache, lambda records=records: iter(records), rec_count,
+            records, cache["by_id_at"] + by_id_start * _INDEX.size,
+        )
+    text_at, n_text = cache["text_at"], cache["n_text"]
+    text = _IndexView(cache, lambda: (_index_at(cache, text_at, k) for k in range(n_text)), n_text)
+    return MappingProxyType({"topics": MappingProxyType(topics), "text": text})
+
+# =====================
+# BENCHMARK
+# =====================
+def _memory_kb():
+    """(RSS, PSS) KB của process hiện tại (Linux; PSS chia đều trang dùng chung)."""
+    values = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if parts[0] in ("Rss:", "Pss:"):
+                    values[parts[0]] = int(parts[1])
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, None
+    return values.get("Rss:"), values.get("Pss:")
+
+def _bench_worker(topic_folder, signature, folder, mode, barrier, results):
+    import vocab_store
+
+    before = _memory_kb()
+    if mode == "mmap":
+        store = attach_store(topic_folder, signature, folder)
+    else:
+        store = vocab_store.build_store(topic_folder, [name for name, _ in signature])
+    # Chạm vào mọi entry như app khi hiển thị topic / ghép text cho user
+    for vocab in store["topics"].values():
+        for word_id in vocab:
+            store["text"].get(word_id)
+    barrier.wait()   # đo khi mọi worker cùng giữ kho → PSS phản ánh phần dùng chung
+    after = _memory_kb()
+    results.append((after[0] - before[0], (after[1] or 0) - (before[1] or 0)))
+    barrier.wait()
+
+def _synthetic_topics(folder, n_words, per_topic=1000):
+    from storage import save_json
+
+    for t in range(0, n_words, per_topic):
+        save_json(os.path.join(folder, f"synthetic_{t // per_topic:04d}.json"), {
+            f"synthetic_{t // per_topic:04d}__{i:06d}": {
+                "word": f"word {i}", "pos": "N (noun)", "meaning": f"nghĩa của từ số {i}",
+                "example": f"This is an example sentence for word number {i}.",
+                "example_meaning": f"Đây là câu ví dụ cho từ số {i}.",
+            }
+            for i in range(t, min(t + per_topic, n_words))
+        })
+
+def _latency(store, n_cards):
+    """(full_user lần đầu, full_user lần sau, duyệt 1 topic) tính bằng ms."""
+    import time
+    import vocab_store
+    from storage import decode, encode
+
+    user_data = decode(encode(vocab_store.synthetic_user(store, n_cards)))
+    slim = vocab_store.slim_user(user_data, store)
+    timings = []
+    for _ in range(2):
+        start = time.perf_counter()
+        vocab_store.full_user(slim, store)
+        timings.append((time.perf_counter() - start) * 1000)
+    topic = next(iter(store["topics"].values()))
+    start = time.perf_counter()
+    for _ in topic.items():
+        pass
+    timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def bench(workers, n_words, n_cards=10_000):
+    import multiprocessing
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        topic_folder = os.path.join(tmp, "Topics")
+        folder = os.path.join(tmp, "cache")
+        if n_words:
+            _synthetic_topics(topic_folder, n_words)
+        else:
+            topic_folder = TOPIC_FOLDER
+        files = sorted(f for f in os.listdir(topic_folder) if f.endswith(".json"))
+        signature = tuple((f, os.path.getmtime(os.path.join(topic_folder, f))) for f in files)
+        path = ensure_compiled(topic_folder, signature, folder)
+        print(f"📊 {len(files)} topic, file cache {os.path.getsize(path) / 1024 / 1024:.1f} MB, {workers} worker")
+
+        ctx = multiprocessing.get_context("spawn")
+        with ctx.Manager() as manager:
+            for mode in ("memory", "mmap"):
+                barrier, results = manager.Barrier(workers), manager.list()
+                procs = [ctx.Process(target=_bench_worker,
+                                     args=(topic_folder, signature, folder, mode, barrier, results))
+                         for _ in range(workers)]
+                for p in procs:
+                    p.start()
+                for p in procs:
+                    p.join()
+                rss = sum(r[0] for r in results) / 1024
+                pss = sum(r[1] for r in results) / 1024
+                print(f"   {mode:<6}: RSS tăng {rss:7.1f} MB, PSS tăng {pss:7.1f} MB (tổng {workers} worker)")
+
+        import vocab_store
+        print(f"⏱️ Độ trễ (full_user {n_cards} thẻ — mỗi lần ghi file user; duyệt 1 topic):")
+        for mode in ("memory", "mmap"):
+            store = (attach_store(topic_folder, signature, folder) if mode == "mmap"
+                     else vocab_store.build_store(topic_folder, files))
+            cold, warm, topic = _latency(store, n_cards)
+            print(f"   {mode:<6}: full_user {cold:6.1f} ms (lần đầu) / {warm:6.1f} ms (lần sau), "
+                  f"duyệt topic {topic:5.2f} ms")
+
+# =====================
+# MAIN
+# =====================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Kho topic mmap dùng chung giữa các process")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("build", help="biên dịch Topics/ thành file cache")
+    p_bench = sub.add_parser("bench", help="so sánh bộ nhớ dict / mmap với nhiều worker")
+    p_bench.add_argument("--workers", type=int, default=4)
+    p_bench.add_argument("--words", type=int, default=100_000, help="số từ giả lập (0 = dùng Topics/)")
+    p_bench.add_argument("--cards", type=int, default=10_000, help="số thẻ của user khi đo full_user")
+    args = parser.parse_args()
+
+    if args.cmd == "build":
+        files = sorted(f for f in os.listdir(TOPIC_FOLDER) if f.endswith(".json"))
+        signature = tuple((f, os.path.getmtime(os.path.join(TOPIC_FOLDER, f))) for f in files)
+        path = ensure_compiled(TOPIC_FOLDER, signature)
+        print(f"✅ {path} ({os.path.getsize(path) / 1024:.1f} KB)")
+    else:
+        bench(args.workers, args.words, args.cards)
@@ -0,0 +1,215 @@
+"""
+Ghi file user an toàn khi cùng 1 user mở nhiều session (nhiều tab / nhiều
+process app trong cluster mode).
+
+Version của file user là user_data["revision"]: số nguyên tăng 1 mỗi lần ghi
+qua write() (app, nhập tiến độ, migrate id). Bản sao của nó nằm trong file khoá
+Users/.<user>.lock (ghi trước file user) nên kiểm tra version không phải parse
+file user và không phụ thuộc độ phân giải mtime của filesystem.
+
+Mỗi session nhớ revision + mốc đồng bộ (sync_base) lúc nạp / ghi lần cuối.
+Khi ghi (save_user_data trong app):
+    - giữ khoá file user (flock, dùng chung giữa các process)
+    - revision trên đĩa vẫn như session nhớ → ghi đè bình thường
+    - đã đổi (session khác vừa ghi) → merge() bản của session với bản trên đĩa
+      rồi mới ghi, session nạp lại bản đã gộp
+Không session nào làm mất câu trả lời của session khác.
+
+Quy tắc gộp (so với mốc đồng bộ của session):
+    - id đã đổi trên đĩa (user_data["renamed"] do word_ids.migrate_users ghi)
+      được đổi theo trong bản của session trước khi gộp → không sinh thẻ trùng.
+    - words / knew_words / pending_words: cùng 1 từ ở 2 bên thì giữ bên tiến độ
+      cao hơn (review_count, rồi next_review), hoà thì giữ bên đang ghi. Từ chỉ
+      còn ở 1 bên: có trong mốc → bên kia đã xoá / chuyển → bỏ; không có → vừa
+      thêm → giữ. Từ đã sang words / knew_words thì bỏ khỏi pending_words.
+    - daily, stats["total_reviews"]: cộng dồn phần session đã tăng thêm kể từ
+      mốc vào số trên đĩa.
+    - streak / last_study / last_activity: lấy theo bên học gần nhất.
+    - khoá khác (review_session...): của session đang ghi; khoá session đã xoá
+      (có trong mốc) không lấy lại từ đĩa. aliases: hợp 2 bên.
+
+Cách dùng (trong app):
+    with user_sync.locked(user_file):
+        if user_sync.revision(user_file) != revision session nhớ:
+            data = user_sync.merge(data, read_json(user_file), base)
+        user_sync.write(user_file, data)
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+
+from storage import read_json, save_snapshot
+
+try:
+    import fcntl
+except ImportError:   # Windows: chỉ khoá trong process
+    fcntl = None
+
+SECTIONS = ("words", "knew_words", "pending_words")
+MASTERED_REVIEWS = 5   # khớp words_mastered trong app_ver2.py
+
+_thread_lock = threading.Lock()
+
+# =====================
+# KHOÁ
+# =====================
+def lock_path(user_file):
+    folder, name = os.path.split(user_file)
+    return os.path.join(folder, f".{os.path.splitext(name)[0]}.lock")
+
+@contextmanager
+def locked(user_file):
+    """Khoá ghi 1 file user (giữa các thread và các process)."""
+    if fcntl is None:
+        with _thread_lock:
+            yield
+        return
+    with open(lock_path(user_file), "ab") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)   # mỗi lần open là 1 khoá riêng → chặn cả thread khác
+        yield
+
+# =====================
+# REVISION
+# =====================
+def _stored_revision(user_file):
+    try:
+        with open(lock_path(user_file), "rb") as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return None   # chưa có / file khoá rỗng (mới chỉ dùng để khoá)
+
+def _store_revision(user_file, rev):
+    with open(lock_path(user_file), "wb") as f:
+        f.write(str(rev).encode("ascii"))
+
+def _current_revision(user_file):
+    """Revision trên đĩa (đang giữ locked()). File khoá chưa có → lấy từ file user."""
+    rev = _stored_revision(user_file)
+    if rev is None:
+        rev = read_json(user_file).get("revision", 0)
+        _store_revision(user_file, rev)
+    return rev
+
+def revision(user_file):
+    """Revision hiện tại của file user — thường chỉ đọc vài byte của file khoá."""
+    rev = _stored_revision(user_file)
+    if rev is None:
+        with locked(user_file):
+            rev = _current_revision(user_file)
+    return rev
+
+def write(user_file, data):
+    """Ghi file user với revision mới (đang giữ locked()). Trả về revision đó."""
+    data["revision"] = _current_revision(user_file) + 1
+    # File khoá ghi trước: chết giữa chừng thì file khoá đi trước file user → lần ghi sau merge, không mất gì
+    _store_revision(user_file, data["revision"])
+    save_snapshot(user_file, data)
+    return data["revision"]
+
+# =====================
+# GỘP
+# =====================
+def sync_base(user_data):
+    """
+    Mốc đồng bộ (lúc nạp / ghi): bộ đếm để merge() cộng phần tăng thêm, và tập
+    id / khoá đang có để nhận ra cái session hoặc đĩa đã xoá từ sau mốc.
+    """
+    return {
+        "total_reviews": user_data.get("stats", {}).get("total_reviews", 0),
+        "daily": {day: dict(counts) for day, counts in user_data.get("daily", {}).items()},
+        "ids": {section: set(user_data.get(section, {})) for section in SECTIONS},
+        "keys": set(user_data),
+    }
+
+def _progress(entry):
+    return entry.get("review_count", 0), entry.get("next_review", "")
+
+def _renamed(ours, renamed):
+    """Bản sao nông của ours với id cũ đổi theo renamed {id cũ: id mới} (trùng → giữ tiến độ cao hơn)."""
+    if not renamed:
+        return ours
+    ours = dict(ours)
+    for section in SECTIONS:
+        items = ours.get(section)
+        if not items or not any(word_id in renamed for word_id in items):
+            continue
+        rebuilt = {}
+        for word_id, entry in items.items():
+            new_id = renamed.get(word_id, word_id)
+            if new_id in rebuilt and _progress(rebuilt[new_id]) >= _progress(entry):
+                continue
+            rebuilt[new_id] = entry
+        ours[section] = rebuilt
+    if ours.get("aliases"):
+        aliases = {}
+        for alias_id, canonical_id in ours["aliases"].items():
+            alias_id, canonical_id = renamed.get(alias_id, alias_id), renamed.get(canonical_id, canonical_id)
+            if alias_id != canonical_id:
+                aliases[alias_id] = canonical_id
+        ours["aliases"] = aliases
+    session = ours.get("review_session")
+    if session and any(word_id in renamed for word_id in session.get("queue", ())):
+        ours["review_session"] = dict(session, queue=[renamed.get(w, w) for w in session["queue"]])
+    return ours
+
+def _merge_sections(merged, ours, disk, base):
+    for section in SECTIONS:
+        ours_items, disk_items = ours.get(section, {}), disk.get(section, {})
+        known = base["ids"].get(section, set())
+        # Có trong mốc mà session không còn → session đã xoá / chuyển section
+        entries = {k: v for k, v in disk_items.items() if k in ours_items or k not in known}
+        for word_id, entry in ours_items.items():
+            other = disk_items.get(word_id)
+            if other is None:
+                if word_id not in known:   # có trong mốc mà đĩa không còn → bên kia đã xoá / đổi id
+                    entries[word_id] = entry
+            elif _progress(entry) >= _progress(other):
+                entries[word_id] = entry
+        merged[section] = entries
+    for word_id in list(merged["pending_words"]):
+        if word_id in merged["words"] or word_id in merged["knew_words"]:
+            del merged["pending_words"][word_id]
+
+def _merge_daily(ours, disk, base):
+    daily = {day: dict(counts) for day, counts in disk.get("daily", {}).items()}
+    base_daily = base.get("daily", {})
+    for day, counts in ours.get("daily", {}).items():
+        target = daily.setdefault(day, {})
+        before = base_daily.get(day, {})
+        for k, v in counts.items():
+            target[k] = target.get(k, 0) + v - before.get(k, 0)
+    return daily
+
+def _merge_stats(merged, ours, disk, base):
+    ours_stats, disk_stats = ours.get("stats", {}), disk.get("stats", {})
+    stats = dict(disk_stats)
+    # Bên học gần nhất giữ streak (last_activity là ISO nên so chuỗi được)
+    if ours_stats.get("last_activity", "") >= disk_stats.get("last_activity", ""):
+        for k in ("streak_days", "last_study", "last_activity"):
+            if k in ours_stats:
+                stats[k] = ours_stats[k]
+    stats["total_reviews"] = (disk_stats.get("total_reviews", 0) + ours_stats.get("total_reviews", 0)
+                              - base.get("total_reviews", 0))
+    stats["total_words"] = len(merged["words"])
+    stats["words_mastered"] = sum(
+        1 for w in merged["words"].values() if w.get("review_count", 0) >= MASTERED_REVIEWS
+    )
+    return stats
+
+def merge(ours, disk, base=None):
+    """
+    Gộp user_data của session đang ghi (ours) với bản vừa được session khác ghi
+    (disk); base: sync_base() lúc session nạp / ghi lần cuối.
+    """
+    base = base or sync_base(disk)
+    ours = _renamed(ours, disk.get("renamed"))
+    # Khoá session đã xoá từ sau mốc (vd review_session khi hết phiên ôn) không lấy lại từ đĩa
+    merged = {k: v for k, v in disk.items() if k in ours or k not in base["keys"]}
+    merged.update(ours)
+    _merge_sections(merged, ours, disk, base)
+    if "aliases" in ours or "aliases" in disk:
+        merged["aliases"] = {**disk.get("aliases", {}), **ours.get("aliases", {})}
+    merged["daily"] = _merge_daily(ours, disk, base)
+    merged["stats"] = _merge_stats(merged, ours, disk, base)
+    return merged
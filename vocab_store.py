@@ -0,0 +1,195 @@
+"""
+Kho từ vựng dùng chung (read-only) cho mọi session trong 1 process.
+
+File user lưu kèm text của từng từ (word, pos, meaning, example, example_meaning).
+Giữ nguyên như vậy trong st.session_state thì bộ nhớ tăng theo
+số session × số từ. Thay vào đó:
+    - build_store() đọc mọi topic 1 lần / process (app cache bằng st.cache_resource):
+      topics[tên topic] → {word_id: entry}, text[word_id] → entry (topic đầu tiên thắng)
+    - slim_user() bỏ text khỏi các entry của user nếu trùng khớp với kho
+      (text khác kho / từ nhập ngoài vẫn giữ lại dưới dạng delta)
+    - word_view() ghép text từ kho + delta của user khi cần hiển thị
+    - full_user() ghép lại text trước khi ghi file → định dạng file user không đổi
+Các dict của kho được bọc MappingProxyType để không ai sửa nhầm.
+
+Cách dùng:
+    python vocab_store.py --user a                  # bộ nhớ / session của user thật
+    python vocab_store.py --cards 1000 --sessions 2000
+"""
+
+import argparse
+import os
+import sys
+from types import MappingProxyType
+
+from storage import decode, encode, read_json
+
+TOPIC_FOLDER = "Topics"
+USER_FOLDER = "Users"
+TEXT_FIELDS = ("word", "pos", "meaning", "example", "example_meaning")
+USER_SECTIONS = ("words", "pending_words", "knew_words")
+EMPTY_STORE = MappingProxyType({"topics": MappingProxyType({}), "text": MappingProxyType({})})
+
+# =====================
+# KHO DÙNG CHUNG
+# =====================
+def build_store(topic_folder=TOPIC_FOLDER, files=None):
+    files = files if files is not None else sorted(
+        f for f in os.listdir(topic_folder) if f.endswith(".json")
+    )
+    topics, text = {}, {}
+    for name in files:
+        vocab = {
+            word_id: MappingProxyType(entry)
+            for word_id, entry in read_json(os.path.join(topic_folder, name)).items()
+        }
+        topics[name[:-5]] = MappingProxyType(vocab)
+        for word_id, entry in vocab.items():
+            text.setdefault(word_id, entry)
+    return MappingProxyType({"topics": MappingProxyType(topics), "text": MappingProxyType(text)})
+
+# =====================
+# USER DATA
+# =====================
+def slim_entry(word_id, entry, store):
+    """Entry chỉ giữ các field khác với kho (trạng thái SRS + text khác kho)."""
+    shared = store["text"].get(word_id)
+    if shared is None:
+        return entry
+    if any(k in entry and entry[k] != shared.get(k, "") for k in TEXT_FIELDS):
+        return entry   # text đã sửa riêng → giữ nguyên cả entry
+    return {k: v for k, v in entry.items() if k not in TEXT_FIELDS}
+
+def topic_entry(word_id, info, store):
+    """Entry mới cho từ thêm từ topic: rỗng nếu kho có đúng text đó, không thì chỉ text."""
+    shared = store["text"].get(word_id)
+    if shared is not None and all(info.get(k, "") == shared.get(k, "") for k in TEXT_FIELDS):
+        return {}
+    return {k: info.get(k, "") for k in TEXT_FIELDS}
+
+def slim_user(user_data, store):
+    slim = dict(user_data)
+    for section in USER_SECTIONS:
+        if section in user_data:
+            slim[section] = {
+                word_id: slim_entry(word_id, entry, store)
+                for word_id, entry in user_data[section].items()
+            }
+    return slim
+
+def word_view(word_id, entry, store):
+    """Entry đầy đủ để hiển thị: text từ kho, field của user ghi đè."""
+    shared = store["text"].get(word_id)
+    if shared is None or "word" in entry:
+        return entry
+    view = dict(shared)
+    view.update(entry)
+    return view
+
+def full_user(user_data, store):
+    """Ghép lại text cho mọi entry (dùng khi ghi file)."""
+    full = dict(user_data)
+    for section in USER_SECTIONS:
+        if section in user_data:
+            full[section] = {
+                word_id: word_view(word_id, entry, store)
+                for word_id, entry in user_data[section].items()
+            }
+    return full
+
+# =====================
+# ĐO BỘ NHỚ
+# =====================
+def deep_sizeof(obj, exclude=None):
+    """Tổng sys.getsizeof của obj và mọi object con (mỗi object tính 1 lần)."""
+    seen = set(exclude or ())
+    stack, total = [obj], 0
+    while stack:
+        o = stack.pop()
+        if id(o) in seen:
+            continue
+        seen.add(id(o))
+        total += sys.getsizeof(o)
+        if isinstance(o, (dict, MappingProxyType)):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set)):
+            stack.extend(o)
+    return total
+
+def _object_ids(obj):
+    ids, stack = set(), [obj]
+    while stack:
+        o = stack.pop()
+        if id(o) in ids:
+            continue
+        ids.add(id(o))
+        if isinstance(o, (dict, MappingProxyType)):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set)):
+            stack.extend(o)
+    return ids
+
+def memory_report(user_data, store):
+    """Số byte / session trước (user_data đầy đủ) và sau (slim), kho dùng chung tính riêng."""
+    slim = slim_user(user_data, store)
+    return {
+        "cards": sum(len(user_data.get(s, {})) for s in USER_SECTIONS),
+        "full_bytes": deep_sizeof(user_data),
+        # Object thuộc kho dùng chung (text, key...) không tính vào session
+        "slim_bytes": deep_sizeof(slim, exclude=_object_ids(store)),
+        "store_bytes": deep_sizeof(store),
+    }
+
+def synthetic_user(store, n_cards):
+    """User giả học n_cards từ đầu tiên của kho (text copy như file user thật)."""
+    words = {}
+    for word_id, entry in list(store["text"].items())[:n_cards]:
+        words[word_id] = {k: entry.get(k, "") for k in TEXT_FIELDS}
+        words[word_id].update(interval_hours=4, ease_factor=2.5,
+                              next_review="2026-01-01T00:00:00", review_count=0)
+    return {"username": "synthetic", "words": words, "pending_words": {}, "knew_words": {}, "stats": {}}
+
+def synthetic_store(n_words):
+    vocab = {
+        f"synthetic__{i:010x}": {
+            "word": f"word {i}", "pos": "N (noun)", "meaning": f"nghĩa của từ số {i}",
+            "example": f"This is an example sentence for word number {i}.",
+            "example_meaning": f"Đây là câu ví dụ cho từ số {i}.",
+        }
+        for i in range(n_words)
+    }
+    entries = {k: MappingProxyType(v) for k, v in vocab.items()}
+    return MappingProxyType({
+        "topics": MappingProxyType({"synthetic": MappingProxyType(entries)}),
+        "text": MappingProxyType(entries),
+    })
+
+# =====================
+# MAIN
+# =====================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Báo cáo bộ nhớ / session với kho từ vựng dùng chung")
+    parser.add_argument("--user", default=None, help="đo trên file user thật")
+    parser.add_argument("--cards", type=int, default=1000, help="số thẻ của user giả")
+    parser.add_argument("--sessions", type=int, default=1000, help="số session để ước lượng tổng")
+    args = parser.parse_args()
+
+    if args.user:
+        store = build_store()
+        user_data = read_json(os.path.join(USER_FOLDER, f"{args.user}.json"))
+    else:
+        store = synthetic_store(args.cards)
+        # encode rồi decode để text của user là chuỗi riêng, giống khi đọc file user
+        user_data = decode(encode(synthetic_user(store, args.cards)))
+
+    r = memory_report(user_data, store)
+    kb = lambda n: f"{n / 1024:,.1f} KB"
+    mb = lambda n: f"{n / 1024 / 1024:,.1f} MB"
+    print(f"📊 {r['cards']} thẻ / session")
+    print(f"   trước (user_data đầy đủ): {kb(r['full_bytes'])} / session")
+    print(f"   sau   (id + delta)      : {kb(r['slim_bytes'])} / session")
+    print(f"   kho dùng chung          : {kb(r['store_bytes'])} / process")
+    print(f"   {args.sessions} session: {mb(r['full_bytes'] * args.sessions)} → "
+          f"{mb(r['slim_bytes'] * args.sessions + r['store_bytes'])}")
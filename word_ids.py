@@ -0,0 +1,286 @@
+"""
+ID ổn định cho từ vựng trong topic + diff khi import lại + migrate file user.
+
+ID = "<topic>__<sha1(word|pos đã chuẩn hoá)[:10]>", không phụ thuộc vị trí dòng
+trong Excel → chèn / xoá dòng không làm lệch tiến độ của user. Từ trùng cả
+word lẫn pos trong cùng topic được thêm hậu tố "-2", "-3"...
+
+Khi import lại 1 topic:
+    - diff_topic() so sánh bản cũ / mới theo khoá nội dung (word|pos):
+      added / removed / changed (cùng khoá, khác nghĩa/ví dụ) + remap {id cũ: id mới}
+    - file topic chỉ được ghi lại khi có thay đổi
+    - remap được lưu ở Migrations/<topic>-<thời gian>.json và migrate_users()
+      đổi id trong mọi file user 1 lượt (mỗi file ghi tối đa 1 lần)
+
+Cách dùng:
+    python word_ids.py rehash Topics/Banking.json          # đổi id topic cũ sang id ổn định
+    python word_ids.py migrate Migrations/banking-20261019-101500.json
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import unicodedata
+from datetime import datetime
+
+import shared_state
+import user_sync
+from storage import iter_user_files, read_json, save_json
+
+TOPIC_FOLDER = "Topics"
+USER_FOLDER = "Users"
+MIGRATION_FOLDER = "Migrations"
+HASH_LENGTH = 10
+TEXT_FIELDS = ("word", "pos", "meaning", "example", "example_meaning")
+USER_SECTIONS = ("words", "pending_words", "knew_words")
+
+_SPACE_RE = re.compile(r"\s+")
+_SLUG_RE = re.compile(r"[^0-9a-z]+")
+
+# =====================
+# ID
+# =====================
+def normalize(text):
+    """Chuẩn hoá để so khớp: NFC, chữ thường, gộp khoảng trắng."""
+    text = unicodedata.normalize("NFC", str(text or ""))
+    return _SPACE_RE.sub(" ", text).strip().lower()
+
+def content_key(entry):
+    return f"{normalize(entry.get('word'))}|{normalize(entry.get('pos'))}"
+
+def topic_slug(name):
+    """'Banking.json' → 'banking'."""
+    base = os.path.splitext(os.path.basename(name))[0]
+    return _SLUG_RE.sub("_", normalize(base)).strip("_") or "topic"
+
+def make_word_id(topic, key):
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:HASH_LENGTH]
+    return f"{topic}__{digest}"
+
+def assign_ids(topic, entries):
+    """
+    Gán id ổn định cho danh sách entry (giữ thứ tự).
+    Trả về dict id → entry; entry trùng khoá lần thứ n được id "<id>-n".
+    """
+    vocab, seen = {}, {}
+    for entry in entries:
+        key = content_key(entry)
+        seen[key] = seen.get(key, 0) + 1
+        word_id = make_word_id(topic, key)
+        if seen[key] > 1:
+            word_id = f"{word_id}-{seen[key]}"
+        vocab[word_id] = entry
+    return vocab
+
+# =====================
+# DIFF
+# =====================
+def _keyed(vocab):
+    """id → (khoá nội dung kèm số thứ tự nếu trùng) để ghép cặp cũ/mới."""
+    keyed, seen = {}, {}
+    for word_id, entry in vocab.items():
+        key = content_key(entry)
+        seen[key] = seen.get(key, 0) + 1
+        keyed[(key, seen[key])] = word_id
+    return keyed
+
+def diff_topic(old_vocab, new_vocab):
+    """
+    So sánh topic cũ / mới theo nội dung.
+    Trả về {"added": [id mới], "removed": [id cũ], "changed": [id mới],
+            "remap": {id cũ: id mới}} (remap chỉ chứa id thực sự đổi).
+    """
+    old_keyed, new_keyed = _keyed(old_vocab), _keyed(new_vocab)
+    diff = {"added": [], "removed": [], "changed": [], "remap": {}}
+
+    for k, new_id in new_keyed.items():
+        old_id = old_keyed.get(k)
+        if old_id is None:
+            diff["added"].append(new_id)
+            continue
+        if old_id != new_id:
+            diff["remap"][old_id] = new_id
+        old_entry, new_entry = old_vocab[old_id], new_vocab[new_id]
+        if any(old_entry.get(f, "") != new_entry.get(f, "") for f in TEXT_FIELDS):
+            diff["changed"].append(new_id)
+
+    diff["removed"] = [old_id for k, old_id in old_keyed.items() if k not in new_keyed]
+    return diff
+
+def has_changes(diff):
+    return any(diff[k] for k in ("added", "removed", "changed", "remap"))
+
+def stage_topic(path, old_vocab, new_vocab):
+    """
+    Ghi topic mới ra file tạm <path>.tmp nếu có thay đổi (chưa thay file thật).
+    Trả về (diff, đường dẫn file tạm hoặc None).
+    """
+    diff = diff_topic(old_vocab, new_vocab)
+    if not has_changes(diff) and list(old_vocab) == list(new_vocab):
+        return diff, None
+    tmp_path = path + ".tmp"
+    save_json(tmp_path, new_vocab)
+    return diff, tmp_path
+
+def remap_payload(path, old_vocab, diff):
+    """Nội dung file remap, None nếu không có id nào đổi / bị xoá."""
+    if not (diff["remap"] or diff["removed"]):
+        return None
+    return {
+        "topic": os.path.basename(path),
+        "created_at": datetime.now().isoformat(),
+        # Khoá nội dung giúp migrate không nhầm id cũ kiểu word_1 trùng giữa các topic
+        "remap": {old_id: {"id": new_id, "key": content_key(old_vocab[old_id])}
+                  for old_id, new_id in diff["remap"].items()},
+        "removed": diff["removed"],
+    }
+
+def save_remap(path, payload):
+    os.makedirs(MIGRATION_FOLDER, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    remap_path = os.path.join(MIGRATION_FOLDER, f"{topic_slug(path)}-{stamp}.json")
+    save_json(remap_path, payload)
+    return remap_path
+
+def write_topic(path, old_vocab, new_vocab):
+    """
+    Ghi topic mới nếu có thay đổi; lưu file remap nếu id đổi.
+    Trả về (diff, đường dẫn file remap hoặc None).
+    """
+    diff, tmp_path = stage_topic(path, old_vocab, new_vocab)
+    if tmp_path is None:
+        return diff, None
+    os.replace(tmp_path, path)
+    shared_state.bump("topics")   # các process app bỏ cache topic cũ
+
+    payload = remap_payload(path, old_vocab, diff)
+    return diff, save_remap(path, payload) if payload else None
+
+# =====================
+# MIGRATE USER
+# =====================
+def _progress(entry):
+    return (entry.get("review_count", 0), entry.get("interval_hours", 0))
+
+def migrate_user(user_data, remap):
+    """Đổi id trong 1 user_data theo remap. Trả về số entry được đổi."""
+    changed = 0
+    for section in USER_SECTIONS:
+        items = user_data.get(section)
+        if not items:
+            continue
+        hits = [
+            old_id for old_id, target in remap.items()
+            if old_id in items and content_key(items[old_id]) == target["key"]
+        ]
+        if not hits:
+            continue
+        # Dựng lại dict để giữ thứ tự cũ
+        new_ids = {old_id: remap[old_id]["id"] for old_id in hits}
+        rebuilt = {}
+        for k, v in items.items():
+            new_id = new_ids.get(k, k)
+            # id đích đã có trong section → giữ entry học được nhiều hơn
+            if new_id in rebuilt and _progress(rebuilt[new_id]) >= _progress(v):
+                continue
+            rebuilt[new_id] = v
+        user_data[section] = rebuilt
+        # Session đang mở còn giữ id cũ → user_sync.merge đổi theo khi gộp
+        user_data.setdefault("renamed", {}).update(new_ids)
+        changed += len(hits)
+
+    changed += _migrate_aliases(user_data, remap)
+
+    session = user_data.get("review_session")
+    if changed and session:
+        words = user_data.get("words", {})
+        session["queue"] = [
+            remap[w]["id"] if w in remap and w not in words and remap[w]["id"] in words else w
+            for w in session["queue"]
+        ]
+    return changed
+
+def _migrate_aliases(user_data, remap):
+    """
+    Đổi id trong user_data["aliases"] (cả id alias lẫn id chuẩn, sau khi đã đổi
+    các section). Alias cùng khoá nội dung với thẻ chuẩn nên khoá đó dùng để
+    kiểm tra remap giống các section.
+    """
+    aliases = user_data.get("aliases")
+    if not aliases:
+        return 0
+    entries = {}
+    for section in USER_SECTIONS:
+        entries.update(user_data.get(section, {}))
+
+    def migrated(word_id, key):
+        target = remap.get(word_id)
+        return target["id"] if target and target["key"] == key else word_id
+
+    changed, rebuilt = 0, {}
+    for alias_id, canonical_id in aliases.items():
+        entry = entries.get(canonical_id)
+        if entry is None:
+            # id chuẩn cũ đã được đổi trong section → tìm theo id mới
+            target = remap.get(canonical_id)
+            entry = entries.get(target["id"]) if target else None
+        key = content_key(entry) if entry is not None else None
+        new_alias, new_canonical = migrated(alias_id, key), migrated(canonical_id, key)
+        changed += (new_alias, new_canonical) != (alias_id, canonical_id)
+        if new_alias != new_canonical:
+            rebuilt[new_alias] = new_canonical
+    user_data["aliases"] = rebuilt
+    return changed
+
+def migrate_users(remap, user_folder=USER_FOLDER):
+    """Áp remap lên mọi file user; file nào không đổi thì không ghi lại."""
+    users, entries = 0, 0
+    for path in iter_user_files(user_folder):
+        with user_sync.locked(path):
+            user_data = read_json(path)
+            n = migrate_user(user_data, remap)
+            if n:
+                user_sync.write(path, user_data)
+        if n:
+            users += 1
+            entries += n
+    return users, entries
+
+def rehash_topic(path):
+    """Đổi id của 1 topic JSON có sẵn sang id ổn định (nội dung giữ nguyên)."""
+    old_vocab = read_json(path)
+    new_vocab = assign_ids(topic_slug(path), old_vocab.values())
+    return write_topic(path, old_vocab, new_vocab)
+
+def print_diff(diff):
+    print(f"➕ Thêm: {len(diff['added'])}  ➖ Xoá: {len(diff['removed'])}  "
+          f"✏️ Sửa: {len(diff['changed'])}  🔀 Đổi id: {len(diff['remap'])}")
+
+# =====================
+# MAIN
+# =====================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ID ổn định cho topic và migrate user")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_rehash = sub.add_parser("rehash", help="đổi id topic cũ sang id ổn định")
+    p_rehash.add_argument("topic")
+    p_rehash.add_argument("--no-migrate", action="store_true", help="không migrate file user")
+    p_migrate = sub.add_parser("migrate", help="áp file remap lên mọi user")
+    p_migrate.add_argument("remap")
+    parser.add_argument("--users", default=USER_FOLDER)
+    args = parser.parse_args()
+
+    if args.cmd == "rehash":
+        diff, remap_path = rehash_topic(args.topic)
+        print_diff(diff)
+        if remap_path:
+            print(f"📁 File remap: {remap_path}")
+            if not args.no_migrate:
+                users, entries = migrate_users(read_json(remap_path)["remap"], args.users)
+                print(f"✅ Đã migrate {entries} từ của {users} user")
+        else:
+            print("✅ Không có thay đổi")
+    else:
+        users, entries = migrate_users(read_json(args.remap)["remap"], args.users)
+        print(f"✅ Đã migrate {entries} từ của {users} user")
@@ -0,0 +1,110 @@
+"""
+Index từ vựng chuẩn (canonical) trên toàn bộ topic.
+
+Cùng 1 từ (vd "bank") có thể nằm ở nhiều topic với id khác nhau. Index gom
+theo khoá nội dung word|pos đã chuẩn hoá (word_ids.content_key):
+    - entries: khoá → [(topic, word_id), ...]
+    - key_of:  topic → {word_id: khoá}
+
+Phía user, user_data["aliases"] = {id alias: id chuẩn} cho phép nhiều id dùng
+chung 1 thẻ SRS trong user_data["words"] (không ôn lặp 1 từ nhiều lần).
+Mọi tra cứu khi lọc topic là dict lookup O(1) / từ.
+
+Cách dùng:
+    python word_index.py            # liệt kê các từ trùng giữa các topic
+"""
+
+import os
+
+from storage import read_json
+from word_ids import content_key
+
+TOPIC_FOLDER = "Topics"
+USER_SECTIONS = ("words", "knew_words", "pending_words")   # thứ tự ưu tiên khi trùng
+
+# =====================
+# INDEX TOPIC
+# =====================
+def build_index(topic_folder=TOPIC_FOLDER, files=None):
+    files = files if files is not None else sorted(
+        f for f in os.listdir(topic_folder) if f.endswith(".json")
+    )
+    entries, key_of = {}, {}
+    for name in files:
+        topic = name[:-5]
+        topic_keys = key_of[topic] = {}
+        for word_id, info in read_json(os.path.join(topic_folder, name)).items():
+            key = content_key(info)
+            topic_keys[word_id] = key
+            entries.setdefault(key, []).append((topic, word_id))
+    return {"entries": entries, "key_of": key_of}
+
+def duplicates(index):
+    """Các khoá xuất hiện ở từ 2 vị trí trở lên."""
+    return {key: refs for key, refs in index["entries"].items() if len(refs) > 1}
+
+# =====================
+# PHÍA USER
+# =====================
+def is_known(user_data, word_id):
+    """word_id đã có trong user (kể cả qua alias)."""
+    return word_id in user_data.get("aliases", {}) or any(
+        word_id in user_data.get(section, {}) for section in USER_SECTIONS
+    )
+
+def resolve(user_data, word_id):
+    """id alias → id chuẩn (id không phải alias thì giữ nguyên)."""
+    return user_data.get("aliases", {}).get(word_id, word_id)
+
+def link_alias(user_data, alias_id, canonical_id):
+    """Cho alias_id dùng chung trạng thái học của canonical_id (không tạo thẻ mới)."""
+    canonical_id = resolve(user_data, canonical_id)
+    if alias_id == canonical_id:
+        return
+    user_data.setdefault("aliases", {})[alias_id] = canonical_id
+
+def learned_sibling(user_data, word_id, refs):
+    """
+    (section, id đã học) của từ cùng khoá ở vị trí khác (refs = index["entries"][khoá]),
+    ưu tiên theo USER_SECTIONS; None nếu user chưa có từ nào trong số đó.
+    """
+    best = None
+    for _, sibling_id in refs:
+        if sibling_id == word_id:
+            continue
+        learned_id = resolve(user_data, sibling_id)
+        for rank, section in enumerate(USER_SECTIONS):
+            if learned_id in user_data.get(section, {}):
+                if best is None or rank < best[0]:
+                    best = (rank, section, learned_id)
+                break
+    return best[1:] if best else None
+
+def split_topic_words(topic, topic_data, index, user_data):
+    """
+    Chia từ của 1 topic thành (mới, trùng) cho trang thêm từ.
+    trùng: word_id → (section, id đã học) của từ cùng khoá ở topic khác.
+    Chỉ tra các id cùng khoá trong index (không duyệt toàn bộ từ của user).
+    """
+    key_of = index["key_of"].get(topic, {})
+    new_words, dup_words = {}, {}
+    for word_id, info in topic_data.items():
+        if is_known(user_data, word_id):
+            continue
+        refs = index["entries"].get(key_of.get(word_id) or content_key(info), ())
+        hit = learned_sibling(user_data, word_id, refs)
+        if hit is not None:
+            dup_words[word_id] = hit
+        else:
+            new_words[word_id] = info
+    return new_words, dup_words
+
+# =====================
+# MAIN
+# =====================
+if __name__ == "__main__":
+    index = build_index()
+    dups = duplicates(index)
+    print(f"📊 {len(index['entries'])} từ chuẩn, {len(dups)} từ trùng giữa các topic")
+    for key, refs in sorted(dups.items()):
+        print(f"   {key}: " + ", ".join(f"{topic}/{word_id}" for topic, word_id in refs))